@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class AnomalyDetector:
+    """Robust anomaly scoring over many daily series at once.
+
+    Rows are pivoted into a (segment x day) matrix, one row per combination of
+    the segment columns (e.g. page, device, country). Each day is compared with
+    a baseline: the median of the previous ``window`` days ('rolling') or of the
+    same weekday in the previous ``weeks`` weeks ('seasonal'). Deviations are
+    scaled by the MAD of the baseline window, floored at the Poisson noise
+    level, so sparse series do not raise alarms on every zero. Sustained
+    shifts are also scored as multi-day sums (``spans``) against the baseline
+    from before each span started, which catches multi-day drops that are each
+    too small on their own and that would otherwise leak into the baseline.
+    """
+
+    METHODS = ['rolling', 'seasonal']
+    # Matrix cells materialized per chunk (series x days x window)
+    CHUNK_CELLS = 20_000_000
+
+    def __init__(self, method='rolling', window=14, weeks=4, spans=(3, 7), threshold=3.5, min_baseline=5.0,
+                 min_series_total=20):
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown anomaly method: {method}")
+        self.method = method
+        self.window = window
+        self.weeks = weeks
+        self.spans = [span for span in spans if span > 1]
+        self.threshold = threshold
+        self.min_baseline = min_baseline
+        self.min_series_total = min_series_total
+
+    @property
+    def history_days(self):
+        """Days of history needed before the first scored day"""
+        return self.window if self.method == 'rolling' else 7 * self.weeks
+
+    def detect(self, df, segments=('page', 'device', 'country'), metric='clicks', include_spikes=False):
+        """Anomalous (segment, day) cells ranked by traffic lost"""
+        segments = [segment for segment in segments if segment in df.columns]
+        columns = segments + ['date', 'actual', 'baseline', 'score', 'lost', 'direction']
+        if df is None or df.empty or 'date' not in df.columns:
+            return pd.DataFrame(columns=columns)
+
+        days = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]')
+        first_day = days.min()
+        n_days = int((days.max() - first_day).astype(np.int64)) + 1
+        if n_days <= self.history_days:
+            return pd.DataFrame(columns=columns)
+        day_index = (days - first_day).astype(np.int64)
+
+        # One integer code per segment combination
+        if segments:
+            series_codes, series_keys = self._factorize_segments(df, segments)
+        else:
+            series_codes = np.zeros(len(df), dtype=np.int64)
+            series_keys = pd.DataFrame(index=[0])
+        values = df[metric].to_numpy(dtype=np.float64)
+
+        # Skip series too small to ever reach the baseline threshold
+        totals = np.bincount(series_codes, weights=values, minlength=len(series_keys))
+        keep = np.flatnonzero(totals >= self.min_series_total)
+        if not len(keep):
+            return pd.DataFrame(columns=columns)
+        remap = np.full(len(series_keys), -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+        codes = remap[series_codes]
+        mask = codes >= 0
+        codes, day_index, values = codes[mask], day_index[mask], values[mask]
+        order = np.argsort(codes, kind='stable')
+        codes, day_index, values = codes[order], day_index[order], values[order]
+
+        chunk_rows = max(1, self.CHUNK_CELLS // (n_days * max(self.window, self.weeks)))
+        found = []
+        for start in range(0, len(keep), chunk_rows):
+            stop = min(len(keep), start + chunk_rows)
+            lo, hi = np.searchsorted(codes, [start, stop])
+            flat = (codes[lo:hi] - start) * n_days + day_index[lo:hi]
+            matrix = np.bincount(flat, weights=values[lo:hi], minlength=(stop - start) * n_days)
+            matrix = matrix.reshape(stop - start, n_days)
+
+            baseline, scale = self._baseline(matrix)
+            actual = matrix[:, self.history_days:]
+            score = (actual - baseline) / scale
+            span_baseline, span_score = baseline, score
+            for span in self.spans:
+                if actual.shape[1] >= span:
+                    span_baseline, span_score = self._span_scores(span, actual, baseline, scale,
+                                                                  span_baseline, span_score)
+            baseline, score = span_baseline, span_score
+
+            anomalous = (score <= -self.threshold) & (baseline >= self.min_baseline)
+            if include_spikes:
+                anomalous |= score >= self.threshold
+            rows, cols = np.nonzero(anomalous)
+            if not len(rows):
+                continue
+            found.append(pd.DataFrame({
+                'series': keep[start + rows],
+                'day': cols + self.history_days,
+                'actual': actual[rows, cols],
+                'baseline': baseline[rows, cols],
+                'score': score[rows, cols]
+            }))
+
+        if not found:
+            return pd.DataFrame(columns=columns)
+
+        result = pd.concat(found, ignore_index=True)
+        result['lost'] = result['baseline'] - result['actual']
+        result['direction'] = np.where(result['score'] < 0, 'drop', 'spike')
+        keys = series_keys.iloc[result['series'].to_numpy()].reset_index(drop=True)
+        result = pd.concat([keys, result], axis=1)
+        result['date'] = pd.to_datetime(first_day) + pd.to_timedelta(result['day'], unit='D')
+        result = result.sort_values('lost', ascending=False, kind='stable').reset_index(drop=True)
+        return result[columns]
+
+    def _factorize_segments(self, df, segments):
+        combined = np.zeros(len(df), dtype=np.int64)
+        for segment in segments:
+            codes, uniques = pd.factorize(df[segment])
+            combined = combined * (len(uniques) + 1) + codes
+        series_codes, first_rows = pd.factorize(combined)
+        # Keys of each series from its first row
+        first_index = np.zeros(len(first_rows), dtype=np.int64)
+        first_index[series_codes[::-1]] = np.arange(len(df))[::-1]
+        keys = df[segments].iloc[first_index].reset_index(drop=True)
+        return series_codes, keys
+
+    def _baseline(self, matrix):
+        """Median baseline and robust scale for every scored day of every series"""
+        if self.method == 'rolling':
+            # windows[:, t] covers days t .. t+window-1, the history of day t+window
+            windows = sliding_window_view(matrix, self.window, axis=1)[:, :-1]
+        else:
+            lags = [matrix[:, self.history_days - 7 * week:matrix.shape[1] - 7 * week]
+                    for week in range(1, self.weeks + 1)]
+            windows = np.stack(lags, axis=2)
+        baseline = np.median(windows, axis=2)
+        mad = np.median(np.abs(windows - baseline[:, :, None]), axis=2)
+        # Never tighter than Poisson noise, so sparse series are not flagged on every zero
+        scale = np.maximum(1.4826 * mad, np.sqrt(np.maximum(baseline, 1.0)))
+        return baseline, scale
+
+    def _span_scores(self, span, actual, baseline, scale, best_baseline, score):
+        """Combine scores with span-day sums scored against the pre-span baseline"""
+        sums = np.cumsum(actual, axis=1)
+        span_sums = sums[:, span - 1:] - np.concatenate([np.zeros((len(actual), 1)), sums[:, :-span]], axis=1)
+        reference = baseline[:, :-span + 1]
+        span_score = (span_sums - span * reference) / (np.sqrt(span) * scale[:, :-span + 1])
+
+        # Keep whichever score deviates most, with its reference baseline
+        current = score[:, span - 1:]
+        use_span = np.abs(span_score) > np.abs(current)
+        score = score.copy()
+        best_baseline = best_baseline.copy()
+        score[:, span - 1:] = np.where(use_span, span_score, current)
+        best_baseline[:, span - 1:] = np.where(use_span, reference, best_baseline[:, span - 1:])
+        return best_baseline, score
+
+    def summarize(self, anomalies, n=10):
+        """Series with the most traffic lost on anomalous days, most severe first"""
+        if anomalies is None or anomalies.empty:
+            return []
+        segments = [column for column in anomalies.columns
+                    if column not in ('date', 'actual', 'baseline', 'score', 'lost', 'direction')]
+        drops = anomalies[anomalies['direction'] == 'drop']
+        if drops.empty:
+            return []
+        grouped = drops.groupby(segments, sort=False).agg(
+            lost=('lost', 'sum'), days=('date', 'count'), first_date=('date', 'min'),
+            last_date=('date', 'max'), worst_score=('score', 'min'),
+            actual=('actual', 'sum'), baseline=('baseline', 'sum')
+        ).reset_index().nlargest(n, 'lost')
+        return grouped.to_dict('records')
@@ -4,6 +4,7 @@ from PyQt5.QtCore import QObject, pyqtSignal
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from tracing import traced
 
 
 def resource_path(relative_path: str) -> str:
@@ -27,6 +28,7 @@ class AuthManager(QObject):
         self.scopes = ["https://www.googleapis.com/auth/webmasters.readonly"]
         self.creds = None
 
+    @traced('auth')
     def authenticate(self):
         """Perform Google OAuth authentication."""
         try:
@@ -0,0 +1,116 @@
+"""Deterministic local stand-in for the Gemini generative model"""
+import time
+import hashlib
+import threading
+
+ANALYSIS_TEMPLATE = """EXECUTIVE SUMMARY
+The site shows {trend} organic performance over the analysed period. Click volume is concentrated in a
+small set of queries and pages, while a long tail of queries ranks on page two with low click-through
+rates. Mobile accounts for the majority of impressions. Prompt fingerprint {fingerprint}.
+
+PERFORMANCE TRENDS
+{trends}
+
+STRATEGIC OPPORTUNITIES
+{opportunities}
+
+CRITICAL ISSUES
+{issues}
+
+COMPREHENSIVE RECOMMENDATIONS
+{recommendations}
+"""
+
+SUGGESTION_TEMPLATE = """CATEGORY: {category}
+TITLE: {title} #{index}
+DESCRIPTION: Queries in this group rank between positions 4 and 10 with below-average CTR.
+Improving titles and snippets for these pages should lift clicks without new content.
+PRIORITY: {priority}
+IMPACT: {impact}
+IMPLEMENTATION:
+1. Export the affected queries and landing pages.
+2. Rewrite titles and meta descriptions around the primary query.
+3. Add internal links from related high-authority pages.
+4. Re-submit the pages for indexing.
+5. Track CTR and position weekly for four weeks.
+SUCCESS METRICS: CTR, average position, clicks
+"""
+
+CATEGORIES = ['Technical SEO', 'Content Strategy', 'On-Page SEO', 'Off-Page SEO',
+              'User Experience', 'Performance Optimization']
+PRIORITIES = ['critical', 'high', 'medium', 'low']
+
+
+class FakeUsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, prompt):
+        self.text = text
+        # Roughly four characters per token
+        self.usage_metadata = FakeUsageMetadata(len(prompt) // 4, len(text) // 4)
+
+
+class FakeGenerativeModel:
+    """Answers prompts with canned, parseable text after a fixed latency.
+
+    The same prompt always produces the same response, so benchmark runs are
+    comparable. ``latency`` simulates network and generation time in seconds.
+    """
+
+    def __init__(self, latency=0.0, items=8, model_name='models/fake-gemini'):
+        self.latency = latency
+        self.items = items
+        self.model_name = model_name
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self.lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        fingerprint = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+        if 'CATEGORY:' in prompt:
+            return FakeResponse(self._suggestions_text(fingerprint), prompt)
+        return FakeResponse(self._analysis_text(fingerprint), prompt)
+
+    def _bullets(self, label):
+        return '\n'.join(f"- {label} item {i + 1}: supported by the query and page breakdown" for i in range(self.items))
+
+    def _analysis_text(self, fingerprint):
+        return ANALYSIS_TEMPLATE.format(
+            trend='growing' if int(fingerprint, 16) % 2 else 'declining',
+            fingerprint=fingerprint,
+            trends=self._bullets('Trend'),
+            opportunities=self._bullets('Opportunity'),
+            issues=self._bullets('Issue'),
+            recommendations=self._bullets('Recommendation')
+        )
+
+    def _suggestions_text(self, fingerprint):
+        return '\n'.join(
+            SUGGESTION_TEMPLATE.format(
+                category=CATEGORIES[i % len(CATEGORIES)],
+                title=f"Improve snippets for cluster {fingerprint[:6]}",
+                index=i + 1,
+                priority=PRIORITIES[i % len(PRIORITIES)],
+                impact=PRIORITIES[(i + 1) % len(PRIORITIES)]
+            )
+            for i in range(self.items)
+        )
+
+
+def create_fake_analyzer(latency=0.0, items=8):
+    """A GeminiAnalyzer wired to the fake model instead of the API"""
+    from gemini_analyzer import GeminiAnalyzer
+
+    analyzer = GeminiAnalyzer()
+    analyzer.model = FakeGenerativeModel(latency, items)
+    analyzer.working_model_name = analyzer.model.model_name
+    analyzer.is_initialized = True
+    return analyzer
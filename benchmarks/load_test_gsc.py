@@ -0,0 +1,95 @@
+"""Load-test the GSC fetch engine against the local mock Search Console server.
+
+    python -m benchmarks.load_test_gsc --rows 200000 --workers 4 --page-size 25000 --latency 0.05 --error-rate-429 0.05
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_gsc_server import MockSearchConsoleServer
+from benchmarks.synthetic_data import generate_dataframe
+from tracing import tracer
+
+SITE_URL = 'https://example.com/'
+
+
+def run_load_test(args):
+    from gsc_client import GSCClient
+
+    df = generate_dataframe(rows=args.rows, days=args.days, site_url=SITE_URL, seed=args.seed)
+    start_date = df['date'].min().date()
+    end_date = df['date'].max().date()
+    dimensions = ['date', 'query', 'page', 'country', 'device']
+
+    with MockSearchConsoleServer({SITE_URL: df}, latency=args.latency, jitter=args.jitter,
+                                 error_rate_429=args.error_rate_429, error_rate_500=args.error_rate_500,
+                                 quota=args.quota, quota_window=args.quota_window, seed=args.seed) as server:
+        print(f"✅ Mock server on {server.url} with {args.rows:,} rows")
+
+        # Split the date range into one slice per task; each worker uses its own client
+        days = (end_date - start_date).days + 1
+        slice_days = max(1, -(-days // args.slices))
+        slices = []
+        day = start_date
+        while day <= end_date:
+            slices.append((day, min(end_date, day + timedelta(days=slice_days - 1))))
+            day += timedelta(days=slice_days)
+
+        def fetch(date_range):
+            client = GSCClient(None, api_endpoint=server.url)
+            client.MAX_ROWS_PER_REQUEST = args.page_size
+            client.NUM_RETRIES = args.retries
+            errors = []
+            client.error_occurred.connect(errors.append)
+            rows = client.run_fetch_plan(SITE_URL, date_range[0], date_range[1], dimensions, args.row_limit)
+            return len(rows), errors
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(fetch, slices))
+        elapsed = time.perf_counter() - start
+
+        total_rows = sum(rows for rows, _ in results)
+        failures = [error for _, errors in results for error in errors]
+        stats = dict(server.stats)
+
+    print(f"📊 {len(slices)} slices, {args.workers} workers, page size {args.page_size:,}")
+    print(f"   Rows fetched:   {total_rows:,}")
+    print(f"   Elapsed:        {elapsed:.2f}s ({total_rows / elapsed:,.0f} rows/s)")
+    print(f"   API requests:   {stats['requests']:,} "
+          f"(429: {stats['errors_429']}, 500: {stats['errors_500']}, quota: {stats['quota_exceeded']})")
+    for error in failures:
+        print(f"❌ {error}")
+    return {'rows': total_rows, 'elapsed': elapsed, 'failures': failures, 'server': stats}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test GSCClient against the mock server")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--slices', type=int, default=8, help="Date-range slices fetched as separate tasks")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--page-size', type=int, default=25000)
+    parser.add_argument('--row-limit', type=int, default=1000000)
+    parser.add_argument('--retries', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate-429', type=float, default=0.0)
+    parser.add_argument('--error-rate-500', type=float, default=0.0)
+    parser.add_argument('--quota', type=int)
+    parser.add_argument('--quota-window', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    tracer.enabled = False
+    result = run_load_test(args)
+    return 1 if result['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""Local HTTP stand-in for the Search Console API.
+
+Implements ``sites.list`` and ``searchanalytics.query`` over synthetic data,
+with startRow/rowLimit paging, injected latency, random 429/500 errors and a
+request quota. Point the app at it with the GSC_API_ENDPOINT environment
+variable (or the ``gsc_api_endpoint`` setting):
+
+    python -m benchmarks.mock_gsc_server --port 8765 --rows 200000 --latency 0.05 --error-rate-429 0.02
+    GSC_API_ENDPOINT=http://127.0.0.1:8765/ python main.py
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_data import execute_query, generate_dataframe
+
+SITES_PATH = '/webmasters/v3/sites'
+QUERY_SUFFIX = '/searchAnalytics/query'
+
+
+class MockSearchConsoleServer:
+    """Threaded mock server; use start()/stop() or run as a context manager"""
+
+    def __init__(self, datasets, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 error_rate_429=0.0, error_rate_500=0.0, quota=None, quota_window=60.0,
+                 max_rows_per_request=25000, seed=None):
+        self.datasets = datasets
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate_429 = error_rate_429
+        self.error_rate_500 = error_rate_500
+        self.quota = quota
+        self.quota_window = quota_window
+        self.max_rows_per_request = max_rows_per_request
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_times = deque()
+        self.stats = {'requests': 0, 'rows': 0, 'errors_429': 0, 'errors_500': 0, 'quota_exceeded': 0}
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_stats(self):
+        with self.lock:
+            self.request_times.clear()
+            for key in self.stats:
+                self.stats[key] = 0
+
+    # ----- Request handling -----
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def _injected_error(self):
+        """Return (status, reason, message) for an injected failure, or None"""
+        now = time.monotonic()
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.quota is not None:
+                while self.request_times and now - self.request_times[0] > self.quota_window:
+                    self.request_times.popleft()
+                if len(self.request_times) >= self.quota:
+                    self.stats['quota_exceeded'] += 1
+                    return 429, 'RESOURCE_EXHAUSTED', (
+                        f"Quota exceeded: {self.quota} requests per {self.quota_window:g}s")
+                self.request_times.append(now)
+            roll = self.random.random()
+        if roll < self.error_rate_429:
+            self._count('errors_429')
+            return 429, 'RESOURCE_EXHAUSTED', "Rate limit exceeded (injected)"
+        if roll < self.error_rate_429 + self.error_rate_500:
+            self._count('errors_500')
+            return 500, 'INTERNAL', "Internal error (injected)"
+        return None
+
+    def _sleep(self):
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _error(self, status, reason, message):
+                self._send(status, {'error': {'code': status, 'message': message, 'status': reason}})
+
+            def _read_body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'{}')
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == '/stats':
+                    with mock.lock:
+                        self._send(200, dict(mock.stats))
+                    return
+                if path.rstrip('/') != SITES_PATH:
+                    self._error(404, 'NOT_FOUND', f"Unknown path {path}")
+                    return
+                mock._sleep()
+                error = mock._injected_error()
+                if error:
+                    self._error(*error)
+                    return
+                self._send(200, {'siteEntry': [
+                    {'siteUrl': site_url, 'permissionLevel': 'siteOwner'} for site_url in mock.datasets
+                ]})
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                if not (path.startswith(SITES_PATH + '/') and path.endswith(QUERY_SUFFIX)):
+                    self._error(404, 'NOT_FOUND', f"Unknown path {path}")
+                    return
+                site_url = unquote(path[len(SITES_PATH) + 1:-len(QUERY_SUFFIX)])
+                body = self._read_body()
+                mock._sleep()
+                error = mock._injected_error()
+                if error:
+                    self._error(*error)
+                    return
+                if site_url not in mock.datasets:
+                    self._error(403, 'PERMISSION_DENIED',
+                                f"User does not have sufficient permission for site '{site_url}'.")
+                    return
+                body['rowLimit'] = min(body.get('rowLimit', 1000), mock.max_rows_per_request)
+                try:
+                    response = execute_query(mock.datasets[site_url], body)
+                except (KeyError, ValueError) as e:
+                    self._error(400, 'INVALID_ARGUMENT', str(e))
+                    return
+                mock._count('rows', len(response.get('rows', [])))
+                self._send(200, response)
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock Search Console API server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--sites', default='https://example.com/', help="Comma-separated site URLs")
+    parser.add_argument('--rows', type=int, default=100000, help="Synthetic rows per site")
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random latency up to this many seconds")
+    parser.add_argument('--error-rate-429', type=float, default=0.0)
+    parser.add_argument('--error-rate-500', type=float, default=0.0)
+    parser.add_argument('--quota', type=int, help="Requests allowed per quota window")
+    parser.add_argument('--quota-window', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    datasets = {}
+    for index, site_url in enumerate(site.strip() for site in args.sites.split(',') if site.strip()):
+        print(f"📊 Generating {args.rows:,} rows for {site_url}...")
+        datasets[site_url] = generate_dataframe(rows=args.rows, days=args.days, site_url=site_url,
+                                                seed=args.seed + index)
+
+    server = MockSearchConsoleServer(
+        datasets, args.host, args.port, args.latency, args.jitter, args.error_rate_429,
+        args.error_rate_500, args.quota, args.quota_window, seed=args.seed
+    )
+    print(f"✅ Mock Search Console API listening on {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
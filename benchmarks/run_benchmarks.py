@@ -0,0 +1,273 @@
+"""Offline benchmarks for the fetch -> analyze pipeline.
+
+Runs entirely on synthetic Search Analytics data and a fake Gemini model, so no
+credentials or API key are needed:
+
+    python -m benchmarks.run_benchmarks --sizes 10000,100000 --output results.json
+    python -m benchmarks.run_benchmarks --baseline results.json
+
+With --baseline, benchmarks slower than the baseline by more than --threshold
+are reported and the exit code is 1. With --memory, the exit code is also 1
+when a spilled fetch peaks above --memory-limit-mb plus what a single page
+of it needs.
+"""
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import platform
+import statistics
+import tracemalloc
+import tempfile
+import subprocess
+from datetime import datetime
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from PyQt5.QtWidgets import QApplication
+
+from benchmarks.synthetic_data import (DIMENSIONS, SyntheticSearchConsoleService,
+                                       generate_dataframe, to_response_rows)
+from benchmarks.fake_gemini import create_fake_analyzer
+from tracing import tracer
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+SITE_URL = 'https://example.com/'
+
+
+def measure(func, repeat, memory=False):
+    """Run func repeat times and return timing statistics in seconds"""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    stats = {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'runs': len(timings)
+    }
+    if memory:
+        # One extra run under tracemalloc so timings are not affected
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        stats['peak_bytes'] = peak
+        stats['retained_bytes'] = current
+    return stats
+
+
+class BenchmarkContext:
+    """Inputs shared by the benchmarks of one dataset size"""
+
+    def __init__(self, rows, args):
+        from gsc_client import GSCClient
+
+        self.rows = rows
+        self.df = generate_dataframe(rows=rows, days=args.days, site_url=SITE_URL, seed=args.seed)
+        self.response = {'rows': to_response_rows(self.df, DIMENSIONS)}
+        self.service = SyntheticSearchConsoleService({SITE_URL: self.df})
+        self.client = GSCClient(None, service=self.service)
+        self.analyzer = create_fake_analyzer(latency=args.latency)
+        self.data_points = self.client._parse_response(self.response, DIMENSIONS)
+        self.prepared = self.analyzer._prepare_dataframe(self.data_points)
+        self.insights = self.analyzer._perform_deep_data_analysis(self.prepared)
+        self.prompt = self.analyzer._create_enhanced_analysis_prompt(self.prepared, SITE_URL, self.insights)
+        self.analysis_text = self.analyzer.model.generate_content(self.prompt).text
+        self.suggestions_text = self.analyzer.model.generate_content('CATEGORY:').text
+        self.start_date = self.df['date'].min().date()
+        self.end_date = self.df['date'].max().date()
+        # Separate client with a memory ceiling; cached grouping keeps the service's own work out of the peak
+        self.spill_client = GSCClient(None, service=SyntheticSearchConsoleService({SITE_URL: self.df},
+                                                                                 cache_grouping=True))
+        self.spill_client.set_memory_limit(args.memory_limit_mb * 1024 * 1024, tempfile.mkdtemp(prefix='gsc-spill-'))
+
+
+def define_benchmarks(ctx, args):
+    """Benchmark name -> zero-argument callable"""
+    analyzer = ctx.analyzer
+    df = ctx.prepared
+    benchmarks = {
+        'gsc.parse_response': lambda: ctx.client._parse_response(ctx.response, DIMENSIONS),
+        'gsc.fetch_paginated': lambda: ctx.client._query_rows(
+            SITE_URL, ctx.start_date, ctx.end_date, DIMENSIONS, ctx.rows),
+        'gsc.fetch_spilled_page': lambda: fetch_spilled(ctx, ctx.spill_client.MAX_ROWS_PER_REQUEST),
+        'gsc.fetch_spilled': lambda: fetch_spilled(ctx, ctx.rows),
+        'analysis.prepare_dataframe': lambda: analyzer._prepare_dataframe(ctx.data_points),
+        'analysis.deep_data_analysis': lambda: analyzer._perform_deep_data_analysis(df),
+        'analysis.analyze_queries': lambda: analyzer._analyze_queries(df),
+        'analysis.analyze_pages': lambda: analyzer._analyze_pages(df),
+        'analysis.analyze_devices': lambda: analyzer._analyze_devices(df),
+        'analysis.analyze_countries': lambda: analyzer._analyze_countries(df),
+        'analysis.analyze_competitive_position': lambda: analyzer._analyze_competitive_position(df),
+        'analysis.identify_opportunity_areas': lambda: analyzer._identify_opportunity_areas(df, ctx.insights),
+        'analysis.identify_data_opportunities': lambda: analyzer._identify_data_opportunities(df),
+        'prompt.build': lambda: analyzer._create_enhanced_analysis_prompt(df, SITE_URL, ctx.insights),
+        'llm.parse_analysis': lambda: analyzer._parse_enhanced_analysis_response(ctx.analysis_text, ctx.insights),
+        'llm.parse_suggestions': lambda: analyzer._parse_detailed_suggestions_response(ctx.suggestions_text),
+        'pipeline.analyze_data': lambda: analyzer.analyze_data(df, SITE_URL),
+        'pipeline.analyze_data_concurrent': lambda: analyzer.analyze_data(df, SITE_URL, concurrent_suggestions=True),
+    }
+    if ctx.rows <= args.max_table_rows:
+        benchmarks['ui.populate_table'] = lambda: populate_table(ctx)
+    return benchmarks
+
+
+def fetch_spilled(ctx, row_limit):
+    store = ctx.spill_client.fetch_search_analytics(SITE_URL, ctx.start_date, ctx.end_date, DIMENSIONS, row_limit)
+    store.discard()
+
+
+def over_memory_limit(results, memory_limit):
+    """Return (size, peak, bound) for each spilled fetch whose peak exceeded its bound.
+
+    The bound is the memory limit plus the peak of fetching a single page,
+    which covers the raw page and its parsed rows; buffered pages beyond
+    that must have been spilled, so the bound does not grow with the rows.
+    """
+    exceeded = []
+    for size, benchmarks in results.items():
+        peak = benchmarks.get('gsc.fetch_spilled', {}).get('peak_bytes')
+        page_peak = benchmarks.get('gsc.fetch_spilled_page', {}).get('peak_bytes')
+        if peak is not None and page_peak is not None and peak > memory_limit + page_peak:
+            exceeded.append((size, peak, memory_limit + page_peak))
+    return exceeded
+
+
+def populate_table(ctx):
+    from widgets.dashboard_widget import DashboardWidget
+
+    if not hasattr(ctx, 'dashboard'):
+        ctx.dashboard = DashboardWidget(ctx.client, ctx.analyzer)
+    ctx.dashboard.df = ctx.prepared
+    ctx.dashboard.update_data_table()
+    QApplication.processEvents()
+
+
+def run(args):
+    app = QApplication.instance() or QApplication(sys.argv)
+    tracer.enabled = args.trace
+    results = {}
+    for rows in args.sizes:
+        print(f"📊 Generating {rows:,} synthetic rows...")
+        ctx = BenchmarkContext(rows, args)
+        results[str(rows)] = {}
+        for name, func in define_benchmarks(ctx, args).items():
+            if args.only and not any(pattern in name for pattern in args.only):
+                continue
+            stats = measure(func, args.repeat, args.memory)
+            results[str(rows)][name] = stats
+            memory = f" {stats['peak_bytes'] / 1e6:>10,.1f} MB peak" if args.memory else ""
+            print(f"   {name:<45} {stats['median'] * 1000:>12,.1f} ms{memory}")
+        del ctx
+        gc.collect()
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        commit = ''
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__
+    }
+
+
+def compare(results, baseline, threshold, min_seconds=0.001):
+    """Return (size, name, baseline, current, ratio) for each regression"""
+    regressions = []
+    for size, benchmarks in results.items():
+        for name, stats in benchmarks.items():
+            previous = baseline.get(size, {}).get(name)
+            if not previous or previous['median'] <= 0:
+                continue
+            ratio = stats['median'] / previous['median']
+            # Ignore timer noise on very fast benchmarks
+            regressed = ratio > 1 + threshold and stats['median'] - previous['median'] > min_seconds
+            marker = '❌' if regressed else ('✅' if ratio < 1 - threshold else '  ')
+            print(f"{marker} {size:>8} {name:<45} {previous['median'] * 1000:>10,.1f} -> "
+                  f"{stats['median'] * 1000:>10,.1f} ms ({ratio:.2f}x)")
+            if regressed:
+                regressions.append((size, name, previous['median'], stats['median'], ratio))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for Search Analytics Pro")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated row counts (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per benchmark; the median is compared")
+    parser.add_argument('--days', type=int, default=90, help="Date span of the synthetic data")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency', type=float, default=0.0, help="Fake model latency in seconds")
+    parser.add_argument('--max-table-rows', type=int, default=100000,
+                        help="Skip table population above this many rows")
+    parser.add_argument('--only', action='append', help="Only run benchmarks whose name contains this")
+    parser.add_argument('--trace', action='store_true', help="Keep tracing spans enabled while measuring")
+    parser.add_argument('--memory', action='store_true',
+                        help="Also record the traced-allocation peak of each benchmark")
+    parser.add_argument('--memory-limit-mb', type=float, default=8,
+                        help="Memory ceiling of the spilled fetch benchmark")
+    parser.add_argument('--output', default='benchmark_results.json', help="Results file to write")
+    parser.add_argument('--baseline', help="Results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed slowdown before a benchmark counts as a regression")
+    parser.add_argument('--min-ms', type=float, default=1.0,
+                        help="Ignore slowdowns smaller than this many milliseconds")
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    output = {
+        'environment': environment(),
+        'config': {'sizes': args.sizes, 'repeat': args.repeat, 'days': args.days,
+                   'seed': args.seed, 'latency': args.latency, 'trace': args.trace, 'memory': args.memory,
+                   'memory_limit_mb': args.memory_limit_mb},
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f"💾 Results written to {args.output}")
+
+    exit_code = 0
+    for size, peak, bound in over_memory_limit(results, args.memory_limit_mb * 1024 * 1024):
+        print(f"❌ {size:>8} gsc.fetch_spilled peaked at {peak / 1e6:,.1f} MB, above the "
+              f"{args.memory_limit_mb:g} MB limit plus one page ({bound / 1e6:,.1f} MB)")
+        exit_code = 1
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline.get('results', {}), args.threshold, args.min_ms / 1000)
+        if regressions:
+            print(f"❌ {len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            return 1
+        print("✅ No regressions")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
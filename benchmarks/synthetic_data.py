@@ -0,0 +1,219 @@
+"""Synthetic Search Analytics data for offline benchmarks.
+
+Rows follow the shape of real Search Console responses: popularity is
+long-tailed, CTR falls off with position and most traffic comes from a few
+countries and devices.
+"""
+import re
+import json
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+
+DIMENSIONS = ['date', 'query', 'page', 'country', 'device']
+
+COUNTRIES = ['usa', 'gbr', 'deu', 'ind', 'can', 'fra', 'aus', 'esp', 'ita', 'nld', 'bra', 'jpn']
+COUNTRY_WEIGHTS = [0.35, 0.12, 0.1, 0.09, 0.06, 0.05, 0.05, 0.04, 0.04, 0.03, 0.04, 0.03]
+DEVICES = ['DESKTOP', 'MOBILE', 'TABLET']
+DEVICE_WEIGHTS = [0.42, 0.53, 0.05]
+
+WORDS = ['seo', 'analytics', 'search', 'console', 'guide', 'tutorial', 'best', 'free', 'tool',
+         'keyword', 'ranking', 'google', 'traffic', 'content', 'marketing', 'how', 'to', 'what',
+         'is', 'vs', 'review', 'price', 'online', 'local', 'audit', 'report', 'template',
+         'example', 'checklist', '2024', 'strategy', 'tips', 'mobile', 'speed', 'schema']
+DIRECTORIES = ['blog', 'guides', 'tools', 'docs', 'products', 'pricing', 'news', 'help']
+
+
+def _zipf_weights(n, exponent=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def generate_dataframe(rows=10000, queries=None, pages=None, days=90, end_date=None,
+                       site_url='https://example.com', seed=42):
+    """Generate a columnar dataset with the five standard dimensions"""
+    rng = np.random.default_rng(seed)
+    queries = queries or max(10, rows // 5)
+    pages = pages or max(5, rows // 50)
+    end_date = end_date or date.today() - timedelta(days=3)
+    start_date = end_date - timedelta(days=days - 1)
+
+    query_words = rng.choice(WORDS, size=(queries, 4))
+    query_lengths = rng.integers(1, 5, size=queries)
+    query_names = np.array([' '.join(words[:length]) + f' {i}' if i >= len(WORDS) else ' '.join(words[:length])
+                            for i, (words, length) in enumerate(zip(query_words, query_lengths))])
+    page_dirs = rng.choice(DIRECTORIES, size=pages)
+    page_names = np.array([f"{site_url.rstrip('/')}/{directory}/page-{i}" for i, directory in enumerate(page_dirs)])
+
+    query_index = rng.choice(queries, size=rows, p=_zipf_weights(queries))
+    page_index = rng.choice(pages, size=rows, p=_zipf_weights(pages, 0.9))
+    day_offsets = rng.integers(0, days, size=rows)
+
+    position = np.clip(rng.lognormal(mean=2.0, sigma=0.8, size=rows), 1.0, 100.0)
+    impressions = np.maximum(1, (rng.pareto(1.5, size=rows) * 5 / np.sqrt(position)).astype(np.int64) + 1)
+    expected_ctr = 0.3 / position ** 1.2
+    clicks = rng.binomial(impressions, np.clip(expected_ctr, 0, 1))
+
+    return pd.DataFrame({
+        'date': pd.to_datetime(start_date) + pd.to_timedelta(day_offsets, unit='D'),
+        'query': query_names[query_index],
+        'page': page_names[page_index],
+        'country': rng.choice(COUNTRIES, size=rows, p=COUNTRY_WEIGHTS),
+        'device': rng.choice(DEVICES, size=rows, p=DEVICE_WEIGHTS),
+        'clicks': clicks,
+        'impressions': impressions,
+        'ctr': clicks / impressions,
+        'position': np.round(position, 1)
+    })
+
+
+def aggregate(df, dimensions):
+    """Group rows by the requested dimensions like the API does"""
+    if not dimensions:
+        grouped = pd.DataFrame({'clicks': [df['clicks'].sum()], 'impressions': [df['impressions'].sum()]})
+        weighted = (df['position'] * df['impressions']).sum()
+    else:
+        df = df.assign(weighted_position=df['position'] * df['impressions'])
+        grouped = df.groupby(dimensions, sort=False).agg(
+            clicks=('clicks', 'sum'), impressions=('impressions', 'sum'),
+            weighted_position=('weighted_position', 'sum')
+        ).reset_index()
+        weighted = grouped.pop('weighted_position')
+    grouped['ctr'] = np.where(grouped['impressions'] > 0, grouped['clicks'] / grouped['impressions'].clip(lower=1), 0.0)
+    grouped['position'] = np.where(grouped['impressions'] > 0, weighted / grouped['impressions'].clip(lower=1), 0.0)
+    return grouped.sort_values('clicks', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def apply_filter_groups(df, filter_groups):
+    """Apply dimensionFilterGroups from a request body"""
+    for group in filter_groups or []:
+        for spec in group.get('filters', []):
+            column = df[spec['dimension']]
+            expression = spec['expression']
+            operator = spec.get('operator', 'equals')
+            if operator == 'equals':
+                mask = column.str.lower() == expression.lower()
+            elif operator == 'notEquals':
+                mask = column.str.lower() != expression.lower()
+            elif operator == 'contains':
+                mask = column.str.contains(expression, case=False, regex=False)
+            elif operator == 'notContains':
+                mask = ~column.str.contains(expression, case=False, regex=False)
+            elif operator == 'includingRegex':
+                mask = column.str.contains(expression, flags=re.IGNORECASE, regex=True)
+            elif operator == 'excludingRegex':
+                mask = ~column.str.contains(expression, flags=re.IGNORECASE, regex=True)
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+            df = df[mask]
+    return df
+
+
+def to_response_rows(df, dimensions):
+    """Convert an aggregated frame into Search Analytics response rows"""
+    keys = []
+    for dimension in dimensions:
+        if dimension == 'date':
+            keys.append(df['date'].dt.strftime('%Y-%m-%d').tolist())
+        else:
+            keys.append(df[dimension].tolist())
+    key_rows = list(zip(*keys)) if keys else [()] * len(df)
+    return [
+        {'keys': list(row_keys), 'clicks': int(clicks), 'impressions': int(impressions),
+         'ctr': float(ctr), 'position': float(position)}
+        for row_keys, clicks, impressions, ctr, position in zip(
+            key_rows, df['clicks'], df['impressions'], df['ctr'], df['position'])
+    ]
+
+
+def generate_response(rows=10000, dimensions=None, **kwargs):
+    """Generate a single searchanalytics.query response with the given number of rows"""
+    dimensions = dimensions or DIMENSIONS
+    df = generate_dataframe(rows=rows, **kwargs)
+    return {'rows': to_response_rows(df[dimensions + ['clicks', 'impressions', 'ctr', 'position']], dimensions),
+            'responseAggregationType': 'byProperty'}
+
+
+def execute_query(df, body):
+    """Answer a searchanalytics.query request body from a synthetic dataset"""
+    return page_response(group_query(df, body), body)
+
+
+def group_query(df, body):
+    """All result rows of a request body, before paging"""
+    start = pd.Timestamp(body['startDate'])
+    end = pd.Timestamp(body['endDate'])
+    selected = df[(df['date'] >= start) & (df['date'] <= end)]
+    selected = apply_filter_groups(selected, body.get('dimensionFilterGroups'))
+    return aggregate(selected, body.get('dimensions') or [])
+
+
+def page_response(grouped, body):
+    """The page of grouped rows selected by startRow and rowLimit"""
+    dimensions = body.get('dimensions') or []
+    start_row = body.get('startRow', 0)
+    row_limit = min(body.get('rowLimit', 1000), 25000)
+    page = grouped.iloc[start_row:start_row + row_limit]
+    response = {'responseAggregationType': 'byProperty'}
+    if len(page):
+        response['rows'] = to_response_rows(page, dimensions)
+    return response
+
+
+class _Request:
+    def __init__(self, execute):
+        self._execute = execute
+
+    def execute(self, num_retries=0):
+        return self._execute()
+
+
+class _SearchAnalytics:
+    def __init__(self, service):
+        self.service = service
+
+    def query(self, siteUrl, body):
+        return _Request(lambda: self.service.query(siteUrl, body))
+
+
+class _Sites:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self):
+        return _Request(lambda: {'siteEntry': [
+            {'siteUrl': site_url, 'permissionLevel': 'siteOwner'} for site_url in self.service.datasets
+        ]})
+
+
+class SyntheticSearchConsoleService:
+    """In-process stand-in for the searchconsole v1 service object.
+
+    With cache_grouping, each distinct query is grouped once and its pages
+    are cut from the cached result, so repeated runs measure the client
+    rather than the grouping. Every page is still built from new objects,
+    like a real response.
+    """
+
+    def __init__(self, datasets, cache_grouping=False):
+        self.datasets = datasets
+        self.requests = []
+        self.grouped = {} if cache_grouping else None
+
+    def searchanalytics(self):
+        return _SearchAnalytics(self)
+
+    def sites(self):
+        return _Sites(self)
+
+    def query(self, site_url, body):
+        self.requests.append((site_url, dict(body)))
+        if site_url not in self.datasets:
+            raise ValueError(f"User does not have sufficient permission for site '{site_url}'")
+        if self.grouped is None:
+            return execute_query(self.datasets[site_url], body)
+        query = {name: value for name, value in body.items() if name not in ('startRow', 'rowLimit')}
+        key = (site_url, json.dumps(query, sort_keys=True))
+        if key not in self.grouped:
+            self.grouped[key] = group_query(self.datasets[site_url], body)
+        return page_response(self.grouped[key], body)
@@ -0,0 +1,126 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+try:
+    import plotly.graph_objects as go
+except ImportError:
+    go = None
+
+
+def lttb_indices(x, y, threshold):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling.
+
+    The first and last points are always kept; every bucket in between
+    keeps the point forming the largest triangle with the previously kept
+    point and the average of the next bucket, which preserves peaks and dips
+    that plain striding would drop.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    # Mean of every bucket, plus the last point as the "next bucket" of the final one
+    counts = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / counts, x[-1])
+    mean_y = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / counts, y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        area = np.abs((x[previous] - mean_x[bucket + 1]) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (mean_y[bucket + 1] - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+class ChartBuilder:
+    """Plotly charts of the rollup cube, downsampled and cached as HTML.
+
+    Series come straight from the cube's date-keyed rollups, so a chart
+    never scans raw rows. Long series are reduced with LTTB to a point
+    budget shared by all traces of a chart, and the rendered HTML is kept
+    in a small LRU cache keyed by dataset, range, metric and breakdown.
+    """
+
+    METRIC_LABELS = {'clicks': 'Clicks', 'impressions': 'Impressions', 'ctr': 'CTR', 'position': 'Position'}
+    BREAKDOWNS = ('device', 'country', 'page')
+
+    def __init__(self, max_points=2000, max_series=8, cache_size=32, include_plotlyjs='cdn'):
+        self.max_points = max_points
+        self.max_series = max_series
+        self.cache_size = cache_size
+        self.include_plotlyjs = include_plotlyjs
+        self.cache = OrderedDict()
+
+    @staticmethod
+    def is_available():
+        return go is not None
+
+    def series(self, cube, metric, breakdown=None, start_date=None, end_date=None):
+        """{label: (dates, values)} for the total or the top breakdown members by clicks"""
+        if breakdown is None:
+            daily = cube.aggregate(['date'], start_date=start_date, end_date=end_date).sort_values('date')
+            return {self.METRIC_LABELS[metric]: (daily['date'].to_numpy(), daily[metric].to_numpy())}
+
+        members = (cube.aggregate([breakdown], start_date=start_date, end_date=end_date)
+                   .sort_values('clicks', ascending=False, kind='stable')[breakdown].head(self.max_series))
+        series = {}
+        for member in members:
+            # One binary-search slice of the member's rollup per trace
+            daily = cube.aggregate(['date'], {breakdown: member}, start_date, end_date).sort_values('date')
+            series[member or '(none)'] = (daily['date'].to_numpy(), daily[metric].to_numpy())
+        return series
+
+    def downsample(self, series):
+        """Series reduced with LTTB so that all traces together stay within max_points"""
+        budget = max(100, self.max_points // max(len(series), 1))
+        reduced = {}
+        for label, (dates, values) in series.items():
+            keep = lttb_indices(dates.astype('datetime64[D]').astype(np.int64), values, budget)
+            reduced[label] = (dates[keep], values[keep])
+        return reduced
+
+    def chart_html(self, cube, dataset_key, metric='clicks', breakdown=None, start_date=None, end_date=None):
+        """HTML of the time series chart (and breakdown bars) for one view, from the cache when possible"""
+        key = (dataset_key, metric, breakdown, start_date, end_date)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        html = self._render(cube, metric, breakdown, start_date, end_date)
+        self.cache[key] = html
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return html
+
+    def _render(self, cube, metric, breakdown, start_date, end_date):
+        label = self.METRIC_LABELS[metric]
+        line = go.Figure()
+        for name, (dates, values) in self.downsample(self.series(cube, metric, breakdown, start_date, end_date)).items():
+            line.add_trace(go.Scattergl(x=pd.to_datetime(dates), y=values, mode='lines', name=str(name)[:60]))
+        line.update_layout(title=f"{label} by date", height=420, margin=dict(l=40, r=20, t=50, b=40),
+                           hovermode='x unified', legend=dict(orientation='h'))
+        if metric == 'ctr':
+            line.update_yaxes(tickformat='.1%')
+        elif metric == 'position':
+            line.update_yaxes(autorange='reversed')
+        parts = [line.to_html(full_html=False, include_plotlyjs=self.include_plotlyjs)]
+
+        if breakdown is not None:
+            totals = (cube.aggregate([breakdown], start_date=start_date, end_date=end_date)
+                      .sort_values('clicks', ascending=False, kind='stable').head(self.max_series * 3))
+            bars = go.Figure(go.Bar(x=[str(value)[:40] or '(none)' for value in totals[breakdown]], y=totals[metric]))
+            bars.update_layout(title=f"{label} by {breakdown}", height=360, margin=dict(l=40, r=20, t=50, b=100))
+            if metric == 'ctr':
+                bars.update_yaxes(tickformat='.1%')
+            parts.append(bars.to_html(full_html=False, include_plotlyjs=False))
+
+        return "<html><head><meta charset='utf-8'></head><body>" + "".join(parts) + "</body></html>"
@@ -1,8 +1,10 @@
 import os
 import json
-from PyQt5.QtCore import QObject, pyqtSignal, QSettings
+from PyQt5.QtCore import QObject, pyqtSignal, QSettings, QStandardPaths
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QLineEdit, QPushButton, QMessageBox, QTextEdit
 import google.generativeai as genai
+from record_replay import RecordReplay
+from query_classifier import QueryClassifier
 
 class ApiKeyDialog(QDialog):
     def __init__(self, parent=None):
@@ -270,4 +272,58 @@ class ConfigManager(QObject):
     
     def has_api_key(self):
         """Check if an API key is stored"""
-        return bool(self.get_gemini_api_key())
\ No newline at end of file
+        return bool(self.get_gemini_api_key())
+    
+    def get_data_dir(self):
+        """Directory for locally stored data (warehouse, caches)"""
+        default_dir = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+        if not default_dir:
+            default_dir = os.path.abspath('data')
+        data_dir = self.settings.value('data_dir', default_dir)
+        os.makedirs(data_dir, exist_ok=True)
+        return data_dir
+    
+    def set_data_dir(self, data_dir):
+        self.settings.setValue('data_dir', data_dir)
+    
+    def get_gsc_api_endpoint(self):
+        """Search Console API endpoint override (empty for the real API)"""
+        return os.environ.get('GSC_API_ENDPOINT') or self.settings.value('gsc_api_endpoint', '')
+    
+    def set_gsc_api_endpoint(self, api_endpoint):
+        self.settings.setValue('gsc_api_endpoint', api_endpoint)
+    
+    def get_memory_limit_mb(self):
+        """Memory ceiling for fetched detail rows in MB (0 for no limit)"""
+        return int(os.environ.get('GSC_MEMORY_LIMIT_MB') or self.settings.value('memory_limit_mb', 0))
+    
+    def set_memory_limit_mb(self, memory_limit_mb):
+        self.settings.setValue('memory_limit_mb', memory_limit_mb)
+    
+    def get_query_rules(self):
+        """Query classification rules as JSON text (empty for the defaults)"""
+        return self.settings.value('query_rules', '')
+    
+    def set_query_rules(self, rules_json):
+        self.settings.setValue('query_rules', rules_json)
+    
+    def get_query_classifier(self):
+        """Classifier for the stored rules, falling back to the defaults if they are invalid"""
+        try:
+            return QueryClassifier.from_json(self.get_query_rules())
+        except Exception as e:
+            print(f"❌ Invalid query classification rules, using defaults: {e}")
+            return QueryClassifier()
+    
+    def get_record_replay(self):
+        """Record/replay settings for API calls ('off', 'record' or 'replay')"""
+        mode = os.environ.get('RECORD_REPLAY_MODE') or self.settings.value('record_replay_mode', 'off')
+        cassette_dir = (os.environ.get('RECORD_REPLAY_DIR') or self.settings.value('record_replay_dir', '')
+                        or os.path.join(self.get_data_dir(), 'cassettes'))
+        emulate_timing = float(os.environ.get('RECORD_REPLAY_TIMING') or self.settings.value('record_replay_timing', 0.0))
+        return RecordReplay(mode, cassette_dir, emulate_timing)
+    
+    def set_record_replay(self, mode, cassette_dir='', emulate_timing=0.0):
+        self.settings.setValue('record_replay_mode', mode)
+        self.settings.setValue('record_replay_dir', cassette_dir)
+        self.settings.setValue('record_replay_timing', emulate_timing)
@@ -1,6 +1,7 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Dict, Any
 from datetime import datetime, date
+import re
 import pandas as pd
 
 @dataclass
@@ -15,6 +16,110 @@ class GSCDataPoint:
     country: str = ""
     device: str = ""
 
+@dataclass
+class FilterSpec:
+    """Row filters that compile to GSC dimensionFilterGroups"""
+    page_contains: str = ""
+    page_regex: bool = False
+    query_contains: str = ""
+    query_regex: bool = False
+    countries: List[str] = field(default_factory=list)  # ISO 3166-1 alpha-3, e.g. 'deu'
+    devices: List[str] = field(default_factory=list)    # DESKTOP, MOBILE, TABLET
+
+    def is_empty(self):
+        return not (self.page_contains or self.query_contains or self.countries or self.devices)
+
+    def to_dimension_filter_groups(self):
+        """Compile to the searchanalytics.query dimensionFilterGroups field"""
+        filters = []
+        for dimension, expression, is_regex in [
+            ('page', self.page_contains, self.page_regex),
+            ('query', self.query_contains, self.query_regex)
+        ]:
+            if expression:
+                filters.append({
+                    'dimension': dimension,
+                    'operator': 'includingRegex' if is_regex else 'contains',
+                    'expression': expression
+                })
+        # Several values of one dimension are OR-ed with an anchored regex
+        for dimension, values in [('country', self.countries), ('device', self.devices)]:
+            values = [value.strip() for value in values if value.strip()]
+            if len(values) == 1:
+                filters.append({'dimension': dimension, 'operator': 'equals', 'expression': values[0]})
+            elif values:
+                filters.append({
+                    'dimension': dimension,
+                    'operator': 'includingRegex',
+                    'expression': '^(' + '|'.join(re.escape(value) for value in values) + ')$'
+                })
+        return [{'groupType': 'and', 'filters': filters}] if filters else []
+
+    def apply_to_dataframe(self, df):
+        """Apply the same filters locally, e.g. to rows loaded from history"""
+        mask = pd.Series(True, index=df.index)
+        if self.page_contains:
+            mask &= df['page'].str.contains(self.page_contains, regex=self.page_regex)
+        if self.query_contains:
+            mask &= df['query'].str.contains(self.query_contains, regex=self.query_regex)
+        if self.countries:
+            mask &= df['country'].str.lower().isin([value.strip().lower() for value in self.countries])
+        if self.devices:
+            mask &= df['device'].str.upper().isin([value.strip().upper() for value in self.devices])
+        return df[mask].reset_index(drop=True)
+
+@dataclass
+class SiteTotals:
+    """Exact site totals from low-cardinality aggregate queries"""
+    clicks: int
+    impressions: int
+    ctr: float
+    position: float
+    daily: Any = None  # DataFrame: date, clicks, impressions, ctr, position
+
+    @classmethod
+    def from_daily(cls, daily):
+        clicks = int(daily['clicks'].sum())
+        impressions = int(daily['impressions'].sum())
+        position = float((daily['position'] * daily['impressions']).sum() / impressions) if impressions else 0.0
+        return cls(
+            clicks=clicks,
+            impressions=impressions,
+            ctr=clicks / impressions if impressions else 0.0,
+            position=position,
+            daily=daily
+        )
+
+@dataclass
+class DetailStats:
+    """Summary statistics of detail rows, updated one page at a time while a fetch streams in"""
+    rows: int = 0
+    clicks: int = 0
+    impressions: int = 0
+    ctr_sum: float = 0.0
+    position_sum: float = 0.0
+
+    @classmethod
+    def from_dataframe(cls, df):
+        stats = cls()
+        stats.add(df)
+        return stats
+
+    def add(self, df):
+        self.rows += len(df)
+        self.clicks += int(df['clicks'].sum())
+        self.impressions += int(df['impressions'].sum())
+        self.ctr_sum += float(df['ctr'].sum())
+        self.position_sum += float(df['position'].sum())
+
+    @property
+    def ctr(self):
+        return self.ctr_sum / self.rows if self.rows else 0.0
+
+    @property
+    def position(self):
+        return self.position_sum / self.rows if self.rows else 0.0
+
 @dataclass
 class AnalysisResult:
     summary: str
@@ -30,4 +135,18 @@ class Suggestion:
     description: str
     priority: str  # high, medium, low
     impact: str   # high, medium, low
-    implementation: str
\ No newline at end of file
+    implementation: str
+
+def data_points_to_dataframe(data_points):
+    """Convert a list of GSCDataPoint objects into a column-oriented DataFrame"""
+    return pd.DataFrame({
+        'date': pd.to_datetime([point.date for point in data_points]),
+        'clicks': [point.clicks for point in data_points],
+        'impressions': [point.impressions for point in data_points],
+        'ctr': [point.ctr for point in data_points],
+        'position': [point.position for point in data_points],
+        'query': [point.query or '' for point in data_points],
+        'page': [point.page or '' for point in data_points],
+        'country': [point.country or '' for point in data_points],
+        'device': [point.device or '' for point in data_points]
+    })
@@ -0,0 +1,428 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+from bisect import bisect_left
+import numpy as np
+import pandas as pd
+from rollup_cube import Rollup, RollupCube
+from sketches import SketchSet
+
+
+class _StringDictionary:
+    """Sorted string dictionary stored as a UTF-8 blob plus offsets.
+
+    Strings are decoded lazily, so predicates can be resolved against the
+    dictionary (binary search) without materializing every value.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def load(cls, path_prefix):
+        blob = np.load(path_prefix + '.blob.npy', mmap_mode='r')
+        offsets = np.load(path_prefix + '.offsets.npy', mmap_mode='r')
+        return cls(blob, offsets)
+
+    @staticmethod
+    def save(path_prefix, sorted_values):
+        encoded = [value.encode('utf-8') for value in sorted_values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            offsets[1:] = np.cumsum([len(value) for value in encoded])
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        np.save(path_prefix + '.blob.npy', blob)
+        np.save(path_prefix + '.offsets.npy', offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return bytes(self.blob[start:end]).decode('utf-8')
+
+    def code_of(self, value):
+        """Return the code of an exact value, or -1 if absent"""
+        index = bisect_left(self, value)
+        if index < len(self) and self[index] == value:
+            return index
+        return -1
+
+    def prefix_range(self, prefix):
+        """Return the [lo, hi) code range of values starting with prefix"""
+        lo = bisect_left(self, prefix)
+        hi = bisect_left(self, prefix + '\U0010ffff')
+        return lo, hi
+
+    def decode(self, codes):
+        """Decode an array of codes into an object array of strings"""
+        present = np.zeros(len(self), dtype=bool)
+        present[codes] = True
+        used_codes = np.flatnonzero(present)
+        remap = np.zeros(len(self), dtype=np.int64)
+        remap[used_codes] = np.arange(len(used_codes))
+        raw = self.blob.tobytes()
+        starts = self.offsets[used_codes].tolist()
+        ends = self.offsets[used_codes + 1].tolist()
+        values = np.array([raw[start:end].decode('utf-8') for start, end in zip(starts, ends)], dtype=object)
+        return values[remap[codes]]
+
+
+class DataWarehouse:
+    """Local columnar store for historical GSC rows.
+
+    Rows are partitioned by site and month. Each partition is a directory of
+    ``.npy`` column files sorted by date; string columns are dictionary
+    encoded. Partitions are memory-mapped on load, so queries only touch the
+    partitions, columns and row ranges they actually need.
+    """
+
+    DIMENSIONS = ['date', 'query', 'page', 'country', 'device']
+    STRING_COLUMNS = ['query', 'page', 'country', 'device']
+    METRIC_COLUMNS = {
+        'clicks': np.int64,
+        'impressions': np.int64,
+        'ctr': np.float64,
+        'position': np.float64
+    }
+    COLUMNS = DIMENSIONS + list(METRIC_COLUMNS)
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    # ----- Layout -----
+    def site_dir(self, site_url):
+        """Directory holding all partitions of a site"""
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', site_url).strip('_')[:60]
+        digest = hashlib.sha1(site_url.encode('utf-8')).hexdigest()[:8]
+        return os.path.join(self.root_dir, f"{slug}_{digest}")
+
+    def _partition_dir(self, site_url, month):
+        return os.path.join(self.site_dir(site_url), month)
+
+    def _months_between(self, start_date, end_date):
+        months = []
+        year, month = start_date.year, start_date.month
+        while (year, month) <= (end_date.year, end_date.month):
+            months.append(f"{year:04d}-{month:02d}")
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return months
+
+    def list_months(self, site_url):
+        """List stored month partitions for a site"""
+        site_dir = self.site_dir(site_url)
+        if not os.path.isdir(site_dir):
+            return []
+        return sorted(name for name in os.listdir(site_dir)
+                      if re.fullmatch(r'\d{4}-\d{2}', name))
+
+    def history_version(self, site_url):
+        """Signature of a site's stored partitions that changes whenever one is rewritten"""
+        version = []
+        for month in self.list_months(site_url):
+            meta_path = os.path.join(self._partition_dir(site_url, month), 'meta.json')
+            if os.path.exists(meta_path):
+                version.append((month, os.stat(meta_path).st_mtime_ns))
+        return tuple(version)
+
+    def _read_meta(self, partition_dir):
+        meta_path = os.path.join(partition_dir, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, 'r') as f:
+            return json.load(f)
+
+    # ----- Writing -----
+    def store(self, site_url, df, dimensions=None, start_date=None, end_date=None, row_limit=None,
+              truncated=False):
+        """Store fetched rows, replacing any existing rows for the same dates.
+
+        When the fetched range is given, every day in it is recorded as
+        covered, including days for which the API returned no rows. Each
+        day also records the fetch's row limit and whether the fetch hit
+        it, so covers() never serves a truncated top-rows subset.
+        """
+        dimensions = dimensions or self.DIMENSIONS
+        if 'date' not in dimensions:
+            return 0
+        fetched_dates = set()
+        if start_date is not None and end_date is not None:
+            fetched_dates = set(pd.date_range(start_date, end_date).strftime('%Y-%m-%d'))
+
+        df = self._normalize(df)
+        month_numbers = (df['date'].dt.year * 100 + df['date'].dt.month).to_numpy()
+        grouped = {f"{number // 100:04d}-{number % 100:02d}": month_df
+                   for number, month_df in df.groupby(month_numbers, sort=True)}
+        months = sorted(set(grouped) | {day[:7] for day in fetched_dates})
+        stored = 0
+        for month in months:
+            month_df = grouped.get(month, df.iloc[0:0])
+            partition_dir = self._partition_dir(site_url, month)
+            existing = self._load_partition(partition_dir, self.COLUMNS)
+            meta = self._read_meta(partition_dir) or {}
+            new_dates = set(pd.DatetimeIndex(month_df['date'].unique()).strftime('%Y-%m-%d'))
+            new_dates |= {day for day in fetched_dates if day.startswith(month)}
+
+            row_limits = {day: row_limit for day in new_dates}
+            truncated_dates = set(new_dates) if truncated else set()
+            if existing is not None and meta.get('dimensions') == list(dimensions):
+                existing = existing[~existing['date'].isin(pd.to_datetime(sorted(new_dates)))]
+                merged = pd.concat([existing, month_df], ignore_index=True)
+                covered_dates = sorted(set(meta.get('dates', [])) | new_dates)
+                # Days kept from earlier fetches keep the limits they were fetched with
+                row_limits = {**meta.get('row_limits', {}), **row_limits}
+                truncated_dates |= set(meta.get('truncated_dates', [])) - new_dates
+            else:
+                merged = month_df
+                covered_dates = sorted(new_dates)
+
+            self._write_partition(partition_dir, merged, {
+                'site_url': site_url,
+                'month': month,
+                'dimensions': list(dimensions),
+                'dates': covered_dates,
+                'row_limits': row_limits,
+                'truncated_dates': sorted(truncated_dates),
+                'rows': len(merged)
+            })
+            stored += len(month_df)
+
+        # Cubes were built from the rows just replaced
+        shutil.rmtree(os.path.join(self.site_dir(site_url), 'cubes'), ignore_errors=True)
+        print(f"💾 Stored {stored:,} rows for {site_url} in warehouse")
+        return stored
+
+    def _normalize(self, df):
+        normalized = pd.DataFrame({'date': pd.to_datetime(df['date']).astype('datetime64[s]')})
+        for column in self.STRING_COLUMNS:
+            normalized[column] = df[column].fillna('').astype(str) if column in df.columns else ''
+        for column, dtype in self.METRIC_COLUMNS.items():
+            normalized[column] = df[column].fillna(0).astype(dtype) if column in df.columns else dtype(0)
+        return normalized
+
+    def _write_partition(self, partition_dir, df, meta):
+        df = df.sort_values('date', kind='stable').reset_index(drop=True)
+        tmp_dir = partition_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        np.save(os.path.join(tmp_dir, 'date.npy'),
+                df['date'].to_numpy().astype('datetime64[D]'))
+        for column in self.STRING_COLUMNS:
+            codes, values = pd.factorize(df[column], sort=True)
+            _StringDictionary.save(os.path.join(tmp_dir, column), list(values))
+            np.save(os.path.join(tmp_dir, f"{column}.codes.npy"), codes.astype(np.int32))
+        for column, dtype in self.METRIC_COLUMNS.items():
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), df[column].to_numpy(dtype=dtype))
+        # Per-day quantile and distinct-count sketches for long-range statistics
+        SketchSet.save_daily(os.path.join(tmp_dir, 'sketches.npz'), SketchSet.daily(df))
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        # Swap the new partition in place of the old one
+        old_dir = partition_dir + '.old'
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(partition_dir):
+            os.replace(partition_dir, old_dir)
+        os.replace(tmp_dir, partition_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    # ----- Reading -----
+    def covers(self, site_url, start_date, end_date, dimensions=None, row_limit=None):
+        """Check whether every date in the range has been stored completely.
+
+        Days from a fetch that hit its row limit hold only the top rows and
+        never count; with row_limit, days fetched with a smaller limit (or
+        with no recorded limit) do not count either.
+        """
+        dimensions = list(dimensions or self.DIMENSIONS)
+        needed = set(pd.date_range(start_date, end_date).strftime('%Y-%m-%d'))
+        covered = set()
+        for month in self._months_between(start_date, end_date):
+            meta = self._read_meta(self._partition_dir(site_url, month))
+            if not meta or meta.get('dimensions') != dimensions:
+                continue
+            truncated_dates = set(meta.get('truncated_dates', []))
+            row_limits = meta.get('row_limits', {})
+            for day in meta.get('dates', []):
+                if day in truncated_dates:
+                    continue
+                if row_limit is not None and (row_limits.get(day) is None or row_limits[day] < row_limit):
+                    continue
+                covered.add(day)
+        return needed <= covered
+
+    def load(self, site_url, start_date, end_date, columns=None, devices=None,
+             countries=None, page_prefix=None, queries=None):
+        """Load rows for a date range, pushing filters down to the partitions"""
+        columns = list(columns or self.COLUMNS)
+        frames = []
+        for month in self._months_between(start_date, end_date):
+            partition_dir = self._partition_dir(site_url, month)
+            frame = self._load_partition(
+                partition_dir, columns, start_date=start_date, end_date=end_date,
+                devices=devices, countries=countries, page_prefix=page_prefix, queries=queries
+            )
+            if frame is not None and not frame.empty:
+                frames.append(frame)
+
+        if not frames:
+            return pd.DataFrame({column: [] for column in columns})
+        return pd.concat(frames, ignore_index=True)
+
+    def _load_partition(self, partition_dir, columns, start_date=None, end_date=None,
+                        devices=None, countries=None, page_prefix=None, queries=None):
+        if not os.path.exists(os.path.join(partition_dir, 'meta.json')):
+            return None
+
+        # Date range -> row slice (partitions are sorted by date)
+        dates = np.load(os.path.join(partition_dir, 'date.npy'), mmap_mode='r')
+        lo, hi = 0, len(dates)
+        if start_date is not None:
+            lo = int(np.searchsorted(dates, np.datetime64(start_date, 'D'), side='left'))
+        if end_date is not None:
+            hi = int(np.searchsorted(dates, np.datetime64(end_date, 'D'), side='right'))
+        if lo >= hi:
+            return pd.DataFrame({column: [] for column in columns})
+
+        # Resolve string predicates against the dictionaries, then filter codes
+        mask = None
+        dictionaries = {}
+        predicates = {
+            'device': (devices, False),
+            'country': (countries, False),
+            'query': (queries, False),
+            'page': ([page_prefix] if page_prefix else None, True)
+        }
+        for column, (values, is_prefix) in predicates.items():
+            if not values:
+                continue
+            dictionary = dictionaries[column] = _StringDictionary.load(os.path.join(partition_dir, column))
+            codes = np.load(os.path.join(partition_dir, f"{column}.codes.npy"), mmap_mode='r')[lo:hi]
+            if is_prefix:
+                code_lo, code_hi = dictionary.prefix_range(values[0])
+                column_mask = (codes >= code_lo) & (codes < code_hi)
+            else:
+                wanted = [dictionary.code_of(value) for value in values]
+                column_mask = np.isin(codes, [code for code in wanted if code >= 0])
+            mask = column_mask if mask is None else (mask & column_mask)
+
+        rows = np.arange(lo, hi) if mask is None else np.flatnonzero(mask) + lo
+
+        data = {}
+        for column in columns:
+            if column == 'date':
+                data['date'] = np.asarray(dates[rows]).astype('datetime64[ns]')
+            elif column in self.STRING_COLUMNS:
+                dictionary = dictionaries.get(column) or _StringDictionary.load(os.path.join(partition_dir, column))
+                codes = np.load(os.path.join(partition_dir, f"{column}.codes.npy"), mmap_mode='r')
+                data[column] = dictionary.decode(np.asarray(codes[rows]))
+            elif column in self.METRIC_COLUMNS:
+                values = np.load(os.path.join(partition_dir, f"{column}.npy"), mmap_mode='r')
+                data[column] = np.asarray(values[rows])
+        return pd.DataFrame(data, columns=columns)
+
+    def load_sketches(self, site_url, start_date, end_date):
+        """Merge the stored per-day sketches of a date range, or None if a partition has none"""
+        merged = None
+        for month in self._months_between(start_date, end_date):
+            path = os.path.join(self._partition_dir(site_url, month), 'sketches.npz')
+            if not os.path.exists(path):
+                return None
+            sketches = SketchSet.load_range(path, start_date, end_date)
+            merged = sketches if merged is None else merged.merge(sketches)
+        return merged
+
+    def store_daily_totals(self, site_url, daily, start_date, end_date):
+        """Store exact per-date totals from the aggregate query"""
+        path = os.path.join(self.site_dir(site_url), 'daily_totals.json')
+        stored = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                stored = json.load(f)
+        # Days without any search data are absent from the response
+        for day in pd.date_range(start_date, end_date).strftime('%Y-%m-%d'):
+            stored[day] = [0, 0, 0.0, 0.0]
+        for day, clicks, impressions, ctr, position in zip(
+                pd.to_datetime(daily['date']).dt.strftime('%Y-%m-%d'), daily['clicks'],
+                daily['impressions'], daily['ctr'], daily['position']):
+            stored[day] = [int(clicks), int(impressions), float(ctr), float(position)]
+        os.makedirs(self.site_dir(site_url), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(stored, f)
+
+    def load_daily_totals(self, site_url, start_date, end_date):
+        """Load stored per-date totals, or None if any date in the range is missing"""
+        path = os.path.join(self.site_dir(site_url), 'daily_totals.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            stored = json.load(f)
+        days = pd.date_range(start_date, end_date).strftime('%Y-%m-%d')
+        if any(day not in stored for day in days):
+            return None
+        values = [stored[day] for day in days]
+        return pd.DataFrame({
+            'date': pd.to_datetime(days),
+            'clicks': [value[0] for value in values],
+            'impressions': [value[1] for value in values],
+            'ctr': [value[2] for value in values],
+            'position': [value[3] for value in values]
+        })
+
+    # ----- Rollup cubes -----
+    def _cube_dir(self, site_url, start_date, end_date):
+        return os.path.join(self.site_dir(site_url), 'cubes', f"{start_date:%Y-%m-%d}_{end_date:%Y-%m-%d}")
+
+    def store_cube(self, site_url, start_date, end_date, cube):
+        """Store the rollup cube of an unfiltered date range next to its partitions"""
+        cube_dir = self._cube_dir(site_url, start_date, end_date)
+        tmp_dir = cube_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        for name, rollup in cube.rollups.items():
+            prefix = os.path.join(tmp_dir, name)
+            for key in rollup.keys:
+                np.save(f"{prefix}.{key}.codes.npy", rollup.codes[key].astype(np.int32))
+                if key == 'date':
+                    np.save(f"{prefix}.{key}.values.npy", rollup.dictionaries[key])
+                else:
+                    _StringDictionary.save(f"{prefix}.{key}", list(rollup.dictionaries[key]))
+            for metric, values in rollup.metrics.items():
+                np.save(f"{prefix}.{metric}.npy", values)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump({name: list(rollup.keys) for name, rollup in cube.rollups.items()}, f)
+
+        shutil.rmtree(cube_dir, ignore_errors=True)
+        os.replace(tmp_dir, cube_dir)
+
+    def load_cube(self, site_url, start_date, end_date):
+        """Load a stored rollup cube for exactly this date range, or None"""
+        cube_dir = self._cube_dir(site_url, start_date, end_date)
+        meta = self._read_meta(cube_dir)
+        if meta is None:
+            return None
+
+        rollups = {}
+        for name, keys in meta.items():
+            prefix = os.path.join(cube_dir, name)
+            codes, dictionaries = {}, {}
+            for key in keys:
+                codes[key] = np.load(f"{prefix}.{key}.codes.npy", mmap_mode='r')
+                if key == 'date':
+                    dictionaries[key] = np.load(f"{prefix}.{key}.values.npy")
+                else:
+                    dictionary = _StringDictionary.load(f"{prefix}.{key}")
+                    dictionaries[key] = dictionary.decode(np.arange(len(dictionary)))
+            metrics = {metric: np.load(f"{prefix}.{metric}.npy", mmap_mode='r') for metric in Rollup.METRICS}
+            rollups[name] = Rollup(keys, codes, dictionaries, metrics)
+        return RollupCube(rollups)
+
+    def clear_site(self, site_url):
+        """Remove all stored partitions for a site"""
+        shutil.rmtree(self.site_dir(site_url), ignore_errors=True)
@@ -0,0 +1,94 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+
+
+class FetchJob:
+    """On-disk progress of one detail fetch.
+
+    Every API page is written to its own file as soon as it arrives and the
+    manifest records how many pages and rows are stored, so a job interrupted
+    by an error, a dropped connection or an app restart continues from the
+    next missing page.
+    """
+
+    def __init__(self, job_dir, manifest):
+        self.job_dir = job_dir
+        self.manifest = manifest
+
+    @property
+    def saved_rows(self):
+        return self.manifest['rows']
+
+    def saved_pages(self):
+        """Rows of each stored page, in request order"""
+        for page in range(self.manifest['pages']):
+            with open(self._page_path(page), 'r') as f:
+                yield json.load(f)
+
+    def save_page(self, rows):
+        self._write_json(self._page_path(self.manifest['pages']), rows)
+        self.manifest['pages'] += 1
+        self.manifest['rows'] += len(rows)
+        self._save_manifest()
+
+    def discard(self):
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+
+    def _page_path(self, page):
+        return os.path.join(self.job_dir, f"page-{page:05d}.json")
+
+    def _save_manifest(self):
+        self._write_json(os.path.join(self.job_dir, 'manifest.json'), self.manifest)
+
+    @staticmethod
+    def _write_json(path, value):
+        # Write then rename, so a crash never leaves a half-written file behind
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(value, f)
+        os.replace(temp_path, path)
+
+
+class FetchCheckpoints:
+    """Directory of resumable fetch jobs, one per distinct request.
+
+    A job is identified by site, date range, dimensions, row limit and
+    filters, so fetching the same data again picks up the stored pages and
+    continues the same query at the startRow after them; a resumed job
+    returns exactly what an uninterrupted one would. Jobs older than
+    max_age_hours are restarted because fresh Search Console data changes
+    between runs, which would shift the pages.
+    """
+
+    def __init__(self, root_dir, max_age_hours=24):
+        self.root_dir = root_dir
+        self.max_age_hours = max_age_hours
+        os.makedirs(root_dir, exist_ok=True)
+
+    def job_key(self, site_url, start_date, end_date, dimensions, row_limit, request_filters):
+        request = json.dumps([site_url, start_date.isoformat(), end_date.isoformat(), list(dimensions),
+                              row_limit, request_filters], sort_keys=True)
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()[:32]
+
+    def open(self, site_url, start_date, end_date, dimensions, row_limit, request_filters=None):
+        """The stored job for this request, or a new one"""
+        key = self.job_key(site_url, start_date, end_date, dimensions, row_limit, request_filters)
+        job_dir = os.path.join(self.root_dir, key)
+        manifest_path = os.path.join(job_dir, 'manifest.json')
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r') as f:
+                    manifest = json.load(f)
+                if time.time() - manifest['created'] <= self.max_age_hours * 3600:
+                    return FetchJob(job_dir, manifest)
+            except (OSError, ValueError, KeyError):
+                pass
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+        os.makedirs(job_dir, exist_ok=True)
+        job = FetchJob(job_dir, {'site_url': site_url, 'created': time.time(), 'pages': 0, 'rows': 0})
+        job._save_manifest()
+        return job
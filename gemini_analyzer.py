@@ -1,11 +1,25 @@
 import google.generativeai as genai
 import pandas as pd
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
 from PyQt5.QtCore import QObject, pyqtSignal
-from data_models import AnalysisResult, Suggestion
+from data_models import AnalysisResult, Suggestion, data_points_to_dataframe
+from tracing import tracer, traced
+from trend_engine import TrendEngine, fitted_change_percent
+from anomaly_detector import AnomalyDetector
+from query_page_index import QueryPageIndex
+from query_classifier import QueryClassifier, segment_summary
+from url_trie import UrlTrie
+from sketches import exact_distribution
+from single_flight import SingleFlight
+import hashlib
+import json
+import os
 import time
 import sys
 import re
+from urllib.parse import urlsplit
 
 class GeminiAnalyzer(QObject):
     analysis_complete = pyqtSignal(AnalysisResult)
@@ -14,6 +28,9 @@ class GeminiAnalyzer(QObject):
     status_update = pyqtSignal(str)
     initialization_complete = pyqtSignal(bool)
     
+    # Segments available for map-reduce analysis
+    PARTITION_SEGMENTS = ['directory', 'device', 'country', 'query_cluster']
+    
     def __init__(self, api_key=None):
         super().__init__()
         self.api_key = api_key
@@ -21,6 +38,16 @@ class GeminiAnalyzer(QObject):
         self.is_initialized = False
         self.available_models = []
         self.working_model_name = None
+        self.max_concurrent_requests = 4
+        self.max_partitions = 8
+        self.partial_cache = {}
+        self.cache_dir = None
+        # Identical prompts sent at the same time share one model call
+        self.in_flight = SingleFlight()
+        self.record_replay = None
+        self.trend_engine = TrendEngine()
+        self.anomaly_detector = AnomalyDetector()
+        self.query_classifier = QueryClassifier()
         print("🔧 Initializing GeminiAnalyzer...")
         self.initialize_gemini(api_key)
     
@@ -134,8 +161,42 @@ class GeminiAnalyzer(QObject):
         else:
             return "❌ No API key configured"
     
-    def analyze_data(self, data_points, site_url):
-        """Analyze GSC data using Gemini AI"""
+    def set_cache_dir(self, cache_dir):
+        """Persist partial map-reduce results in this directory"""
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+    
+    def set_record_replay(self, record_replay):
+        """Record model responses to disk, or replay them without network access"""
+        self.record_replay = record_replay
+        if record_replay is not None and record_replay.mode == 'replay':
+            self.model = record_replay.wrap_model(None)
+            self.working_model_name = f"replay ({record_replay.cassette_dir})"
+            self.is_initialized = True
+            self.status_update.emit(f"✅ Replaying recorded responses from {record_replay.cassette_dir}")
+    
+    def set_query_classifier(self, query_classifier):
+        """Use these brand/intent rules when classifying queries"""
+        self.query_classifier = query_classifier
+    
+    @traced('analysis.classify_queries', rows=len)
+    def classify_queries(self, df):
+        """Copy of df with query_class (brand/non-brand) and query_intent columns"""
+        return self.query_classifier.apply(df)
+    
+    @traced('analysis')
+    def analyze_data(self, data_points, site_url, totals=None, partition_by=None,
+                     concurrent_suggestions=False, sketches=None):
+        """Analyze GSC data using Gemini AI.
+        
+        With partition_by set to one of PARTITION_SEGMENTS, the analysis runs
+        in map-reduce mode: one concurrent request per segment, merged by a
+        final reduce request. With concurrent_suggestions, the suggestions
+        request is built from local data insights and sent alongside the
+        analysis request instead of after it. With sketches (a SketchSet of
+        the loaded range from the warehouse), impression/CTR thresholds and
+        distinct counts are estimated from the sketches instead of the rows.
+        """
         print("🔍 Starting data analysis...")
         
         if not self.is_available():
@@ -158,15 +219,25 @@ class GeminiAnalyzer(QObject):
                 return
             
             print(f"📊 Data prepared: {len(df)} rows, {len(df.columns)} columns")
+            distribution = self._data_distribution(df, sketches)
+            
+            if concurrent_suggestions:
+                self._analyze_with_concurrent_suggestions(df, site_url, totals, partition_by, distribution)
+                self.status_update.emit("Analysis complete!")
+                print("🎉 Analysis complete!")
+                return
             
             # Generate comprehensive analysis
             self.status_update.emit("Creating detailed analysis...")
-            analysis_result = self._generate_comprehensive_analysis(df, site_url)
+            if partition_by:
+                analysis_result = self._generate_map_reduce_analysis(df, site_url, partition_by, totals, distribution)
+            else:
+                analysis_result = self._generate_comprehensive_analysis(df, site_url, totals, distribution=distribution)
             self.analysis_complete.emit(analysis_result)
             
             # Generate detailed suggestions based on actual data patterns
             self.status_update.emit("Generating detailed suggestions...")
-            self._generate_detailed_suggestions(df, analysis_result, site_url)
+            self._generate_detailed_suggestions(df, analysis_result, site_url, distribution)
             
             self.status_update.emit("Analysis complete!")
             print("🎉 Analysis complete!")
@@ -177,11 +248,90 @@ class GeminiAnalyzer(QObject):
             self.error_occurred.emit(error_msg)
             self.status_update.emit("Analysis failed")
 
-    def _generate_comprehensive_analysis(self, df, site_url):
+    @traced('analysis.distribution')
+    def _data_distribution(self, df, sketches=None):
+        """Row-level thresholds and distinct counts, from sketches when available"""
+        return sketches.distribution() if sketches is not None else exact_distribution(df)
+
+    def _analyze_with_concurrent_suggestions(self, df, site_url, totals=None, partition_by=None, distribution=None):
+        """Send the analysis and suggestions requests at the same time, then reconcile"""
+        data_insights = self._perform_deep_data_analysis(df, totals, distribution)
+        preliminary = self._create_preliminary_analysis(data_insights, site_url)
+        
+        self.status_update.emit("Creating analysis and suggestions in parallel...")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            suggestions_future = executor.submit(self._request_detailed_suggestions, df, preliminary, site_url,
+                                                 data_insights['distribution'])
+            if partition_by:
+                analysis_future = executor.submit(self._generate_map_reduce_analysis, df, site_url, partition_by, totals,
+                                                  data_insights=data_insights)
+            else:
+                analysis_future = executor.submit(self._generate_comprehensive_analysis, df, site_url, totals, data_insights)
+            
+            analysis_result = analysis_future.result()
+            self.analysis_complete.emit(analysis_result)
+            
+            try:
+                suggestions = suggestions_future.result()
+            except Exception as e:
+                print(f"❌ Detailed suggestion generation failed: {e}")
+                suggestions = None
+        
+        if suggestions:
+            self.suggestions_generated.emit(self._reconcile_suggestions(suggestions, analysis_result))
+        else:
+            # Fall back to basic suggestions built from the final analysis
+            self._generate_basic_suggestions(df, analysis_result, site_url)
+    
+    def _create_preliminary_analysis(self, data_insights, site_url):
+        """Summarize local data insights in the shape of an AnalysisResult"""
+        metrics = data_insights['performance_metrics']
+        summary = (f"Data-driven overview for {site_url}: {metrics['total_clicks']:,} clicks from "
+                   f"{metrics['total_impressions']:,} impressions, {metrics['click_through_quality']} CTR at "
+                   f"{metrics['avg_ctr']:.2f}%, {metrics['position_performance']} average position at "
+                   f"{metrics['avg_position']:.2f}.")
+        
+        trend_lines = self._format_trend_analysis(data_insights['trend_analysis']).strip().split('\n')
+        opportunity_lines = self._format_opportunity_areas(data_insights['opportunity_areas']).strip().split('\n')[1:]
+        
+        issues = []
+        devices = data_insights['technical_insights'].get('devices', {})
+        if devices:
+            worst_device = min(devices, key=lambda device: devices[device].get('ctr', 0))
+            issues.append(f"{worst_device} has the lowest CTR ({devices[worst_device].get('ctr', 0):.2f}%)")
+        if data_insights['trend_analysis'].get('click_growth', 0) < 0:
+            issues.append(f"Clicks are declining ({data_insights['trend_analysis']['click_growth']:+.1f}%)")
+        
+        return AnalysisResult(
+            summary=summary,
+            trends=[line.lstrip('- ') for line in trend_lines if line.strip()],
+            opportunities=[line.lstrip('- ') for line in opportunity_lines if line.strip()],
+            issues=issues,
+            recommendations=[]
+        )
+    
+    def _reconcile_suggestions(self, suggestions, analysis_result):
+        """Order suggestions by priority and by overlap with the final analysis"""
+        priority_rank = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
+        focus_words = set()
+        for item in analysis_result.issues + analysis_result.opportunities:
+            focus_words.update(word for word in re.findall(r'[a-z]{4,}', item.lower()))
+        
+        def overlap(suggestion):
+            words = set(re.findall(r'[a-z]{4,}', f"{suggestion.title} {suggestion.description}".lower()))
+            return len(words & focus_words)
+        
+        return sorted(suggestions, key=lambda suggestion: (
+            priority_rank.get(suggestion.priority.split()[0] if suggestion.priority else '', 2),
+            -overlap(suggestion)
+        ))
+    
+    def _generate_comprehensive_analysis(self, df, site_url, totals=None, data_insights=None, distribution=None):
         """Generate comprehensive analysis using Gemini AI with enhanced data insights"""
         try:
             # Perform deep data analysis first
-            data_insights = self._perform_deep_data_analysis(df)
+            if data_insights is None:
+                data_insights = self._perform_deep_data_analysis(df, totals, distribution)
             
             # Create enhanced prompt for Gemini
             prompt = self._create_enhanced_analysis_prompt(df, site_url, data_insights)
@@ -201,7 +351,225 @@ class GeminiAnalyzer(QObject):
             print(f"❌ Comprehensive analysis failed: {e}")
             return self._create_fallback_analysis(df, str(e))
 
-    def _perform_deep_data_analysis(self, df):
+    def _generate_map_reduce_analysis(self, df, site_url, partition_by, totals=None, distribution=None,
+                                      data_insights=None):
+        """Analyze each segment concurrently, then merge the partial results"""
+        try:
+            partitions = self._partition_dataframe(df, partition_by)
+            print(f"🧩 Map-reduce analysis over {len(partitions)} {partition_by} partitions")
+            self.status_update.emit(f"Analyzing {len(partitions)} segments by {partition_by}...")
+            
+            # Map: one bounded-concurrency request per partition
+            with ThreadPoolExecutor(max_workers=self.max_concurrent_requests) as executor:
+                futures = {
+                    name: executor.submit(self._analyze_partition, part_df, site_url, partition_by, name)
+                    for name, part_df in partitions.items()
+                }
+                partials = {name: future.result() for name, future in futures.items()}
+            
+            # Reduce: merge partial results into one analysis
+            if data_insights is None:
+                data_insights = self._perform_deep_data_analysis(df, totals, distribution)
+            self.status_update.emit("Merging segment analyses...")
+            prompt = self._create_reduce_prompt(df, site_url, partition_by, data_insights, partials)
+            response = self._safe_generate_content(prompt)
+            
+            if not response or not response.text:
+                return self._merge_partial_results(partials, data_insights, site_url)
+            
+            return self._parse_enhanced_analysis_response(response.text, data_insights)
+            
+        except Exception as e:
+            print(f"❌ Map-reduce analysis failed: {e}")
+            return self._create_fallback_analysis(df, str(e))
+    
+    def _partition_dataframe(self, df, partition_by):
+        """Split the data into segments, keeping the largest by clicks"""
+        if partition_by == 'directory':
+            keys = df['page'].str.extract(r'^[a-z]+://[^/]+(/[^/?#]*)', expand=False).fillna('/')
+        elif partition_by == 'query_cluster':
+            # Cluster queries by their head term
+            keys = df['query'].str.split(n=1).str[0].fillna('(none)')
+        elif partition_by in ('device', 'country'):
+            keys = df[partition_by].replace('', '(none)')
+        else:
+            raise ValueError(f"Unknown partition segment: {partition_by}")
+        
+        keys = keys.replace('', '(none)')
+        top_keys = df.groupby(keys)['clicks'].sum().sort_values(ascending=False).index[:self.max_partitions]
+        keys = keys.where(keys.isin(top_keys), '(other)')
+        return {name: part_df for name, part_df in df.groupby(keys, sort=False)}
+    
+    def _analyze_partition(self, part_df, site_url, partition_by, name):
+        """Map step: analyze one segment, reusing cached partial results"""
+        insights = self._perform_deep_data_analysis(part_df)
+        prompt = self._create_partition_prompt(part_df, site_url, partition_by, name, insights)
+        cache_key = hashlib.sha256(f"{self.working_model_name}\n{prompt}".encode('utf-8')).hexdigest()
+        
+        cached = self._load_partial_result(cache_key)
+        if cached is not None:
+            print(f"♻️ Using cached analysis for {partition_by}={name}")
+            return cached
+        
+        response = self._safe_generate_content(prompt)
+        if not response or not response.text:
+            # Not cached, so the model is asked again on the next run
+            return self._generate_analysis_from_data_insights(insights, f"{site_url} ({partition_by}: {name})")
+        result = self._parse_enhanced_analysis_response(response.text, insights)
+        self._store_partial_result(cache_key, result)
+        return result
+    
+    def _load_partial_result(self, cache_key):
+        if cache_key in self.partial_cache:
+            return self.partial_cache[cache_key]
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, f"{cache_key}.json")
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    result = AnalysisResult(**json.load(f))
+                self.partial_cache[cache_key] = result
+                return result
+        return None
+    
+    def _store_partial_result(self, cache_key, result):
+        self.partial_cache[cache_key] = result
+        if self.cache_dir:
+            with open(os.path.join(self.cache_dir, f"{cache_key}.json"), 'w') as f:
+                json.dump(asdict(result), f)
+    
+    @traced('prompt.build_partition', chars=len)
+    def _create_partition_prompt(self, df, site_url, partition_by, name, data_insights):
+        """Create a focused prompt for a single segment"""
+        metrics = data_insights['performance_metrics']
+        return f"""
+# SEGMENT SEO ANALYSIS REQUEST
+
+## WEBSITE: {site_url}
+## SEGMENT: {partition_by} = {name}
+
+## DATA OVERVIEW:
+- Analysis Period: {df['date'].min():%Y-%m-%d} to {df['date'].max():%Y-%m-%d} ({df['date'].nunique()} days)
+- Data Points: {len(df):,}
+- Clicks: {metrics['total_clicks']:,}
+- Impressions: {metrics['total_impressions']:,}
+- Average CTR: {metrics['avg_ctr']:.2f}%
+- Average Position: {metrics['avg_position']:.2f}
+
+## TREND ANALYSIS:
+{self._format_trend_analysis(data_insights['trend_analysis'])}
+
+## TOP MOVERS (least-squares trend per query/page):
+{self._format_entity_trends(data_insights.get('entity_trends'))}
+
+## ANOMALIES (largest unexpected drops by page/device/country):
+{self._format_anomalies(data_insights.get('anomalies'))}
+
+## QUERY SEGMENTS (brand vs non-brand, search intent):
+{self._format_query_segments(data_insights.get('query_segments'))}
+
+## SITE SECTIONS (URL hierarchy rollup):
+{self._format_site_sections(data_insights.get('site_sections'))}
+
+## CONTENT PERFORMANCE:
+{self._format_content_analysis(data_insights['content_analysis'])}
+
+## TECHNICAL INSIGHTS:
+{self._format_technical_insights(data_insights['technical_insights'])}
+
+## IDENTIFIED OPPORTUNITIES:
+{self._format_opportunity_areas(data_insights['opportunity_areas'])}
+
+## ANALYSIS REQUEST:
+
+As an expert SEO strategist, analyze ONLY this segment. Be concise and specific,
+and use these section headings with bullet points:
+
+### EXECUTIVE SUMMARY:
+[2-3 sentences on how this segment performs]
+
+### PERFORMANCE TRENDS (3-5 trends):
+### STRATEGIC OPPORTUNITIES (3-5 opportunities):
+### CRITICAL ISSUES (2-4 issues):
+### COMPREHENSIVE RECOMMENDATIONS (3-5 actions):
+"""
+    
+    @traced('prompt.build_reduce', chars=len)
+    def _create_reduce_prompt(self, df, site_url, partition_by, data_insights, partials):
+        """Create the prompt that merges segment analyses into one"""
+        segments = ""
+        for name, result in partials.items():
+            segments += f"\n### {partition_by.upper()}: {name}\n"
+            segments += f"Summary: {result.summary[:600]}\n"
+            for label, items in [('Trends', result.trends), ('Opportunities', result.opportunities),
+                                 ('Issues', result.issues), ('Recommendations', result.recommendations)]:
+                if items:
+                    segments += f"{label}:\n" + "\n".join(f"- {item}" for item in items[:5]) + "\n"
+        
+        metrics = data_insights['performance_metrics']
+        return f"""
+# COMPREHENSIVE SEO ANALYSIS REQUEST (MERGE OF SEGMENT ANALYSES)
+
+## WEBSITE: {site_url}
+
+## DATA OVERVIEW:
+- Analysis Period: {df['date'].min():%Y-%m-%d} to {df['date'].max():%Y-%m-%d} ({df['date'].nunique()} days)
+- Total Data Points: {len(df):,}
+{self._format_distinct_counts(data_insights.get('distribution'))}
+- Segmented By: {partition_by} ({len(partials)} segments)
+
+## PERFORMANCE METRICS:
+- Total Clicks: {metrics['total_clicks']:,}
+- Total Impressions: {metrics['total_impressions']:,}
+- Average CTR: {metrics['avg_ctr']:.2f}% ({metrics['click_through_quality']})
+- Average Position: {metrics['avg_position']:.2f} ({metrics['position_performance']})
+{self._format_totals_note(metrics)}
+
+## TREND ANALYSIS:
+{self._format_trend_analysis(data_insights['trend_analysis'])}
+
+## TOP MOVERS (least-squares trend per query/page):
+{self._format_entity_trends(data_insights.get('entity_trends'))}
+
+## ANOMALIES (largest unexpected drops by page/device/country):
+{self._format_anomalies(data_insights.get('anomalies'))}
+
+## QUERY SEGMENTS (brand vs non-brand, search intent):
+{self._format_query_segments(data_insights.get('query_segments'))}
+
+## SITE SECTIONS (URL hierarchy rollup):
+{self._format_site_sections(data_insights.get('site_sections'))}
+
+## SEGMENT ANALYSES:
+{segments}
+
+## ANALYSIS REQUEST:
+
+As an expert SEO strategist with 15+ years of experience, merge the segment analyses above
+into ONE site-wide analysis. Compare segments against each other, call out the segments that
+drive or drag performance, and remove duplicates. Use exactly these sections:
+
+### EXECUTIVE SUMMARY:
+[3-4 paragraphs covering overall performance, strongest and weakest segments, and outlook]
+
+### PERFORMANCE TRENDS (7-10 specific trends):
+### STRATEGIC OPPORTUNITIES (8-12 detailed opportunities):
+### CRITICAL ISSUES (6-8 prioritized issues):
+### COMPREHENSIVE RECOMMENDATIONS (10-15 specific actions):
+"""
+    
+    def _merge_partial_results(self, partials, data_insights, site_url):
+        """Merge segment results locally when the reduce request fails"""
+        merged = self._generate_analysis_from_data_insights(data_insights, site_url)
+        for name, result in partials.items():
+            merged.summary += f"\n[{name}] {result.summary[:300]}"
+            merged.trends.extend(f"[{name}] {item}" for item in result.trends[:2])
+            merged.opportunities.extend(f"[{name}] {item}" for item in result.opportunities[:2])
+            merged.issues.extend(f"[{name}] {item}" for item in result.issues[:2])
+            merged.recommendations.extend(f"[{name}] {item}" for item in result.recommendations[:2])
+        return merged
+    
+    @traced('analysis.deep_data_analysis')
+    def _perform_deep_data_analysis(self, df, totals=None, distribution=None):
         """Perform deep data analysis to extract maximum insights"""
         insights = {
             'performance_metrics': {},
@@ -209,17 +577,32 @@ class GeminiAnalyzer(QObject):
             'content_analysis': {},
             'technical_insights': {},
             'opportunity_areas': {},
-            'competitive_analysis': {}
+            'competitive_analysis': {},
+            'entity_trends': {},
+            'anomalies': [],
+            'query_segments': {},
+            'site_sections': {},
+            'distribution': {}
         }
         
         if df.empty:
             return insights
         
+        # Thresholds shared by the opportunity checks, computed once per frame
+        insights['distribution'] = distribution if distribution is not None else exact_distribution(df)
+        
         # Basic performance metrics
-        total_clicks = df['clicks'].sum()
-        total_impressions = df['impressions'].sum()
-        avg_ctr = df['ctr'].mean()
-        avg_position = df['position'].mean()
+        if totals is not None:
+            # Exact totals from the aggregate queries (not truncated or anonymized)
+            total_clicks = totals.clicks
+            total_impressions = totals.impressions
+            avg_ctr = totals.ctr
+            avg_position = totals.position
+        else:
+            total_clicks = df['clicks'].sum()
+            total_impressions = df['impressions'].sum()
+            avg_ctr = df['ctr'].mean()
+            avg_position = df['position'].mean()
         
         insights['performance_metrics'] = {
             'total_clicks': total_clicks,
@@ -227,32 +610,56 @@ class GeminiAnalyzer(QObject):
             'avg_ctr': avg_ctr,
             'avg_position': avg_position,
             'click_through_quality': 'Excellent' if avg_ctr > 5 else 'Good' if avg_ctr > 2 else 'Needs Improvement',
-            'position_performance': 'Excellent' if avg_position < 3 else 'Good' if avg_position < 7 else 'Needs Improvement'
+            'position_performance': 'Excellent' if avg_position < 3 else 'Good' if avg_position < 7 else 'Needs Improvement',
+            'exact_totals': totals is not None,
+            'detail_click_coverage': (df['clicks'].sum() / total_clicks * 100) if totals is not None and total_clicks else None
         }
         
         # Trend analysis
-        if 'date' in df.columns and len(df) > 1:
+        daily_stats = None
+        if totals is not None and totals.daily is not None and len(totals.daily) > 1:
+            daily_stats = totals.daily.set_index('date')[['clicks', 'impressions', 'ctr', 'position']].sort_index()
+        elif 'date' in df.columns and len(df) > 1:
             daily_stats = df.groupby('date').agg({
                 'clicks': 'sum',
                 'impressions': 'sum',
                 'ctr': 'mean',
                 'position': 'mean'
             }).sort_index()
+        
+        if daily_stats is not None and len(daily_stats) > 1:
+            # Calculate trends
+            click_trend = self._calculate_trend(daily_stats['clicks'])
+            impression_trend = self._calculate_trend(daily_stats['impressions'])
+            ctr_trend = self._calculate_trend(daily_stats['ctr'])
+            position_trend = self._calculate_trend(daily_stats['position'])
             
-            if len(daily_stats) > 1:
-                # Calculate trends
-                click_trend = self._calculate_trend(daily_stats['clicks'])
-                impression_trend = self._calculate_trend(daily_stats['impressions'])
-                ctr_trend = self._calculate_trend(daily_stats['ctr'])
-                position_trend = self._calculate_trend(daily_stats['position'])
-                
-                insights['trend_analysis'] = {
-                    'click_growth': click_trend,
-                    'impression_growth': impression_trend,
-                    'ctr_trend': ctr_trend,
-                    'position_trend': position_trend,
-                    'volatility': daily_stats['clicks'].std() / daily_stats['clicks'].mean() if daily_stats['clicks'].mean() > 0 else 0
-                }
+            insights['trend_analysis'] = {
+                'click_growth': click_trend,
+                'impression_growth': impression_trend,
+                'ctr_trend': ctr_trend,
+                'position_trend': position_trend,
+                'volatility': daily_stats['clicks'].std() / daily_stats['clicks'].mean() if daily_stats['clicks'].mean() > 0 else 0
+            }
+        
+        # Per-query and per-page least-squares trends
+        with tracer.span('analysis.entity_trends'):
+            insights['entity_trends'] = self.trend_engine.movers_summary(df)
+        
+        # Sudden drops per page/device/country series
+        with tracer.span('analysis.anomalies'):
+            insights['anomalies'] = self.anomaly_detector.summarize(self.anomaly_detector.detect(df))
+        
+        # Brand vs non-brand and intent segments
+        with tracer.span('analysis.query_segments'):
+            insights['query_segments'] = segment_summary(df)
+        
+        # Subtotals by site section, category and page template
+        if 'page' in df.columns:
+            with tracer.span('analysis.url_trie'):
+                insights['site_sections'] = UrlTrie.build(df).section_summary(
+                    templates=UrlTrie.build(df, templates=True)
+                )
         
         # Content analysis
         if 'query' in df.columns:
@@ -280,6 +687,7 @@ class GeminiAnalyzer(QObject):
         
         return insights
 
+    @traced('prompt.build', chars=len)
     def _create_enhanced_analysis_prompt(self, df, site_url, data_insights):
         """Create an enhanced prompt for comprehensive analysis"""
         
@@ -289,8 +697,9 @@ class GeminiAnalyzer(QObject):
 ## WEBSITE: {site_url}
 
 ## DATA OVERVIEW:
-- Analysis Period: {df['date'].min()} to {df['date'].max()} ({df['date'].nunique()} days)
+- Analysis Period: {df['date'].min():%Y-%m-%d} to {df['date'].max():%Y-%m-%d} ({df['date'].nunique()} days)
 - Total Data Points: {len(df):,}
+{self._format_distinct_counts(data_insights.get('distribution'))}
 - Key Metrics Tracked: Clicks, Impressions, CTR, Position, {'Queries, ' if 'query' in df.columns else ''}{'Pages, ' if 'page' in df.columns else ''}{'Devices, ' if 'device' in df.columns else ''}{'Countries' if 'country' in df.columns else ''}
 
 ## PERFORMANCE METRICS:
@@ -298,10 +707,23 @@ class GeminiAnalyzer(QObject):
 - Total Impressions: {data_insights['performance_metrics']['total_impressions']:,}
 - Average CTR: {data_insights['performance_metrics']['avg_ctr']:.2f}% ({data_insights['performance_metrics']['click_through_quality']})
 - Average Position: {data_insights['performance_metrics']['avg_position']:.2f} ({data_insights['performance_metrics']['position_performance']})
+{self._format_totals_note(data_insights['performance_metrics'])}
 
 ## TREND ANALYSIS:
 {self._format_trend_analysis(data_insights['trend_analysis'])}
 
+## TOP MOVERS (least-squares trend per query/page):
+{self._format_entity_trends(data_insights.get('entity_trends'))}
+
+## ANOMALIES (largest unexpected drops by page/device/country):
+{self._format_anomalies(data_insights.get('anomalies'))}
+
+## QUERY SEGMENTS (brand vs non-brand, search intent):
+{self._format_query_segments(data_insights.get('query_segments'))}
+
+## SITE SECTIONS (URL hierarchy rollup):
+{self._format_site_sections(data_insights.get('site_sections'))}
+
 ## CONTENT PERFORMANCE:
 {self._format_content_analysis(data_insights['content_analysis'])}
 
@@ -376,6 +798,7 @@ Please ensure your analysis is:
 
         return prompt
 
+    @traced('llm.parse_analysis')
     def _parse_enhanced_analysis_response(self, response_text, data_insights):
         """Parse the enhanced Gemini response into AnalysisResult"""
         
@@ -458,6 +881,13 @@ Please ensure your analysis is:
             f"Impression trend: {data_insights['trend_analysis'].get('impression_growth', 0):+.1f}%",
             f"Position trend: {data_insights['trend_analysis'].get('position_trend', 0):+.2f}"
         ]
+        for mover in data_insights.get('entity_trends', {}).get('queries', {}).get('rising', [])[:3]:
+            trends.append(f"Rising query '{mover['query']}': {mover['change']:+,.0f} clicks over the period")
+        for mover in data_insights.get('entity_trends', {}).get('queries', {}).get('falling', [])[:3]:
+            trends.append(f"Falling query '{mover['query']}': {mover['change']:+,.0f} clicks over the period")
+        for segment in data_insights.get('query_segments', {}).get('query_class', []):
+            trends.append(f"{segment['segment'].capitalize()} queries: {segment['click_share']:.1f}% of clicks "
+                          f"at {segment['ctr'] * 100:.2f}% CTR")
         
         opportunities = [
             "Optimize high-impression, low-CTR queries",
@@ -467,6 +897,10 @@ Please ensure your analysis is:
         ]
         
         issues = [
+            f"Sudden drop on {anomaly.get('page', '')} ({anomaly.get('device', '')}, {anomaly.get('country', '')}): "
+            f"{anomaly['lost']:,.0f} clicks below expected"
+            for anomaly in data_insights.get('anomalies', [])[:3]
+        ] + [
             "Monitor CTR performance across devices",
             "Address position stagnation for key queries",
             "Improve content depth for top-performing pages"
@@ -499,10 +933,8 @@ Please ensure your analysis is:
 
     # Helper methods for data analysis
     def _calculate_trend(self, series):
-        """Calculate trend percentage for a time series"""
-        if len(series) < 2:
-            return 0
-        return ((series.iloc[-1] - series.iloc[0]) / series.iloc[0] * 100) if series.iloc[0] > 0 else 0
+        """Calculate trend percentage for a time series from its least-squares line"""
+        return fitted_change_percent(series.to_numpy())
 
     def _analyze_queries(self, df):
         """Analyze query performance"""
@@ -596,10 +1028,12 @@ Please ensure your analysis is:
         if df.empty:
             return opportunities
         
+        distribution = insights.get('distribution') or exact_distribution(df)
+        
         # CTR optimization opportunities
         avg_ctr = df['ctr'].mean()
         low_ctr_high_impression = df[
-            (df['impressions'] > df['impressions'].median()) & 
+            (df['impressions'] > distribution['impressions_p50']) & 
             (df['ctr'] < avg_ctr * 0.7)
         ]
         opportunities['ctr_optimization'] = {
@@ -618,7 +1052,7 @@ Please ensure your analysis is:
         # High potential queries
         high_ctr_low_volume = df[
             (df['ctr'] > avg_ctr * 1.5) & 
-            (df['impressions'] < df['impressions'].quantile(0.3))
+            (df['impressions'] < distribution['impressions_p30'])
         ]
         opportunities['high_potential_queries'] = {
             'count': len(high_ctr_low_volume),
@@ -642,6 +1076,24 @@ Please ensure your analysis is:
             'click_market_share': df['clicks'].sum() / 1000
         }
 
+    def _format_totals_note(self, metrics):
+        """Format the source of the totals for prompt"""
+        if not metrics.get('exact_totals'):
+            return "- Totals are summed from detail rows (may be truncated or privacy-filtered)"
+        coverage = metrics.get('detail_click_coverage')
+        if coverage is None:
+            return "- Totals are exact site totals; detail rows below cover n/a of clicks (site has no clicks)"
+        return f"- Totals are exact site totals; detail rows below cover {coverage:.1f}% of clicks"
+    
+    def _format_distinct_counts(self, distribution):
+        """Format distinct query/page counts for prompt"""
+        if not distribution or distribution.get('distinct_queries') is None:
+            return "- Distinct Queries/Pages: not available"
+        mark = '~' if distribution.get('approximate') else ''
+        pages = distribution.get('distinct_pages')
+        return (f"- Distinct Queries: {mark}{distribution['distinct_queries']:,}"
+                + (f", Distinct Pages: {mark}{pages:,}" if pages is not None else ""))
+    
     def _format_trend_analysis(self, trend_data):
         """Format trend analysis for prompt"""
         if not trend_data:
@@ -673,7 +1125,7 @@ Please ensure your analysis is:
             output += "PAGE ANALYSIS:\n"
             if 'top_performers' in pages:
                 top_pages = list(pages['top_performers'].keys())[:3]
-                output += f"- Top pages: {', '.join([str(p)[:30] + '...' for p in top_pages])}\n"
+                output += f"- Top pages: {', '.join([self._short_url(p) for p in top_pages])}\n"
         
         return output if output else "Limited content data available"
 
@@ -725,6 +1177,89 @@ Please ensure your analysis is:
 - Click Market Share: {competitive_data.get('click_market_share', 0):.1f}K clicks captured
 """
 
+    def _format_entity_trends(self, entity_trends, limit=5):
+        """Format the top rising and falling queries and pages for prompt"""
+        if not entity_trends:
+            return "Insufficient data for per-query trends"
+        
+        output = ""
+        for key, label, column in (('queries', 'Queries', 'query'), ('pages', 'Pages', 'page')):
+            movers = entity_trends.get(key)
+            if not movers:
+                continue
+            for direction in ('rising', 'falling'):
+                rows = movers[direction][:limit]
+                if not rows:
+                    continue
+                output += f"{direction.capitalize()} {label} (clicks over the period, p-value):\n"
+                for row in rows:
+                    output += (f"- {row[column]}: {row['change']:+,.1f} clicks ({row['pct_change']:+.1f}% of daily mean), "
+                               f"p={row['p_value']:.3f}\n")
+        return output or "No statistically significant query or page trends"
+    
+    def _format_anomalies(self, anomalies, limit=8):
+        """Format the most severe anomalous drops for prompt"""
+        if not anomalies:
+            return "No anomalous drops detected"
+        
+        output = ""
+        for anomaly in anomalies[:limit]:
+            segment = ' | '.join(str(anomaly[key]) for key in ('page', 'device', 'country') if key in anomaly)
+            output += (f"- {segment}: {anomaly['first_date']:%Y-%m-%d} to {anomaly['last_date']:%Y-%m-%d} "
+                       f"({anomaly['days']} days), {anomaly['actual']:,.0f} clicks vs {anomaly['baseline']:,.0f} expected "
+                       f"({-anomaly['lost']:+,.0f}, worst z={anomaly['worst_score']:.1f})\n")
+        return output
+    
+    def _format_cannibalization(self, cannibalization, limit=10):
+        """Format queries with competing pages for prompt"""
+        if cannibalization is None or cannibalization.empty:
+            return "No queries with several competing pages"
+        
+        lines = []
+        for row in cannibalization.head(limit).itertuples(index=False):
+            lines.append(f"- \"{row.query}\": {row.pages} pages, {row.impressions:,.0f} impressions; "
+                         f"{row.top_page} ({row.top_share:.0%}) vs {row.second_page} ({row.second_share:.0%}), "
+                         f"best position {row.best_position:.1f}, spread {row.position_spread:.1f}")
+        return "\n            ".join(lines)
+    
+    def _format_query_segments(self, query_segments):
+        """Format brand/non-brand and intent aggregates for prompt"""
+        if not query_segments:
+            return "No query classification available"
+        
+        output = ""
+        for key, label in (('query_class', 'Brand vs non-brand'), ('query_intent', 'Intent')):
+            rows = query_segments.get(key)
+            if not rows:
+                continue
+            output += f"{label}:\n"
+            for row in rows:
+                output += (f"- {row['segment']}: {row['clicks']:,} clicks ({row['click_share']:.1f}%), "
+                           f"{row['impressions']:,} impressions, CTR {row['ctr'] * 100:.2f}%, "
+                           f"position {row['position']:.1f}, {row['queries']:,} queries\n")
+        return output
+    
+    def _short_url(self, url, limit=80):
+        """URL path without scheme and host, for prompts"""
+        path = urlsplit(str(url)).path or str(url)
+        return path[:limit] + '...' if len(path) > limit else path
+    
+    def _format_site_sections(self, site_sections, limit=8):
+        """Format section, category and template subtotals for prompt"""
+        if not site_sections:
+            return "No page data for a site structure rollup"
+        
+        output = ""
+        for key, label in (('depth_1', 'Sections'), ('depth_2', 'Categories'), ('templates', 'Page templates')):
+            rows = site_sections.get(key)
+            if not rows:
+                continue
+            output += f"{label}:\n"
+            for row in rows[:limit]:
+                output += (f"- {row['path']} ({row['pages']:,} pages): {row['clicks']:,.0f} clicks "
+                           f"({row['click_share']:.1f}%), CTR {row['ctr'] * 100:.2f}%, position {row['position']:.1f}\n")
+        return output or "No page data for a site structure rollup"
+    
     def _enhance_summary_with_insights(self, original_summary, data_insights):
         """Enhance summary with data insights"""
         enhanced = original_summary + "\n\nKey Data Insights:\n"
@@ -740,13 +1275,27 @@ Please ensure your analysis is:
         
         return enhanced
 
-    def _generate_detailed_suggestions(self, df, analysis_result, site_url):
+    def _generate_detailed_suggestions(self, df, analysis_result, site_url, distribution=None):
         """Generate extremely detailed, data-driven suggestions"""
         try:
-            # First, analyze the data for specific opportunity areas
-            data_opportunities = self._identify_data_opportunities(df)
+            suggestions = self._request_detailed_suggestions(df, analysis_result, site_url, distribution)
+            if suggestions is not None:
+                self.suggestions_generated.emit(suggestions)
             
-            prompt = f"""
+        except Exception as e:
+            print(f"❌ Detailed suggestion generation failed: {e}")
+            # Fall back to basic suggestions
+            self._generate_basic_suggestions(df, analysis_result, site_url)
+    
+    @traced('llm.suggestions')
+    def _request_detailed_suggestions(self, df, analysis_result, site_url, distribution=None):
+        """Send the detailed suggestions request and parse the response"""
+        # First, analyze the data for specific opportunity areas
+        data_opportunities = self._identify_data_opportunities(df, distribution)
+        with tracer.span('analysis.cannibalization'):
+            cannibalization = QueryPageIndex.build(df).cannibalization(n=10)
+        
+        prompt = f"""
             As a senior SEO consultant, create EXTREMELY DETAILED, data-driven suggestions for {site_url} based on comprehensive analysis.
 
             ANALYSIS CONTEXT:
@@ -760,6 +1309,9 @@ Please ensure your analysis is:
             DATA-DRIVEN INSIGHTS:
             {data_opportunities}
 
+            KEYWORD CANNIBALIZATION (queries where several of our pages split impressions):
+            {self._format_cannibalization(cannibalization)}
+
             Create 8-12 EXTREMELY DETAILED suggestions following this EXACT format:
 
             CATEGORY: [Technical SEO, Content Strategy, On-Page SEO, Off-Page SEO, User Experience, Performance Optimization]
@@ -779,27 +1331,24 @@ Please ensure your analysis is:
 
             Make these suggestions so detailed that an SEO specialist could immediately implement them without additional research.
             """
-            
-            response = self._safe_generate_content(prompt)
-            if response and response.text:
-                suggestions = self._parse_detailed_suggestions_response(response.text)
-                self.suggestions_generated.emit(suggestions)
-            
-        except Exception as e:
-            print(f"❌ Detailed suggestion generation failed: {e}")
-            # Fall back to basic suggestions
-            self._generate_basic_suggestions(df, analysis_result, site_url)
+        
+        response = self._safe_generate_content(prompt)
+        if response and response.text:
+            return self._parse_detailed_suggestions_response(response.text)
+        return None
     
-    def _identify_data_opportunities(self, df):
+    def _identify_data_opportunities(self, df, distribution=None):
         """Identify specific opportunity areas from the data"""
         opportunities = []
         
         if df.empty:
             return "No data available for opportunity analysis"
+        if distribution is None:
+            distribution = exact_distribution(df)
         
         # CTR optimization opportunities
         avg_ctr = df['ctr'].mean()
-        low_ctr_queries = df[(df['impressions'] > df['impressions'].median()) & (df['ctr'] < avg_ctr * 0.7)]
+        low_ctr_queries = df[(df['impressions'] > distribution['impressions_p50']) & (df['ctr'] < avg_ctr * 0.7)]
         if not low_ctr_queries.empty:
             opportunities.append(f"CTR Optimization: {len(low_ctr_queries)} high-impression queries with below-average CTR ({low_ctr_queries['ctr'].mean():.2f}% vs average {avg_ctr:.2f}%)")
         
@@ -809,7 +1358,7 @@ Please ensure your analysis is:
             opportunities.append(f"Position Boost: {len(position_8_20)} queries in positions 8-20 with potential for first-page ranking")
         
         # High-potential low volume
-        high_ctr_low_volume = df[(df['ctr'] > avg_ctr * 1.5) & (df['impressions'] < df['impressions'].quantile(0.3))]
+        high_ctr_low_volume = df[(df['ctr'] > avg_ctr * 1.5) & (df['impressions'] < distribution['impressions_p30'])]
         if not high_ctr_low_volume.empty:
             opportunities.append(f"Volume Expansion: {len(high_ctr_low_volume)} queries with excellent CTR ({high_ctr_low_volume['ctr'].mean():.2f}%) but low impression volume")
         
@@ -822,6 +1371,7 @@ Please ensure your analysis is:
         
         return "\n".join([f"- {opp}" for opp in opportunities]) if opportunities else "No specific data patterns identified for opportunity targeting"
     
+    @traced('llm.parse_suggestions', rows=len)
     def _parse_detailed_suggestions_response(self, response_text):
         """Parse detailed suggestions from Gemini response"""
         suggestions = []
@@ -922,11 +1472,24 @@ Please ensure your analysis is:
             print(f"❌ Basic suggestion generation also failed: {e}")
     
     def _safe_generate_content(self, prompt, max_retries=3):
-        """Safely generate content with retries"""
+        """Safely generate content with retries; concurrent identical prompts are sent once"""
+        return self.in_flight.do((self.working_model_name, prompt), self._generate_content, prompt, max_retries)
+    
+    def _generate_content(self, prompt, max_retries=3):
+        model = self.model
+        if self.record_replay is not None and self.record_replay.mode == 'record':
+            model = self.record_replay.wrap_model(model)
         for attempt in range(max_retries):
             try:
                 print(f"📤 Attempt {attempt + 1}/{max_retries} to generate content...")
-                response = self.model.generate_content(prompt)
+                with tracer.span('llm.generate', prompt_chars=len(prompt), attempt=attempt + 1) as span:
+                    response = model.generate_content(prompt)
+                    usage = getattr(response, 'usage_metadata', None)
+                    if usage is not None:
+                        span.set(
+                            prompt_tokens=getattr(usage, 'prompt_token_count', None),
+                            tokens=getattr(usage, 'candidates_token_count', None)
+                        )
                 if response and response.text:
                     print(f"✅ Generate content successful on attempt {attempt + 1}")
                     return response
@@ -939,22 +1502,21 @@ Please ensure your analysis is:
                 time.sleep(2)  # Wait before retry
         return None
     
+    @traced('analysis.prepare_dataframe', rows=len)
     def _prepare_dataframe(self, data_points):
         """Convert data points to pandas DataFrame"""
-        data = []
-        for point in data_points:
-            data.append({
-                'date': point.date,
-                'clicks': point.clicks,
-                'impressions': point.impressions,
-                'ctr': point.ctr,
-                'position': point.position,
-                'query': point.query or '',
-                'page': point.page or '',
-                'country': point.country or '',
-                'device': point.device or ''
-            })
-        return pd.DataFrame(data)
+        # Rows loaded from the local warehouse are already columnar
+        if isinstance(data_points, pd.DataFrame):
+            df = data_points.copy()
+            for column in ['query', 'page', 'country', 'device']:
+                if column not in df.columns:
+                    df[column] = ''
+        else:
+            df = data_points_to_dataframe(data_points)
+        # Datasets from the dashboard are classified already
+        if 'query_class' not in df.columns:
+            df = self.classify_queries(df)
+        return df
     
     def _parse_analysis_response(self, response_text):
         """Parse Gemini response into AnalysisResult object"""
@@ -1,56 +1,302 @@
+import os
+import json
+import uuid
+import threading
+import httplib2
 import pandas as pd
 from datetime import datetime, timedelta
 from googleapiclient.discovery import build
 from PyQt5.QtCore import QObject, pyqtSignal
-from data_models import GSCDataPoint
+from data_models import GSCDataPoint, SiteTotals, data_points_to_dataframe
+from fetch_checkpoint import FetchCheckpoints
+from spill_store import SpillStore
+from tracing import tracer, traced
 
 class GSCClient(QObject):
     data_loaded = pyqtSignal(list)
+    # Detail rows as a SpillStore instead of a list when a memory limit is set
+    store_loaded = pyqtSignal(object)
+    page_loaded = pyqtSignal(list)
+    comparison_loaded = pyqtSignal(list)
+    # A failed comparison period does not stop the rest of the fetch plan
+    comparison_failed = pyqtSignal(str)
+    totals_loaded = pyqtSignal(object)
     error_occurred = pyqtSignal(str)
     
-    def __init__(self, credentials):
+    # Maximum rows the Search Analytics API returns per request
+    MAX_ROWS_PER_REQUEST = 25000
+    # Retries with exponential backoff on 429 and 5xx responses
+    NUM_RETRIES = 4
+    
+    def __init__(self, credentials, service=None, api_endpoint=None, record_replay=None):
         super().__init__()
         self.credentials = credentials
-        self.service = build('searchconsole', 'v1', credentials=credentials)
+        self.api_endpoint = api_endpoint or None
+        self.record_replay = record_replay
+        if service is None:
+            with tracer.span('gsc.build'):
+                service = self._build_service()
+        self.service = service
         self.sites = []
+        self.worker = None
+        self.worker_request = None
+        self.checkpoints = None
+        self.memory_limit = None
+        self.spill_dir = None
+        self.spill_store = None
+    
+    def _build_service(self):
+        """Build the API client, optionally against a different endpoint (e.g. a local mock server)"""
+        client_options = {'api_endpoint': self.api_endpoint} if self.api_endpoint else None
+        if self.record_replay is not None and self.record_replay.active:
+            # Requests and responses go through the record/replay transport
+            http = self.record_replay.gsc_http(self.credentials)
+            return build('searchconsole', 'v1', http=http, client_options=client_options,
+                         static_discovery=True)
+        if not self.api_endpoint:
+            return build('searchconsole', 'v1', credentials=self.credentials)
+        
+        if self.credentials is None:
+            # Unauthenticated transport for local stand-ins
+            return build('searchconsole', 'v1', http=httplib2.Http(), client_options=client_options,
+                         static_discovery=True)
+        return build('searchconsole', 'v1', credentials=self.credentials, client_options=client_options,
+                     static_discovery=True)
+    
+    def set_checkpoint_dir(self, checkpoint_dir):
+        """Save detail fetch progress in this directory so interrupted fetches resume"""
+        self.checkpoints = FetchCheckpoints(checkpoint_dir)
+    
+    def set_memory_limit(self, memory_limit, spill_dir):
+        """Keep at most about memory_limit bytes of detail rows in memory; spill the rest to spill_dir"""
+        self.memory_limit = memory_limit or None
+        self.spill_dir = spill_dir
     
     def get_sites(self):
         """Get list of available sites"""
         try:
-            site_list = self.service.sites().list().execute()
-            self.sites = [site for site in site_list.get('siteEntry', []) 
+            site_list = self.service.sites().list().execute(num_retries=self.NUM_RETRIES)
+            self.sites = [site for site in site_list.get('siteEntry', [])
                          if site.get('permissionLevel') in ['siteOwner', 'siteFullUser']]
             return self.sites
         except Exception as e:
             self.error_occurred.emit(f"Failed to fetch sites: {str(e)}")
             return []
     
-    def fetch_search_analytics(self, site_url, start_date, end_date, dimensions=None, row_limit=25000):
-        """Fetch search analytics data from GSC"""
+    @traced('fetch')
+    def run_fetch_plan(self, site_url, start_date, end_date, dimensions=None, row_limit=25000,
+                       include_detail=True, filters=None, include_totals=True, comparison_range=None):
+        """Fetch exact totals first, then the high-cardinality detail rows if needed.
+        
+        comparison_range is the (start, end) of a second period fetched before
+        everything else; its rows arrive through comparison_loaded.
+        """
+        if comparison_range is not None:
+            self.fetch_comparison_data(site_url, *comparison_range, dimensions, row_limit, filters)
+        if include_totals:
+            totals = self.fetch_site_totals(site_url, start_date, end_date, filters)
+            if totals is None:
+                return []
+        if not include_detail:
+            return []
+        return self.fetch_search_analytics(site_url, start_date, end_date, dimensions, row_limit, filters)
+    
+    def run_fetch_plan_async(self, site_url, start_date, end_date, dimensions=None, row_limit=25000,
+                             include_detail=True, filters=None, include_totals=True, comparison_range=None):
+        """Run the fetch plan in a background thread; results arrive through the signals"""
+        request = (site_url, start_date, end_date, dimensions, row_limit, include_detail, filters,
+                   include_totals, comparison_range)
+        if self.is_fetching():
+            if request == self.worker_request:
+                # The running fetch delivers the same rows through the same signals
+                print("⏳ The same fetch is already running; sharing its results")
+                return
+            self.error_occurred.emit("A fetch is already running")
+            return
+        
+        self.worker_request = request
+        self.worker = threading.Thread(target=self.run_fetch_plan, args=request, daemon=True)
+        self.worker.start()
+    
+    def is_fetching(self):
+        return self.worker is not None and self.worker.is_alive()
+    
+    def is_fetching_request(self, site_url, start_date, end_date, dimensions=None, row_limit=25000,
+                            include_detail=True, filters=None):
+        """Whether the running fetch plan fetches exactly this range"""
+        request = (site_url, start_date, end_date, dimensions, row_limit, include_detail, filters)
+        return self.is_fetching() and request == self.worker_request[:len(request)]
+    
+    @traced('gsc.fetch_totals')
+    def fetch_site_totals(self, site_url, start_date, end_date, filters=None):
+        """Fetch site totals and per-date totals with two cheap aggregate queries"""
+        try:
+            # No dimensions: a single row with the exact site totals
+            total_rows = self._query_rows(site_url, start_date, end_date, [], 1, filters)
+            # Date only: one row per day, not affected by query anonymization
+            daily_rows = self._query_rows(site_url, start_date, end_date, ['date'], self.MAX_ROWS_PER_REQUEST, filters)
+            
+            daily = pd.DataFrame({
+                'date': pd.to_datetime([row['keys'][0] for row in daily_rows]),
+                'clicks': [row.get('clicks', 0) for row in daily_rows],
+                'impressions': [row.get('impressions', 0) for row in daily_rows],
+                'ctr': [row.get('ctr', 0) for row in daily_rows],
+                'position': [row.get('position', 0) for row in daily_rows]
+            }).sort_values('date').reset_index(drop=True)
+            
+            if total_rows:
+                row = total_rows[0]
+                totals = SiteTotals(
+                    clicks=row.get('clicks', 0),
+                    impressions=row.get('impressions', 0),
+                    ctr=row.get('ctr', 0),
+                    position=row.get('position', 0),
+                    daily=daily
+                )
+            else:
+                totals = SiteTotals.from_daily(daily)
+            
+            self.totals_loaded.emit(totals)
+            return totals
+        
+        except Exception as e:
+            self.error_occurred.emit(f"Failed to fetch totals: {str(e)}")
+            return None
+    
+    @traced('gsc.fetch', rows=len)
+    def fetch_search_analytics(self, site_url, start_date, end_date, dimensions=None, row_limit=25000,
+                               filters=None):
+        """Fetch search analytics data from GSC; every API page is also emitted through page_loaded"""
         try:
             if dimensions is None:
                 dimensions = ['date', 'query', 'page', 'country', 'device']
             
-            request = {
-                'startDate': start_date.strftime('%Y-%m-%d'),
-                'endDate': end_date.strftime('%Y-%m-%d'),
-                'dimensions': dimensions,
-                'rowLimit': row_limit,
-                'dataState': 'all'
-            }
-            
-            response = self.service.searchanalytics().query(
-                siteUrl=site_url, body=request
-            ).execute()
+            data_points = []
+            store = self.spill_store = self._new_spill_store()
+            def on_page(page_rows):
+                page_points = self._parse_response({'rows': page_rows}, dimensions)
+                if store is None:
+                    data_points.extend(page_points)
+                else:
+                    # Columnar pages only; the point objects are dropped after page_loaded
+                    store.append(data_points_to_dataframe(page_points))
+                self.page_loaded.emit(page_points)
             
-            data_points = self._parse_response(response, dimensions)
+            self._query_detail_rows(site_url, start_date, end_date, dimensions, row_limit, filters, on_page)
+            if store is not None:
+                if store.spilled:
+                    store.flush()
+                    print(f"💾 {len(store):,} rows spilled to {len(store.chunk_paths)} chunks on disk")
+                self.store_loaded.emit(store)
+                return store
             self.data_loaded.emit(data_points)
             return data_points
+        
+        except Exception as e:
+            if self.spill_store is not None:
+                self.spill_store.discard()
+            self.error_occurred.emit(f"Failed to fetch data: {str(e)}{self._resume_note()}")
+            return []
+    
+    @traced('gsc.fetch_comparison', rows=len)
+    def fetch_comparison_data(self, site_url, start_date, end_date, dimensions=None, row_limit=25000,
+                              filters=None):
+        """Fetch the detail rows of a comparison period without replacing the loaded dataset"""
+        try:
+            if dimensions is None:
+                dimensions = ['date', 'query', 'page', 'country', 'device']
+            
+            rows = []
+            self._query_detail_rows(site_url, start_date, end_date, dimensions, row_limit, filters, rows.extend)
             
+            data_points = self._parse_response({'rows': rows}, dimensions)
+            self.comparison_loaded.emit(data_points)
+            return data_points
+        
         except Exception as e:
-            self.error_occurred.emit(f"Failed to fetch data: {str(e)}")
+            self.comparison_failed.emit(f"Failed to fetch comparison data: {str(e)}{self._resume_note()}")
             return []
     
+    def _query_detail_rows(self, site_url, start_date, end_date, dimensions, row_limit, filters, on_page):
+        """Pass every page of a detail query to on_page, checkpointing pages when a checkpoint directory is set.
+        
+        Pages are not collected here, so a caller that spills them keeps memory bounded. Returns the row count.
+        """
+        if self.checkpoints is None:
+            return self._query_rows(site_url, start_date, end_date, dimensions, row_limit, filters, on_page)
+        
+        request_filters = filters.to_dimension_filter_groups() if filters is not None else None
+        job = self.checkpoints.open(site_url, start_date, end_date, dimensions, row_limit, request_filters)
+        if job.saved_rows:
+            print(f"♻️ Resuming fetch for {site_url}: {job.saved_rows:,} rows already downloaded")
+        
+        # Pages stored by an earlier attempt are replayed instead of requested again
+        for page_rows in job.saved_pages():
+            on_page(page_rows)
+        
+        def on_new_page(page_rows):
+            job.save_page(page_rows)
+            on_page(page_rows)
+        
+        self._query_rows(site_url, start_date, end_date, dimensions, row_limit, filters,
+                         on_new_page, start_row=job.saved_rows)
+        
+        rows = job.saved_rows
+        job.discard()
+        return rows
+    
+    def _new_spill_store(self):
+        if self.memory_limit is None:
+            return None
+        return SpillStore(os.path.join(self.spill_dir, uuid.uuid4().hex), self.memory_limit)
+    
+    def _resume_note(self):
+        return "; progress was saved and fetching again resumes it" if self.checkpoints is not None else ""
+    
+    def _query_rows(self, site_url, start_date, end_date, dimensions, row_limit, filters=None, on_page=None,
+                    start_row=0):
+        """Run a Search Analytics query, following startRow pagination up to row_limit.
+        
+        Returns the rows, or only their number when on_page takes each page instead.
+        """
+        request = {
+            'startDate': start_date.strftime('%Y-%m-%d'),
+            'endDate': end_date.strftime('%Y-%m-%d'),
+            'dimensions': dimensions,
+            'dataState': 'all'
+        }
+        # Server-side filtering: only matching rows are returned
+        if filters is not None and not filters.is_empty():
+            request['dimensionFilterGroups'] = filters.to_dimension_filter_groups()
+        
+        rows = []
+        fetched = 0
+        while start_row + fetched < row_limit:
+            page_size = min(self.MAX_ROWS_PER_REQUEST, row_limit - start_row - fetched)
+            request['rowLimit'] = page_size
+            request['startRow'] = start_row + fetched
+            
+            with tracer.span('gsc.page', dimensions=','.join(dimensions), start_row=request['startRow']) as span:
+                response = self._execute_query(site_url, dict(request))
+                
+                page_rows = response.get('rows', [])
+                span.set(rows=len(page_rows), bytes=len(json.dumps(response)))
+            fetched += len(page_rows)
+            if on_page is not None:
+                on_page(page_rows)
+            else:
+                rows.extend(page_rows)
+            if len(page_rows) < page_size:
+                break
+        
+        return rows if on_page is None else fetched
+    
+    def _execute_query(self, site_url, body):
+        return self.service.searchanalytics().query(
+            siteUrl=site_url, body=body
+        ).execute(num_retries=self.NUM_RETRIES)
+    
+    @traced('gsc.parse_response', rows=len)
     def _parse_response(self, response, dimensions):
         """Parse GSC API response into GSCDataPoint objects"""
         data_points = []
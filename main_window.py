@@ -1,4 +1,6 @@
 import os
+import json
+import shutil
 from PyQt5.QtWidgets import (QMainWindow, QVBoxLayout, QWidget, QTabWidget, 
                             QMessageBox, QInputDialog, QStatusBar, QAction, QMenu)
 from PyQt5.QtCore import QSettings
@@ -6,7 +8,12 @@ from auth_manager import AuthManager
 from gsc_client import GSCClient
 from gemini_analyzer import GeminiAnalyzer
 from config_manager import ConfigManager
+from data_warehouse import DataWarehouse
+from query_classifier import DEFAULT_RULES, QueryClassifier
+from sql_engine import SQLQueryEngine
 from widgets.dashboard_widget import DashboardWidget
+from widgets.sql_console_widget import SQLConsoleWidget
+from widgets.timing_widget import TimingWidget
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -45,6 +52,10 @@ class MainWindow(QMainWindow):
         settings_action.triggered.connect(self.show_settings)
         file_menu.addAction(settings_action)
         
+        rules_action = QAction('Query Classification Rules...', self)
+        rules_action.triggered.connect(self.edit_query_rules)
+        file_menu.addAction(rules_action)
+        
         # Help menu
         help_menu = menubar.addMenu('Help')
         
@@ -53,9 +64,17 @@ class MainWindow(QMainWindow):
         help_menu.addAction(api_key_action)
         
     def init_services(self):
+        # Record/replay of API calls (off by default)
+        self.record_replay = self.config_manager.get_record_replay()
+        replaying = self.record_replay.mode == 'replay'
+        if self.record_replay.active:
+            print(f"🔧 API record/replay: {self.record_replay.mode} ({self.record_replay.cassette_dir})")
+        
         # Initialize Gemini first
         api_key = self.config_manager.get_gemini_api_key()
-        self.gemini_analyzer = GeminiAnalyzer(api_key)
+        self.gemini_analyzer = GeminiAnalyzer(None if replaying else api_key)
+        self.gemini_analyzer.set_record_replay(self.record_replay)
+        self.gemini_analyzer.set_query_classifier(self.config_manager.get_query_classifier())
         
         # Connect Gemini status updates
         self.gemini_analyzer.status_update.connect(self.on_gemini_status_update)
@@ -65,6 +84,11 @@ class MainWindow(QMainWindow):
         self.auth_manager.authenticated.connect(self.on_authenticated)
         self.auth_manager.error_occurred.connect(self.on_auth_error)
         
+        # Recorded responses need no Google sign-in
+        if replaying:
+            self.setup_application()
+            return
+        
         # Start authentication
         self.statusBar().showMessage("Authenticating with Google...")
         self.auth_manager.authenticate()
@@ -87,6 +111,29 @@ class MainWindow(QMainWindow):
         """Show settings dialog"""
         self.setup_api_key()
     
+    def edit_query_rules(self):
+        """Edit the brand and intent rules used to classify queries"""
+        current = self.config_manager.get_query_rules() or json.dumps(DEFAULT_RULES, indent=2)
+        text, ok = QInputDialog.getMultiLineText(
+            self, "Query Classification Rules",
+            "Category -> keywords (whole words) and regex patterns. 'brand' marks brand queries;\n"
+            "the other categories are intents, the first match wins:",
+            current
+        )
+        if not ok:
+            return
+        try:
+            classifier = QueryClassifier.from_json(text)
+        except Exception as e:
+            QMessageBox.warning(self, "Invalid Rules", f"The rules were not saved: {e}")
+            return
+        self.config_manager.set_query_rules(text)
+        self.gemini_analyzer.set_query_classifier(classifier)
+        # Re-tag the loaded dataset with the new rules
+        dashboard = getattr(self, 'dashboard', None)
+        if dashboard is not None:
+            dashboard.reclassify_queries()
+    
     def on_authenticated(self, success):
         if success:
             self.statusBar().showMessage("Successfully authenticated with Google!")
@@ -101,12 +148,38 @@ class MainWindow(QMainWindow):
         """Setup application after successful authentication"""
         # Initialize GSC client
         credentials = self.auth_manager.get_credentials()
-        self.gsc_client = GSCClient(credentials)
+        api_endpoint = self.config_manager.get_gsc_api_endpoint()
+        if api_endpoint:
+            print(f"🔧 Using Search Console API endpoint: {api_endpoint}")
+        self.gsc_client = GSCClient(credentials, api_endpoint=api_endpoint, record_replay=self.record_replay)
+        
+        # Local history of fetched data
+        data_dir = self.config_manager.get_data_dir()
+        self.warehouse = DataWarehouse(os.path.join(data_dir, 'warehouse'))
+        self.gemini_analyzer.set_cache_dir(os.path.join(data_dir, 'analysis_cache'))
+        self.gsc_client.set_checkpoint_dir(os.path.join(data_dir, 'fetch_checkpoints'))
+        memory_limit_mb = self.config_manager.get_memory_limit_mb()
+        if memory_limit_mb:
+            print(f"🔧 Detail rows above {memory_limit_mb:,} MB spill to disk")
+            # Chunks left behind by an earlier session are never read again
+            spill_dir = os.path.join(data_dir, 'spill')
+            shutil.rmtree(spill_dir, ignore_errors=True)
+            self.gsc_client.set_memory_limit(memory_limit_mb * 1024 * 1024, spill_dir)
         
         # Create dashboard widget
-        self.dashboard = DashboardWidget(self.gsc_client, self.gemini_analyzer)
+        self.dashboard = DashboardWidget(self.gsc_client, self.gemini_analyzer, self.warehouse)
         self.tabs.addTab(self.dashboard, "Dashboard")
         
+        # SQL console over the loaded dataset and local history
+        self.sql_engine = SQLQueryEngine(self)
+        self.sql_console = SQLConsoleWidget(self.sql_engine)
+        self.tabs.addTab(self.sql_console, "SQL Console")
+        self.dashboard.dataset_changed.connect(self.on_dataset_changed)
+        
+        # Per-stage timings of the fetch -> analyze pipeline
+        self.timing_widget = TimingWidget()
+        self.tabs.addTab(self.timing_widget, "Timings")
+        
         # Load sites
         self.dashboard.load_sites()
         
@@ -114,4 +187,11 @@ class MainWindow(QMainWindow):
         if not self.gemini_analyzer.is_available():
             self.statusBar().showMessage("Ready - Gemini AI not available. Go to Settings to configure.")
         else:
-            self.statusBar().showMessage("Ready - Gemini AI available!")
\ No newline at end of file
+            self.statusBar().showMessage("Ready - Gemini AI available!")
+    
+    def on_dataset_changed(self, df):
+        """Expose the dashboard's dataset and site history to the SQL console"""
+        self.sql_engine.register_dataframe('data', df)
+        site_url = self.dashboard.site_combo.currentData()
+        if site_url:
+            self.sql_engine.register_history(self.warehouse, site_url)
\ No newline at end of file
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+
+def _trigram_codes(text):
+    """Integer code of every trigram position of text (code points packed 21 bits each)"""
+    points = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    if len(points) < 3:
+        return points[:0], points[:0]
+    codes = (points[:-2] << 42) | (points[1:-1] << 21) | points[2:]
+    # Trigrams spanning the separator between two values are not real substrings
+    valid = (points[:-2] != 0) & (points[1:-1] != 0) & (points[2:] != 0)
+    return codes, valid
+
+
+class TrigramIndex:
+    """Case-insensitive substring index over the distinct values of one column.
+
+    Every distinct value is split into overlapping trigrams and each trigram
+    keeps a sorted posting list of the values containing it (CSR arrays). A
+    search intersects the posting lists of the pattern's trigrams and then
+    verifies the few remaining candidates, so cost scales with the matches
+    rather than with the number of rows. Patterns shorter than three
+    characters fall back to a vectorized scan of the distinct values.
+    """
+
+    def __init__(self, values):
+        self.codes, uniques = pd.factorize(pd.Series(values).fillna(''))
+        self.uniques = np.asarray(uniques, dtype=object)
+        self.lowered = pd.Series(self.uniques, dtype=object).str.lower()
+        self._build()
+
+    def _build(self):
+        lowered = self.lowered.tolist()
+        if not lowered:
+            self.trigrams = pd.Index(np.array([], dtype=np.int64))
+            self.indptr = np.zeros(1, dtype=np.int64)
+            self.postings = np.array([], dtype=np.int64)
+            return
+
+        # One pass over all values joined by a separator that never occurs in the data
+        lengths = np.fromiter((len(value) for value in lowered), dtype=np.int64, count=len(lowered))
+        codes, valid = _trigram_codes('\0'.join(lowered))
+        owners = np.repeat(np.arange(len(lowered), dtype=np.int64), lengths + 1)[:len(codes)]
+        codes, owners = codes[valid], owners[valid]
+
+        trigram_ids, trigrams = pd.factorize(codes)
+        pairs = np.sort(trigram_ids.astype(np.int64) * len(lowered) + owners)
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+        pair_trigram = pairs // len(lowered)
+        self.trigrams = pd.Index(trigrams)
+        self.postings = pairs % len(lowered)
+        self.indptr = np.zeros(len(trigrams) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pair_trigram, minlength=len(trigrams)), out=self.indptr[1:])
+
+    def __len__(self):
+        return len(self.uniques)
+
+    def match_values(self, pattern):
+        """Boolean mask over the distinct values that contain pattern"""
+        pattern = pattern.lower()
+        matched = np.zeros(len(self.uniques), dtype=bool)
+        if not pattern:
+            matched[:] = True
+            return matched
+        if len(pattern) < 3:
+            matched[:] = self.lowered.str.contains(pattern, regex=False).to_numpy()
+            return matched
+
+        codes, _ = _trigram_codes(pattern)
+        ids = self.trigrams.get_indexer(np.unique(codes))
+        if (ids < 0).any():
+            return matched
+        # Intersect the shortest posting lists first
+        sizes = self.indptr[ids + 1] - self.indptr[ids]
+        candidates = None
+        for trigram in ids[np.argsort(sizes)]:
+            posting = self.postings[self.indptr[trigram]:self.indptr[trigram + 1]]
+            candidates = posting if candidates is None else np.intersect1d(candidates, posting, assume_unique=True)
+            if not len(candidates):
+                return matched
+        if len(pattern) > 3:
+            # Trigrams can all occur without the whole pattern occurring
+            found = self.lowered.iloc[candidates].str.contains(pattern, regex=False).to_numpy()
+            candidates = candidates[found]
+        matched[candidates] = True
+        return matched
+
+    def match_rows(self, pattern):
+        """Boolean mask over the indexed rows whose value contains pattern"""
+        return self.match_values(pattern)[self.codes]
+
+
+class RowSearchIndex:
+    """Trigram indexes over the text columns of a DataFrame for instant row filtering"""
+
+    def __init__(self, df, columns=('query', 'page')):
+        self.size = 0 if df is None else len(df)
+        self.indexes = {
+            column: TrigramIndex(df[column])
+            for column in columns if df is not None and column in df.columns
+        }
+
+    def __len__(self):
+        return self.size
+
+    def search(self, text, columns=None):
+        """Positions of the rows where every whitespace-separated term occurs in one of the columns"""
+        columns = [column for column in (columns or self.indexes) if column in self.indexes]
+        terms = text.split()
+        if not terms or not columns:
+            return np.arange(self.size)
+
+        mask = np.ones(self.size, dtype=bool)
+        for term in terms:
+            term_mask = np.zeros(self.size, dtype=bool)
+            for column in columns:
+                term_mask |= self.indexes[column].match_rows(term)
+            mask &= term_mask
+        return np.flatnonzero(mask)
@@ -0,0 +1,152 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+
+COMPARISON_MODES = ('previous', 'year')
+
+
+def comparison_range(start_date, end_date, mode='previous'):
+    """Date range to compare start_date..end_date against.
+
+    'previous' is the equally long range right before it, 'year' the same
+    range 52 weeks earlier so weekdays line up.
+    """
+    if mode not in COMPARISON_MODES:
+        raise ValueError(f"Unknown comparison mode: {mode}")
+    if mode == 'year':
+        return start_date - timedelta(weeks=52), end_date - timedelta(weeks=52)
+    days = (end_date - start_date).days + 1
+    return start_date - timedelta(days=days), start_date - timedelta(days=1)
+
+
+class PeriodComparison:
+    """Joins two periods on their key columns and computes per-key deltas.
+
+    Both periods are encoded against one shared set of integer key codes
+    (a hash join via pd.factorize), so aggregating and joining is a handful
+    of bincounts instead of a groupby plus merge. CTR is recomputed from the
+    summed clicks and impressions and position is impression-weighted, as
+    averaging per-row ratios would over-weight rare rows.
+    """
+
+    KEYS = ['query', 'page', 'country', 'device']
+    STATUSES = ['winner', 'loser', 'new', 'lost', 'unchanged']
+
+    def __init__(self, keys=None):
+        self.keys = list(keys) if keys else list(self.KEYS)
+
+    def compare(self, current, previous):
+        """One row per key seen in either period, with both periods and their deltas"""
+        keys = [key for key in self.keys
+                if (current is not None and key in current.columns)
+                or (previous is not None and key in previous.columns)]
+        current = self._empty_frame(keys) if current is None else current
+        previous = self._empty_frame(keys) if previous is None else previous
+        n_current = len(current)
+
+        # Shared key codes across both periods
+        combined = np.zeros(n_current + len(previous), dtype=np.int64)
+        key_uniques = []
+        for key in keys:
+            codes, uniques = self._shared_codes(current, previous, key)
+            if combined.max(initial=0) > np.iinfo(np.int64).max // (len(uniques) + 1):
+                # Re-number before the combined code could overflow
+                combined = pd.factorize(combined)[0].astype(np.int64)
+            combined = combined * (len(uniques) + 1) + codes
+            key_uniques.append((codes, uniques))
+        group_ids, group_uniques = pd.factorize(combined)
+        n_groups = len(group_uniques)
+
+        # Key values of each group from its first row
+        first_index = np.zeros(n_groups, dtype=np.int64)
+        first_index[group_ids[::-1]] = np.arange(len(combined))[::-1]
+        result = pd.DataFrame({key: uniques[codes[first_index]] for key, (codes, uniques) in zip(keys, key_uniques)})
+
+        for suffix, frame, ids in (('current', current, group_ids[:n_current]),
+                                   ('previous', previous, group_ids[n_current:])):
+            clicks = frame['clicks'].to_numpy(dtype=np.float64)
+            impressions = frame['impressions'].to_numpy(dtype=np.float64)
+            position = frame['position'].to_numpy(dtype=np.float64)
+            summed_clicks = np.bincount(ids, weights=clicks, minlength=n_groups)
+            summed_impressions = np.bincount(ids, weights=impressions, minlength=n_groups)
+            weighted_position = np.bincount(ids, weights=position * impressions, minlength=n_groups)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result[f'clicks_{suffix}'] = summed_clicks
+                result[f'impressions_{suffix}'] = summed_impressions
+                result[f'ctr_{suffix}'] = np.where(summed_impressions > 0, summed_clicks / summed_impressions, 0.0)
+                result[f'position_{suffix}'] = np.where(summed_impressions > 0,
+                                                        weighted_position / summed_impressions, np.nan)
+            result[f'rows_{suffix}'] = np.bincount(ids, minlength=n_groups)
+
+        for metric in ('clicks', 'impressions', 'ctr', 'position'):
+            result[f'{metric}_delta'] = result[f'{metric}_current'] - result[f'{metric}_previous']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for metric in ('clicks', 'impressions'):
+                previous_values = result[f'{metric}_previous'].to_numpy()
+                result[f'{metric}_delta_pct'] = np.where(previous_values > 0,
+                                                         result[f'{metric}_delta'] / previous_values * 100, np.nan)
+
+        in_current = result['rows_current'].to_numpy() > 0
+        in_previous = result['rows_previous'].to_numpy() > 0
+        clicks_delta = result['clicks_delta'].to_numpy()
+        result['status'] = np.select(
+            [~in_previous, ~in_current, clicks_delta > 0, clicks_delta < 0],
+            ['new', 'lost', 'winner', 'loser'],
+            default='unchanged'
+        )
+        return result.drop(columns=['rows_current', 'rows_previous'])
+
+    def _shared_codes(self, current, previous, key):
+        """Codes of one key column in both periods against a single set of uniques"""
+        parts = []
+        for frame in (current, previous):
+            if key in frame.columns:
+                parts.append(pd.factorize(frame[key], use_na_sentinel=False))
+            else:
+                parts.append((np.zeros(len(frame), dtype=np.int64), np.array([''], dtype=object)))
+        (current_codes, current_uniques), (previous_codes, previous_uniques) = parts
+        current_uniques = np.asarray(current_uniques, dtype=object)
+        previous_uniques = np.asarray(previous_uniques, dtype=object)
+
+        # Map the previous period's uniques onto the current ones, appending unseen values
+        lookup = pd.Index(current_uniques).get_indexer(previous_uniques)
+        missing = lookup < 0
+        lookup[missing] = len(current_uniques) + np.arange(missing.sum())
+        uniques = np.concatenate([current_uniques, previous_uniques[missing]])
+        codes = np.concatenate([current_codes, lookup[previous_codes]]).astype(np.int64)
+        return codes, uniques
+
+    def _empty_frame(self, keys):
+        return pd.DataFrame({column: [] for column in keys + ['clicks', 'impressions', 'position']})
+
+    def select(self, comparison, status=None, n=None):
+        """Rows of one status (all if None), largest click change first"""
+        rows = comparison if status is None else comparison[comparison['status'] == status]
+        order = np.argsort(-np.abs(rows['clicks_delta'].to_numpy()), kind='stable')
+        rows = rows.iloc[order]
+        return rows if n is None else rows.head(n)
+
+    def summarize(self, comparison, n=10):
+        """Period totals, status counts and the largest winners and losers as plain dicts"""
+        totals = {}
+        for suffix in ('current', 'previous'):
+            clicks = float(comparison[f'clicks_{suffix}'].sum())
+            impressions = float(comparison[f'impressions_{suffix}'].sum())
+            weighted = (comparison[f'position_{suffix}'].fillna(0) * comparison[f'impressions_{suffix}']).sum()
+            totals[suffix] = {
+                'clicks': clicks,
+                'impressions': impressions,
+                'ctr': clicks / impressions if impressions else 0.0,
+                'position': float(weighted / impressions) if impressions else 0.0
+            }
+        counts = comparison['status'].value_counts()
+        return {
+            'totals': totals,
+            'counts': {status: int(counts.get(status, 0)) for status in self.STATUSES},
+            'winners': self.select(comparison, 'winner', n).to_dict('records'),
+            'losers': self.select(comparison, 'loser', n).to_dict('records'),
+            'new': self.select(comparison, 'new', n).to_dict('records'),
+            'lost': self.select(comparison, 'lost', n).to_dict('records')
+        }
@@ -0,0 +1,187 @@
+import re
+import json
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+# Category -> keyword phrases (matched on whole words) and regular expressions.
+# 'brand' decides brand vs non-brand; the other categories are intents, the
+# first matching one in this order wins.
+DEFAULT_RULES = {
+    'brand': {'keywords': [], 'patterns': []},
+    'question': {
+        'keywords': ['how', 'what', 'why', 'when', 'where', 'who', 'which', 'how to', 'how much', 'how many'],
+        'patterns': [r'\?\s*$', r'^(can|could|does|do|did|is|are|should|will|would)\b']
+    },
+    'product': {
+        'keywords': ['buy', 'price', 'prices', 'pricing', 'cost', 'cheap', 'cheapest', 'best', 'review', 'reviews',
+                     'vs', 'versus', 'compare', 'comparison', 'discount', 'deal', 'deals', 'coupon', 'order',
+                     'shop', 'store', 'for sale', 'near me', 'free trial', 'alternative', 'alternatives'],
+        'patterns': []
+    }
+}
+
+BRAND = 'brand'
+TOKEN_RE = re.compile(r"\w+")
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over word tokens.
+
+    Every keyword phrase is a path of tokens carrying a bitmask of the
+    categories it belongs to. One left-to-right pass over a query's tokens
+    reports the union of the masks of all phrases it contains, however many
+    keywords there are.
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [0]
+
+    def add(self, phrase, mask):
+        tokens = TOKEN_RE.findall(phrase.lower())
+        if not tokens:
+            return
+        state = 0
+        for token in tokens:
+            if token not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(0)
+                self.goto[state][token] = len(self.goto) - 1
+            state = self.goto[state][token]
+        self.output[state] |= mask
+
+    def build(self):
+        """Compute failure links breadth-first and fold outputs along them"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(token, 0)
+                self.output[child] |= self.output[self.fail[child]]
+        return self
+
+    def match(self, tokens):
+        mask = 0
+        state = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for token in tokens:
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            mask |= output[state]
+        return mask
+
+
+class QueryClassifier:
+    """Tags queries as brand/non-brand and with an intent from user rule sets.
+
+    All keyword rules are compiled into one KeywordAutomaton and the regex
+    rules of each category into one alternation. Each distinct query is
+    classified once and the result is broadcast to its rows.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self.categories = list(self.rules)
+        self.intents = [category for category in self.categories if category != BRAND]
+        self.automaton = KeywordAutomaton()
+        self.patterns = {}
+        for bit, category in enumerate(self.categories):
+            rule = self.rules[category] or {}
+            for keyword in rule.get('keywords', []):
+                self.automaton.add(keyword, 1 << bit)
+            patterns = [pattern for pattern in rule.get('patterns', []) if pattern]
+            if patterns:
+                # Raises re.error for invalid user patterns
+                self.patterns[bit] = re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), re.IGNORECASE)
+        self.automaton.build()
+
+    @classmethod
+    def from_json(cls, text):
+        """Classifier from a JSON rule set; empty text gives the default rules"""
+        return cls(json.loads(text) if text and text.strip() else None)
+
+    def category_masks(self, queries):
+        """Category bitmask of each query"""
+        masks = np.fromiter((self.automaton.match(TOKEN_RE.findall(query.lower())) for query in queries),
+                            dtype=np.int64, count=len(queries))
+        for bit, pattern in self.patterns.items():
+            found = np.fromiter((pattern.search(query) is not None for query in queries), dtype=bool,
+                                count=len(queries))
+            masks[found] |= 1 << bit
+        return masks
+
+    def classify(self, queries):
+        """query_class ('brand'/'non-brand') and query_intent per query as categoricals; anonymized queries get ''"""
+        codes, uniques = pd.factorize(pd.Series(queries).fillna(''))
+        uniques = [str(value) for value in uniques]
+        masks = self.category_masks(uniques)
+
+        brand_bit = 1 << self.categories.index(BRAND) if BRAND in self.categories else 0
+        class_codes = np.where(masks & brand_bit, 0, 1)
+        intent_names = self.intents + ['other', '']
+        intent_codes = np.full(len(uniques), len(self.intents), dtype=np.int64)
+        # Earlier intents take priority, so assign in reverse order
+        for index in reversed(range(len(self.intents))):
+            intent_codes[(masks & (1 << self.categories.index(self.intents[index]))) != 0] = index
+        empty = np.array([not value for value in uniques], dtype=bool)
+        class_codes[empty] = 2
+        intent_codes[empty] = len(intent_names) - 1
+        # Categoricals keep one small code per row instead of a string object
+        return (pd.Categorical.from_codes(class_codes[codes], ['brand', 'non-brand', '']),
+                pd.Categorical.from_codes(intent_codes[codes], intent_names))
+
+    def apply(self, df):
+        """Copy of df with query_class and query_intent columns"""
+        df = df.copy()
+        if 'query' not in df.columns:
+            df['query_class'] = ''
+            df['query_intent'] = ''
+            return df
+        df['query_class'], df['query_intent'] = self.classify(df['query'])
+        return df
+
+
+def segment_summary(df):
+    """Clicks, impressions, CTR, weighted position and click share per query class and intent"""
+    summary = {}
+    if df is None or df.empty or 'query_class' not in df.columns:
+        return summary
+    data = df[(df['query_class'] != '').to_numpy()]
+    if data.empty:
+        return summary
+
+    clicks = data['clicks'].to_numpy(dtype=np.float64)
+    impressions = data['impressions'].to_numpy(dtype=np.float64)
+    weighted_position = data['position'].to_numpy(dtype=np.float64) * impressions
+    total_clicks = clicks.sum()
+    # Segments are a function of the query, so each query is counted at its first row
+    query_codes, query_uniques = pd.factorize(data['query'])
+    first_rows = np.zeros(len(query_uniques), dtype=np.int64)
+    first_rows[query_codes[::-1]] = np.arange(len(data))[::-1]
+
+    for column in ('query_class', 'query_intent'):
+        codes, segments = pd.factorize(data[column])
+        segment_clicks = np.bincount(codes, weights=clicks, minlength=len(segments))
+        segment_impressions = np.bincount(codes, weights=impressions, minlength=len(segments))
+        segment_position = np.bincount(codes, weights=weighted_position, minlength=len(segments))
+        segment_queries = np.bincount(codes[first_rows], minlength=len(segments))
+        summary[column] = sorted([{
+            'segment': segment,
+            'queries': int(segment_queries[index]),
+            'clicks': int(segment_clicks[index]),
+            'impressions': int(segment_impressions[index]),
+            'ctr': float(segment_clicks[index] / segment_impressions[index]) if segment_impressions[index] else 0.0,
+            'position': float(segment_position[index] / segment_impressions[index]) if segment_impressions[index] else 0.0,
+            'click_share': float(segment_clicks[index] / total_clicks * 100) if total_clicks else 0.0
+        } for index, segment in enumerate(segments)], key=lambda row: row['clicks'], reverse=True)
+    return summary
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+
+class QueryPageIndex:
+    """Bidirectional query <-> page index over (query, page) pair totals.
+
+    Rows are aggregated to one entry per (query, page) pair, then stored twice
+    in CSR form: sorted by query (query_indptr) and by page (page_indptr),
+    each segment ordered by impressions, largest first. The pages ranking for
+    a query, or the queries a page ranks for, are a slice instead of a scan.
+    """
+
+    def __init__(self, queries, pages, pair_query, pair_page, clicks, impressions, position,
+                 query_indptr, page_indptr, page_order):
+        self.queries = queries
+        self.pages = pages
+        self.pair_query = pair_query
+        self.pair_page = pair_page
+        self.clicks = clicks
+        self.impressions = impressions
+        self.position = position
+        self.query_indptr = query_indptr
+        self.page_indptr = page_indptr
+        self.page_order = page_order
+        self.query_lookup = pd.Index(queries)
+        self.page_lookup = pd.Index(pages)
+
+    @classmethod
+    def build(cls, df):
+        """Index the (query, page) pairs of a dataset; rows without a query or page are skipped"""
+        if df is None or df.empty or 'query' not in df.columns or 'page' not in df.columns:
+            return cls.empty()
+        mask = (df['query'] != '') & (df['page'] != '')
+        data = df[mask.to_numpy()]
+        if data.empty:
+            return cls.empty()
+
+        query_codes, queries = pd.factorize(data['query'])
+        page_codes, pages = pd.factorize(data['page'])
+        pair_codes, pair_keys = pd.factorize(query_codes.astype(np.int64) * len(pages) + page_codes)
+        n_pairs = len(pair_keys)
+        impressions = data['impressions'].to_numpy(dtype=np.float64)
+        clicks = np.bincount(pair_codes, weights=data['clicks'].to_numpy(dtype=np.float64), minlength=n_pairs)
+        weighted = np.bincount(pair_codes, weights=data['position'].to_numpy(dtype=np.float64) * impressions,
+                               minlength=n_pairs)
+        impressions = np.bincount(pair_codes, weights=impressions, minlength=n_pairs)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            position = np.where(impressions > 0, weighted / impressions, np.nan)
+        pair_query = (pair_keys // len(pages)).astype(np.int64)
+        pair_page = (pair_keys % len(pages)).astype(np.int64)
+
+        # Query-major order (the primary layout), then a permutation for page-major access
+        order = np.lexsort((-impressions, pair_query))
+        pair_query, pair_page = pair_query[order], pair_page[order]
+        clicks, impressions, position = clicks[order], impressions[order], position[order]
+        page_order = np.lexsort((-impressions, pair_page))
+
+        query_indptr = np.zeros(len(queries) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pair_query, minlength=len(queries)), out=query_indptr[1:])
+        page_indptr = np.zeros(len(pages) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pair_page, minlength=len(pages)), out=page_indptr[1:])
+
+        return cls(np.asarray(queries, dtype=object), np.asarray(pages, dtype=object), pair_query, pair_page,
+                   clicks, impressions, position, query_indptr, page_indptr, page_order)
+
+    @classmethod
+    def empty(cls):
+        none = np.array([], dtype=np.int64)
+        return cls(np.array([], dtype=object), np.array([], dtype=object), none, none,
+                   np.array([]), np.array([]), np.array([]), np.zeros(1, dtype=np.int64),
+                   np.zeros(1, dtype=np.int64), none)
+
+    def __len__(self):
+        return len(self.pair_query)
+
+    def pages_for(self, query):
+        """Pages ranking for a query, most impressions first"""
+        code = self.query_lookup.get_indexer([query])[0]
+        if code < 0:
+            return self._pairs(np.array([], dtype=np.int64), 'page')
+        return self._pairs(np.arange(self.query_indptr[code], self.query_indptr[code + 1]), 'page')
+
+    def queries_for(self, page):
+        """Queries a page ranks for, most impressions first"""
+        code = self.page_lookup.get_indexer([page])[0]
+        if code < 0:
+            return self._pairs(np.array([], dtype=np.int64), 'query')
+        return self._pairs(self.page_order[self.page_indptr[code]:self.page_indptr[code + 1]], 'query')
+
+    def _pairs(self, rows, column):
+        names = self.pages[self.pair_page[rows]] if column == 'page' else self.queries[self.pair_query[rows]]
+        impressions = self.impressions[rows]
+        total = impressions.sum()
+        return pd.DataFrame({
+            column: names,
+            'clicks': self.clicks[rows],
+            'impressions': impressions,
+            'position': self.position[rows],
+            'share': impressions / total if total else np.zeros(len(rows))
+        })
+
+    def cannibalization(self, min_share=0.1, min_impressions=100, n=None):
+        """Queries where several pages each take at least min_share of the impressions.
+
+        split is 1 minus the Herfindahl index of the page impression shares
+        (0 when one page has everything); contested is the impressions not
+        going to the top page. Results are sorted by contested impressions.
+        """
+        columns = ['query', 'impressions', 'clicks', 'pages', 'top_page', 'top_share', 'second_page',
+                   'second_share', 'best_position', 'position_spread', 'split', 'contested']
+        if not len(self):
+            return pd.DataFrame(columns=columns)
+
+        n_queries = len(self.queries)
+        query_impressions = np.bincount(self.pair_query, weights=self.impressions, minlength=n_queries)
+        query_clicks = np.bincount(self.pair_query, weights=self.clicks, minlength=n_queries)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(query_impressions[self.pair_query] > 0,
+                             self.impressions / query_impressions[self.pair_query], 0.0)
+        competing = share >= min_share
+        competing_pages = np.bincount(self.pair_query, weights=competing, minlength=n_queries)
+        split = 1 - np.bincount(self.pair_query, weights=share ** 2, minlength=n_queries)
+
+        candidates = np.flatnonzero((competing_pages >= 2) & (query_impressions >= min_impressions))
+        if not len(candidates):
+            return pd.DataFrame(columns=columns)
+
+        # Segments are sorted by impressions, so the first two entries are the top pages
+        top = self.query_indptr[candidates]
+        second = top + 1
+        competing_position = np.where(competing, self.position, np.nan)
+        starts = self.query_indptr[:-1]
+        present = starts < self.query_indptr[1:]
+        best_position = np.full(n_queries, np.nan)
+        worst_position = np.full(n_queries, np.nan)
+        best_position[present] = np.fmin.reduceat(competing_position, starts[present])
+        worst_position[present] = np.fmax.reduceat(competing_position, starts[present])
+
+        report = pd.DataFrame({
+            'query': self.queries[candidates],
+            'impressions': query_impressions[candidates],
+            'clicks': query_clicks[candidates],
+            'pages': competing_pages[candidates].astype(np.int64),
+            'top_page': self.pages[self.pair_page[top]],
+            'top_share': share[top],
+            'second_page': self.pages[self.pair_page[second]],
+            'second_share': share[second],
+            'best_position': best_position[candidates],
+            'position_spread': worst_position[candidates] - best_position[candidates],
+            'split': split[candidates],
+            'contested': query_impressions[candidates] * (1 - share[top])
+        })
+        report = report.sort_values('contested', ascending=False, kind='stable').reset_index(drop=True)
+        return report if n is None else report.head(n)
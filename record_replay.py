@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import defaultdict
+
+
+MODES = ('off', 'record', 'replay')
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when no recording matches a request"""
+
+
+class RecordedError(Exception):
+    """Replays an exception that was raised while recording"""
+
+
+class Cassette:
+    """Append-only JSON-lines file of recorded request/response pairs.
+
+    Interactions are keyed by a hash of the request. Identical requests are
+    replayed in recording order; once exhausted the last one is repeated, so
+    replay loops can run any number of times.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.interactions = defaultdict(list)
+        self.positions = defaultdict(int)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        interaction = json.loads(line)
+                        self.interactions[interaction['key']].append(interaction)
+
+    def __len__(self):
+        return sum(len(items) for items in self.interactions.values())
+
+    @staticmethod
+    def make_key(*parts):
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def record(self, key, request, response, duration):
+        interaction = {'key': key, 'request': request, 'response': response, 'duration': duration}
+        with self.lock:
+            self.interactions[key].append(interaction)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(interaction) + '\n')
+
+    def play(self, key, description=''):
+        with self.lock:
+            items = self.interactions.get(key)
+            if not items:
+                raise CassetteMiss(f"No recording in {os.path.basename(self.path)} for {description or key}")
+            position = self.positions[key]
+            self.positions[key] = position + 1
+            return items[min(position, len(items) - 1)]
+
+
+def _emulate(duration, emulate_timing):
+    if emulate_timing and duration:
+        time.sleep(duration * emulate_timing)
+
+
+# ----- Gemini -----
+class RecordedUsageMetadata:
+    def __init__(self, usage):
+        self.prompt_token_count = usage.get('prompt_token_count')
+        self.candidates_token_count = usage.get('candidates_token_count')
+        self.total_token_count = usage.get('total_token_count')
+
+
+class RecordedResponse:
+    """Stand-in for a GenerateContentResponse with the fields the analyzer reads"""
+
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.usage_metadata = RecordedUsageMetadata(usage) if usage else None
+
+
+class RecordingModel:
+    """Wraps a generative model and records every generate_content call"""
+
+    def __init__(self, model, cassette):
+        self.model = model
+        self.cassette = cassette
+        self.model_name = getattr(model, 'model_name', '')
+
+    def generate_content(self, prompt):
+        key = Cassette.make_key('generate_content', prompt)
+        start = time.perf_counter()
+        try:
+            response = self.model.generate_content(prompt)
+            text = response.text if response else None
+        except Exception as e:
+            self.cassette.record(key, {'prompt': prompt}, {'error': str(e), 'type': type(e).__name__},
+                                 time.perf_counter() - start)
+            raise
+        usage = getattr(response, 'usage_metadata', None)
+        recorded_usage = {
+            name: getattr(usage, name, None)
+            for name in ('prompt_token_count', 'candidates_token_count', 'total_token_count')
+        } if usage is not None else None
+        self.cassette.record(key, {'prompt': prompt}, {'text': text, 'usage': recorded_usage},
+                             time.perf_counter() - start)
+        return response
+
+
+class ReplayModel:
+    """Serves recorded generate_content responses without network access"""
+
+    def __init__(self, cassette, emulate_timing=0.0, model_name='replay'):
+        self.cassette = cassette
+        self.emulate_timing = emulate_timing
+        self.model_name = model_name
+
+    def generate_content(self, prompt):
+        interaction = self.cassette.play(Cassette.make_key('generate_content', prompt),
+                                         f"prompt of {len(prompt):,} chars")
+        _emulate(interaction['duration'], self.emulate_timing)
+        response = interaction['response']
+        if 'error' in response:
+            raise RecordedError(f"{response.get('type', 'Error')}: {response['error']}")
+        return RecordedResponse(response['text'], response.get('usage'))
+
+
+# ----- HTTP (Search Console) -----
+def _http_key(method, uri, body):
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if body:
+        try:
+            # Canonical JSON so key order does not matter
+            body = json.dumps(json.loads(body), sort_keys=True).encode('utf-8')
+        except ValueError:
+            pass
+    return Cassette.make_key(method.upper(), uri, body or b'')
+
+
+class RecordingHttp:
+    """httplib2.Http wrapper that records each request/response pair.
+
+    Authorization headers are never written to the cassette.
+    """
+
+    def __init__(self, http, cassette):
+        self.http = http
+        self.cassette = cassette
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+        start = time.perf_counter()
+        response, content = self.http.request(uri, method, body=body, headers=headers, *args, **kwargs)
+        raw = content if isinstance(content, bytes) else str(content).encode('utf-8')
+        self.cassette.record(
+            _http_key(method, uri, body),
+            {'method': method, 'uri': uri, 'body': body.decode('utf-8') if isinstance(body, bytes) else body},
+            {'status': response.status, 'headers': {k: v for k, v in response.items() if k != 'status'},
+             'content': raw.decode('utf-8', errors='replace')},
+            time.perf_counter() - start
+        )
+        return response, content
+
+
+class ReplayHttp:
+    """httplib2-compatible transport that serves recorded responses"""
+
+    def __init__(self, cassette, emulate_timing=0.0):
+        self.cassette = cassette
+        self.emulate_timing = emulate_timing
+        self.timeout = None
+
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+        import httplib2
+
+        interaction = self.cassette.play(_http_key(method, uri, body), f"{method} {uri}")
+        _emulate(interaction['duration'], self.emulate_timing)
+        recorded = interaction['response']
+        response = httplib2.Response(dict(recorded['headers'], status=str(recorded['status'])))
+        return response, recorded['content'].encode('utf-8')
+
+    def close(self):
+        pass
+
+
+class RecordReplay:
+    """Record/replay settings shared by the Gemini and Search Console clients.
+
+    mode is 'off', 'record' or 'replay'. Recordings live in cassette_dir as
+    gemini.jsonl and gsc.jsonl. emulate_timing scales recorded durations in
+    replay mode (0 replays instantly, 1 at recorded speed).
+    """
+
+    def __init__(self, mode='off', cassette_dir=None, emulate_timing=0.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown record/replay mode: {mode}")
+        if mode != 'off' and not cassette_dir:
+            raise ValueError("A cassette directory is required for record/replay")
+        self.mode = mode
+        self.cassette_dir = cassette_dir
+        self.emulate_timing = emulate_timing
+        self.cassettes = {}
+
+    @property
+    def active(self):
+        return self.mode != 'off'
+
+    def cassette(self, name):
+        if name not in self.cassettes:
+            self.cassettes[name] = Cassette(os.path.join(self.cassette_dir, f'{name}.jsonl'))
+        return self.cassettes[name]
+
+    def wrap_model(self, model):
+        """Model to use for generate_content calls in the current mode"""
+        if self.mode == 'record':
+            return RecordingModel(model, self.cassette('gemini'))
+        if self.mode == 'replay':
+            return ReplayModel(self.cassette('gemini'), self.emulate_timing)
+        return model
+
+    def gsc_http(self, credentials=None):
+        """Authorized HTTP transport for the Search Console client in the current mode"""
+        import httplib2
+
+        if self.mode == 'replay':
+            return ReplayHttp(self.cassette('gsc'), self.emulate_timing)
+        http = RecordingHttp(httplib2.Http(), self.cassette('gsc'))
+        if credentials is None:
+            return http
+        import google_auth_httplib2
+        return google_auth_httplib2.AuthorizedHttp(credentials, http=http)
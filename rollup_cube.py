@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+
+
+# Rollup name -> key columns. The leading key is the one drill-downs filter
+# on; every rollup ends with date so any date range can be sliced out.
+ROLLUPS = {
+    'date': ('date',),
+    'device': ('device', 'date'),
+    'country': ('country', 'date'),
+    'device_country': ('device', 'country', 'date'),
+    'page': ('page', 'date'),
+    'query': ('query', 'date')
+}
+
+
+class Rollup:
+    """One pre-aggregated group-by, sorted by its key codes.
+
+    Each key is stored as integer codes into a sorted dictionary of values,
+    so rows are ordered by the leading key and the rows of one member are a
+    contiguous slice found by binary search.
+    """
+
+    METRICS = ['clicks', 'impressions', 'weighted_position']
+
+    def __init__(self, keys, codes, dictionaries, metrics):
+        self.keys = tuple(keys)
+        self.codes = codes
+        self.dictionaries = dictionaries
+        self.metrics = metrics
+
+    @classmethod
+    def aggregate(cls, keys, codes, dictionaries, values):
+        """Sum per-row metric values over the distinct combinations of keys"""
+        combined = np.zeros(len(values), dtype=np.int64)
+        for key in keys:
+            combined = combined * len(dictionaries[key]) + codes[key]
+        # Sorted uniques of the mixed-radix code are in key order, leading key first
+        group_ids, groups = pd.factorize(combined, sort=True)
+        groups = np.asarray(groups, dtype=np.int64)
+        n_groups = len(groups)
+
+        group_codes = {}
+        for key in reversed(keys):
+            groups, group_codes[key] = np.divmod(groups, len(dictionaries[key]))
+        metrics = {
+            metric: np.bincount(group_ids, weights=values[:, column], minlength=n_groups)
+            for column, metric in enumerate(cls.METRICS)
+        }
+        return cls(keys, {key: group_codes[key] for key in keys},
+                   {key: dictionaries[key] for key in keys}, metrics)
+
+    def __len__(self):
+        return len(self.metrics['clicks'])
+
+    def select(self, filters=None, start_date=None, end_date=None):
+        """Row positions matching {key: value} filters and a date range"""
+        lo, hi = 0, len(self)
+        mask = None
+        for key, value in (filters or {}).items():
+            dictionary = self.dictionaries[key]
+            if key == 'date':
+                value = np.datetime64(pd.Timestamp(value), 'D')
+            code = int(np.searchsorted(dictionary, value))
+            if code >= len(dictionary) or dictionary[code] != value:
+                return np.array([], dtype=np.int64)
+            if key == self.keys[0]:
+                # The leading key is sorted: its rows are one slice
+                codes = self.codes[key]
+                lo = int(np.searchsorted(codes, code, side='left'))
+                hi = int(np.searchsorted(codes, code, side='right'))
+                mask = None if mask is None else mask[lo:hi]
+            else:
+                key_mask = np.asarray(self.codes[key][lo:hi]) == code
+                mask = key_mask if mask is None else mask & key_mask
+
+        if start_date is not None or end_date is not None:
+            dates = self.dictionaries['date']
+            first = np.searchsorted(dates, np.datetime64(start_date, 'D')) if start_date is not None else 0
+            last = np.searchsorted(dates, np.datetime64(end_date, 'D'), side='right') if end_date is not None else len(dates)
+            date_codes = np.asarray(self.codes['date'][lo:hi])
+            date_mask = (date_codes >= first) & (date_codes < last)
+            mask = date_mask if mask is None else mask & date_mask
+
+        rows = np.arange(lo, hi)
+        return rows if mask is None else rows[mask]
+
+    def frame(self, rows, dimensions):
+        """Metrics of the selected rows grouped by dimensions (a subset of the keys)"""
+        if set(dimensions) == set(self.keys):
+            group_ids = np.arange(len(rows))
+            group_codes = {key: np.asarray(self.codes[key][rows]) for key in dimensions}
+            n_groups = len(rows)
+        else:
+            combined = np.zeros(len(rows), dtype=np.int64)
+            for key in dimensions:
+                combined = combined * len(self.dictionaries[key]) + np.asarray(self.codes[key][rows])
+            group_ids, groups = pd.factorize(combined, sort=True)
+            groups = np.asarray(groups, dtype=np.int64)
+            n_groups = len(groups)
+            group_codes = {}
+            for key in reversed(dimensions):
+                groups, group_codes[key] = np.divmod(groups, len(self.dictionaries[key]))
+
+        result = pd.DataFrame({key: np.asarray(self.dictionaries[key])[group_codes[key]] for key in dimensions})
+        clicks, impressions, weighted = (
+            np.bincount(group_ids, weights=np.asarray(self.metrics[metric][rows]), minlength=n_groups)
+            for metric in self.METRICS
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result['clicks'] = clicks
+            result['impressions'] = impressions
+            result['ctr'] = np.where(impressions > 0, clicks / impressions, 0.0)
+            result['position'] = np.where(impressions > 0, weighted / impressions, np.nan)
+        return result
+
+
+class RollupCube:
+    """Materialized rollups of a dataset for pivots and drill-downs.
+
+    Built once per loaded dataset (or read back from the warehouse), then
+    every pivot is answered from the smallest rollup that has the requested
+    dimensions and filter columns. Filtering on a rollup's leading key is a
+    binary search, so drilling into one page or query costs O(result)
+    instead of a scan of the raw rows. Position is impression-weighted and
+    CTR is recomputed from summed clicks and impressions.
+    """
+
+    def __init__(self, rollups=None):
+        self.rollups = rollups or {}
+
+    @classmethod
+    def build(cls, df, rollups=None):
+        """Aggregate every rollup whose key columns are present in df"""
+        rollups = ROLLUPS if rollups is None else rollups
+        if df is None or df.empty or 'date' not in df.columns:
+            return cls()
+
+        codes, dictionaries = {}, {}
+        for key in {key for keys in rollups.values() for key in keys if key in df.columns}:
+            column = pd.to_datetime(df[key]).dt.floor('D') if key == 'date' else df[key].fillna('')
+            key_codes, uniques = pd.factorize(column, sort=True)
+            codes[key] = key_codes.astype(np.int64)
+            dictionaries[key] = (np.asarray(uniques).astype('datetime64[D]') if key == 'date'
+                                 else np.asarray(uniques, dtype=object))
+
+        impressions = df['impressions'].to_numpy(dtype=np.float64)
+        values = np.column_stack([
+            df['clicks'].to_numpy(dtype=np.float64),
+            impressions,
+            df['position'].to_numpy(dtype=np.float64) * impressions
+        ])
+        return cls({
+            name: Rollup.aggregate(keys, codes, dictionaries, values)
+            for name, keys in rollups.items() if all(key in codes for key in keys)
+        })
+
+    def __len__(self):
+        return sum(len(rollup) for rollup in self.rollups.values())
+
+    def rollup_for(self, columns):
+        """Name of the smallest rollup holding all columns, or None"""
+        columns = set(columns)
+        candidates = [name for name, rollup in self.rollups.items() if columns <= set(rollup.keys)]
+        return min(candidates, key=lambda name: len(self.rollups[name]), default=None)
+
+    def covers(self, columns):
+        return self.rollup_for(columns) is not None
+
+    def aggregate(self, dimensions, filters=None, start_date=None, end_date=None):
+        """Clicks, impressions, CTR and position by dimensions, restricted to {column: value} filters"""
+        dimensions = list(dimensions)
+        filters = filters or {}
+        name = self.rollup_for(set(dimensions) | set(filters) | {'date'})
+        if name is None:
+            raise KeyError(f"No rollup covers {sorted(set(dimensions) | set(filters))}")
+        rollup = self.rollups[name]
+        return rollup.frame(rollup.select(filters, start_date, end_date), dimensions)
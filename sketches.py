@@ -0,0 +1,246 @@
+import numpy as np
+import pandas as pd
+
+
+class KLLSketch:
+    """Mergeable quantile sketch (KLL).
+
+    Values are kept in levels; an item at level h stands for 2**h original
+    values. When a level outgrows its capacity it is sorted and every other
+    item is promoted to the next level, so the sketch stays at roughly 3*k
+    items however many values it has seen, with a rank error around 1/k.
+    Sketches of different days merge by concatenating levels and compacting.
+    """
+
+    def __init__(self, k=200, levels=None):
+        self.k = k
+        self.levels = levels if levels is not None else [np.array([], dtype=np.float64)]
+        self.flip = 0
+
+    @property
+    def n(self):
+        return sum(len(level) << height for height, level in enumerate(self.levels))
+
+    def _capacity(self, height):
+        depth = len(self.levels) - height - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compact()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.array([], dtype=np.float64))
+        for height, level in enumerate(other.levels):
+            self.levels[height] = np.concatenate([self.levels[height], level])
+        self._compact()
+        return self
+
+    def _compact(self):
+        height = 0
+        while height < len(self.levels):
+            level = self.levels[height]
+            if len(level) <= self._capacity(height):
+                height += 1
+                continue
+            if height + 1 == len(self.levels):
+                self.levels.append(np.array([], dtype=np.float64))
+            level = np.sort(level)
+            # An odd item out stays behind; alternate the kept half to avoid bias
+            leftover, level = level[:len(level) % 2], level[len(level) % 2:]
+            self.flip ^= 1
+            self.levels[height + 1] = np.concatenate([self.levels[height + 1], level[self.flip::2]])
+            self.levels[height] = leftover
+            # Adding a level shrinks every lower capacity, so start over
+            height = 0
+
+    def quantile(self, q):
+        """Approximate q-quantile(s); NaN for an empty sketch"""
+        items = np.concatenate(self.levels)
+        if not len(items):
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        weights = np.concatenate([np.full(len(level), 1 << height, dtype=np.int64)
+                                  for height, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        ranks = np.asarray(q, dtype=np.float64) * cumulative[-1]
+        index = np.minimum(np.searchsorted(cumulative, ranks, side='left'), len(items) - 1)
+        return items[order][index]
+
+    def to_arrays(self):
+        """(items, level sizes) for storage"""
+        return np.concatenate(self.levels), np.array([len(level) for level in self.levels], dtype=np.int64)
+
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch with 2**p one-byte registers (p=12: 4 KB, ~1.6% error)"""
+
+    def __init__(self, p=12, registers=None):
+        self.p = p
+        self.registers = registers if registers is not None else np.zeros(1 << p, dtype=np.uint8)
+
+    @staticmethod
+    def hash_values(values):
+        return pd.util.hash_array(np.asarray(values, dtype=object))
+
+    def update(self, values):
+        return self.update_hashes(self.hash_values(values))
+
+    def update_hashes(self, hashes):
+        """Add 64-bit hashes; duplicates do not change the registers"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return self
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        # Leading zeros of the remaining bits + 1; frexp's exponent is the bit length
+        rank = (64 - self.p) - np.frexp(rest.astype(np.float64))[1] + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class SketchSet:
+    """Quantile sketches of row metrics and distinct counts of text columns.
+
+    One set is kept per day; any date range is answered by merging the days
+    instead of reloading their rows.
+    """
+
+    QUANTILE_COLUMNS = ['impressions', 'ctr', 'position']
+    DISTINCT_COLUMNS = ['query', 'page']
+
+    def __init__(self, quantiles=None, distinct=None):
+        self.quantiles = quantiles or {column: KLLSketch() for column in self.QUANTILE_COLUMNS}
+        self.distinct = distinct or {column: HyperLogLog() for column in self.DISTINCT_COLUMNS}
+
+    @classmethod
+    def daily(cls, df):
+        """{day: SketchSet} for a date-sorted frame"""
+        if df.empty:
+            return {}
+        days = df['date'].to_numpy().astype('datetime64[D]')
+        starts = np.flatnonzero(np.concatenate(([True], days[1:] != days[:-1])))
+        bounds = np.append(starts, len(days))
+        # Hash each distinct value once for all days; empty (anonymized) values are not counted
+        row_hashes = {}
+        for column in cls.DISTINCT_COLUMNS:
+            codes, uniques = pd.factorize(df[column])
+            uniques = np.asarray(uniques, dtype=object)
+            present = (codes >= 0) & np.append(uniques != '', False)[codes]
+            offsets = np.concatenate(([0], np.cumsum(present)))
+            row_hashes[column] = (HyperLogLog.hash_values(uniques)[codes[present]], offsets)
+        values = {column: df[column].to_numpy(dtype=np.float64) for column in cls.QUANTILE_COLUMNS}
+
+        sketches = {}
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            sketch = cls()
+            for column in cls.QUANTILE_COLUMNS:
+                sketch.quantiles[column].update(values[column][start:end])
+            for column, (hashes, offsets) in row_hashes.items():
+                sketch.distinct[column].update_hashes(hashes[offsets[start]:offsets[end]])
+            sketches[days[start]] = sketch
+        return sketches
+
+    def merge(self, other):
+        for column, sketch in other.quantiles.items():
+            self.quantiles[column].merge(sketch)
+        for column, sketch in other.distinct.items():
+            self.distinct[column].merge(sketch)
+        return self
+
+    def distribution(self):
+        """Thresholds and distinct counts used by the analysis, estimated from the sketches"""
+        impressions = self.quantiles['impressions'].quantile([0.3, 0.5, 0.8])
+        return {
+            'impressions_p30': float(impressions[0]),
+            'impressions_p50': float(impressions[1]),
+            'impressions_p80': float(impressions[2]),
+            'ctr_p30': float(self.quantiles['ctr'].quantile(0.3)),
+            'distinct_queries': self.distinct['query'].count(),
+            'distinct_pages': self.distinct['page'].count(),
+            'approximate': True
+        }
+
+    # ----- Storage -----
+    @classmethod
+    def save_daily(cls, path, sketches):
+        """Store {day: SketchSet} in one .npz file"""
+        days = sorted(sketches)
+        arrays = {'days': np.array(days, dtype='datetime64[D]')}
+        for column in cls.QUANTILE_COLUMNS:
+            parts = [sketches[day].quantiles[column].to_arrays() for day in days]
+            height = max((len(sizes) for _, sizes in parts), default=0)
+            arrays[f"{column}.items"] = np.concatenate([items for items, _ in parts]) if parts else np.array([])
+            arrays[f"{column}.sizes"] = np.array([np.pad(sizes, (0, height - len(sizes))) for _, sizes in parts],
+                                                 dtype=np.int64).reshape(len(days), height)
+        for column in cls.DISTINCT_COLUMNS:
+            registers = [sketches[day].distinct[column].registers for day in days]
+            # A month without rows still needs a (0, registers) array
+            arrays[f"{column}.registers"] = (np.array(registers, dtype=np.uint8) if registers
+                                             else np.zeros((0, len(HyperLogLog().registers)), dtype=np.uint8))
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load_range(cls, path, start_date, end_date):
+        """Merged SketchSet of the stored days within the range"""
+        with np.load(path) as stored:
+            days = stored['days']
+            selected = (days >= np.datetime64(start_date, 'D')) & (days <= np.datetime64(end_date, 'D'))
+            quantiles, distinct = {}, {}
+            for column in cls.QUANTILE_COLUMNS:
+                items, sizes = stored[f"{column}.items"], stored[f"{column}.sizes"]
+                day_bounds = np.concatenate(([0], np.cumsum(sizes.sum(axis=1))))
+                levels = []
+                for height in range(sizes.shape[1]):
+                    # Level h of every selected day, located from the per-day level sizes
+                    starts = day_bounds[:-1][selected] + sizes[selected, :height].sum(axis=1)
+                    ends = starts + sizes[selected, height]
+                    levels.append(np.concatenate([items[start:end] for start, end in zip(starts, ends)])
+                                  if len(starts) else np.array([], dtype=np.float64))
+                sketch = KLLSketch(levels=levels or None)
+                sketch._compact()
+                quantiles[column] = sketch
+            for column in cls.DISTINCT_COLUMNS:
+                registers = stored[f"{column}.registers"][selected]
+                distinct[column] = HyperLogLog(registers=registers.max(axis=0) if len(registers) else None)
+        return cls(quantiles, distinct)
+
+
+def _distinct_count(df, column):
+    if column not in df.columns:
+        return None
+    uniques = pd.unique(df[column].dropna())
+    return int(len(uniques) - np.count_nonzero(np.asarray(uniques, dtype=object) == ''))
+
+
+def exact_distribution(df):
+    """The same thresholds and counts as SketchSet.distribution, computed exactly from rows"""
+    impressions = np.quantile(df['impressions'].to_numpy(dtype=np.float64), [0.3, 0.5, 0.8]) if len(df) else [np.nan] * 3
+    return {
+        'impressions_p30': float(impressions[0]),
+        'impressions_p50': float(impressions[1]),
+        'impressions_p80': float(impressions[2]),
+        'ctr_p30': float(df['ctr'].quantile(0.3)) if len(df) else np.nan,
+        'distinct_queries': _distinct_count(df, 'query'),
+        'distinct_pages': _distinct_count(df, 'page'),
+        'approximate': False
+    }
@@ -0,0 +1,170 @@
+import os
+import json
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from data_models import DetailStats
+from data_warehouse import _StringDictionary
+from rollup_cube import ROLLUPS, RollupCube
+from sketches import SketchSet
+
+
+class SpillStore:
+    """Detail rows kept in memory up to a ceiling, then spilled to disk in chunks.
+
+    Pages are appended as DataFrames. Once the buffered pages take more
+    than half of memory_limit they are written out as one chunk, so the
+    buffer plus one chunk being processed stay around the ceiling. A chunk
+    is a directory of .npy columns with strings dictionary-encoded like
+    warehouse partitions, so reading it never unpickles anything. The
+    analysis helpers below read one chunk at a time and combine partial
+    results (sums per group, top rows, mergeable sketches), so a dataset
+    larger than memory is summarized without ever being loaded whole.
+    """
+
+    METRICS = ['clicks', 'impressions', 'weighted_position']
+
+    def __init__(self, spill_dir, memory_limit):
+        self.spill_dir = spill_dir
+        self.memory_limit = memory_limit
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.chunk_paths = []
+        self.row_bytes = 0.0
+        self.stats = DetailStats()
+
+    @property
+    def spilled(self):
+        return bool(self.chunk_paths)
+
+    def __len__(self):
+        return self.stats.rows
+
+    def append(self, df):
+        if df.empty:
+            return
+        size = int(df.memory_usage(deep=True).sum())
+        self.row_bytes = max(self.row_bytes, size / len(df))
+        self.buffer.append(df)
+        self.buffer_bytes += size
+        self.stats.add(df)
+        if self.buffer_bytes > self.memory_limit // 2:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered pages as one chunk"""
+        if not self.buffer:
+            return
+        path = os.path.join(self.spill_dir, f"chunk-{len(self.chunk_paths):05d}")
+        self._write_chunk(path, pd.concat(self.buffer, ignore_index=True))
+        self.chunk_paths.append(path)
+        self.buffer = []
+        self.buffer_bytes = 0
+
+    @staticmethod
+    def _write_chunk(path, df):
+        os.makedirs(path)
+        string_columns = [column for column in df.columns
+                          if not pd.api.types.is_numeric_dtype(df[column])
+                          and not pd.api.types.is_datetime64_any_dtype(df[column])]
+        for column in df.columns:
+            if column in string_columns:
+                codes, values = pd.factorize(df[column], sort=True)
+                _StringDictionary.save(os.path.join(path, column), list(values))
+                np.save(os.path.join(path, f"{column}.codes.npy"), codes.astype(np.int32))
+            else:
+                np.save(os.path.join(path, f"{column}.npy"), df[column].to_numpy())
+        with open(os.path.join(path, 'columns.json'), 'w') as f:
+            json.dump({'columns': list(df.columns),
+                       'strings': {column: str(df[column].dtype) for column in string_columns}}, f)
+
+    @staticmethod
+    def _read_chunk(path):
+        with open(os.path.join(path, 'columns.json'), 'r') as f:
+            layout = json.load(f)
+        columns = {}
+        for column in layout['columns']:
+            if column in layout['strings']:
+                codes = np.load(os.path.join(path, f"{column}.codes.npy"))
+                values = _StringDictionary.load(os.path.join(path, column)).decode(codes)
+                columns[column] = pd.Series(values, dtype=layout['strings'][column])
+            else:
+                columns[column] = np.load(os.path.join(path, f"{column}.npy"))
+        return pd.DataFrame(columns)
+
+    def chunks(self):
+        """Stored rows one chunk at a time (disk chunks first, then the buffer)"""
+        for path in self.chunk_paths:
+            yield self._read_chunk(path)
+        if self.buffer:
+            yield pd.concat(self.buffer, ignore_index=True)
+
+    def to_dataframe(self):
+        """All rows in one frame; only for stores that did not spill"""
+        frames = list(self.chunks())
+        return pd.concat(frames, ignore_index=True) if frames else None
+
+    def discard(self):
+        self.buffer = []
+        self.chunk_paths = []
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    # ----- Out-of-core analysis -----
+    def working_rows(self):
+        """Number of rows that fit in half of the memory ceiling"""
+        return int(self.memory_limit // 2 // self.row_bytes) if self.row_bytes else len(self)
+
+    def top_rows(self, n, by='clicks'):
+        """The n rows with the most clicks, keeping at most n + one chunk in memory"""
+        best = None
+        for chunk in self.chunks():
+            candidates = chunk if best is None else pd.concat([best, chunk], ignore_index=True)
+            best = candidates.nlargest(n, by, keep='first')
+        if best is None:
+            return None
+        return best.sort_values('date', kind='stable').reset_index(drop=True)
+
+    def aggregate(self, key_sets):
+        """{keys: frame} of clicks, impressions, CTR and impression-weighted position per key combination.
+
+        Each chunk is grouped on its own and folded into the running
+        sums, so memory grows with the number of groups, not of rows.
+        """
+        running = {tuple(keys): None for keys in key_sets}
+        for chunk in self.chunks():
+            chunk = chunk.assign(weighted_position=chunk['position'] * chunk['impressions'])
+            for keys in running:
+                partial = chunk.groupby(list(keys), sort=False)[self.METRICS].sum()
+                if running[keys] is not None:
+                    partial = pd.concat([running[keys], partial]).groupby(level=list(range(len(keys))), sort=False).sum()
+                running[keys] = partial
+
+        frames = {}
+        for keys, sums in running.items():
+            if sums is None:
+                continue
+            frame = sums.reset_index()
+            impressions = frame['impressions'].where(frame['impressions'] > 0)
+            frame['ctr'] = (frame['clicks'] / impressions).fillna(0.0)
+            frame['position'] = (frame['weighted_position'] / impressions).fillna(0.0)
+            frames[keys] = frame.drop(columns=['weighted_position'])
+        return frames
+
+    def rollup_cube(self):
+        """Rollup cube of every stored row, built from chunked aggregates"""
+        aggregates = self.aggregate(ROLLUPS.values())
+        rollups = {}
+        for name, keys in ROLLUPS.items():
+            if tuple(keys) in aggregates:
+                rollups.update(RollupCube.build(aggregates[tuple(keys)], {name: keys}).rollups)
+        return RollupCube(rollups)
+
+    def sketches(self):
+        """One SketchSet merged over the per-day sketches of every chunk"""
+        merged = SketchSet()
+        for chunk in self.chunks():
+            for sketch in SketchSet.daily(chunk.sort_values('date', kind='stable')).values():
+                merged.merge(sketch)
+        return merged
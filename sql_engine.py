@@ -0,0 +1,222 @@
+import re
+import time
+import sqlite3
+import threading
+import pandas as pd
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class QueryCancelled(Exception):
+    """Raised when a query is cancelled or exceeds its time limit"""
+
+
+class SQLQueryEngine(QObject):
+    """Embedded SQLite engine over the loaded dataset and the local history.
+
+    Tables are registered lazily and only copied into SQLite the first time a
+    query references them, and copied again only when their source changed.
+    Queries, including those table copies, stream in batches and can be
+    cancelled or time-limited through SQLite's progress handler.
+    """
+
+    columns_ready = pyqtSignal(list)
+    rows_ready = pyqtSignal(list)
+    query_finished = pyqtSignal(int, float)
+    error_occurred = pyqtSignal(str)
+
+    BATCH_SIZE = 5000
+    INSERT_CHUNK = 50000  # Rows copied per executemany between cancel checks
+    PROGRESS_INTERVAL = 10000  # SQLite VM instructions between cancel checks
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.connection = sqlite3.connect(':memory:', check_same_thread=False)
+        self.lock = threading.Lock()
+        # Registration happens on the UI thread while queries run on a worker
+        self.tables_lock = threading.Lock()
+        self.pending_tables = {}
+        self.table_versions = {}
+        self.frame_tokens = {}
+        self.loaded_tables = {}
+        self.cancel_event = threading.Event()
+        self.deadline = None
+        self.timeout = None
+        self.worker = None
+
+    # ----- Table registration -----
+    def register_dataframe(self, name, df):
+        """Expose a DataFrame as a table; it is materialized on first use"""
+        with self.tables_lock:
+            # The same frame registered again keeps its loaded table; a token, unlike id(), is never reused
+            previous = self.frame_tokens.get(name)
+            token = previous[1] if previous is not None and previous[0] is df else object()
+            self.frame_tokens[name] = (df, token)
+            self.pending_tables[name] = lambda: df
+            self.table_versions[name] = lambda: token
+
+    def register_history(self, warehouse, site_url, name='history'):
+        """Expose a site's full local history from the warehouse as a table"""
+        def load_history():
+            months = warehouse.list_months(site_url)
+            if not months:
+                return pd.DataFrame({column: [] for column in warehouse.COLUMNS})
+            start = pd.Timestamp(months[0] + '-01').date()
+            end = (pd.Timestamp(months[-1] + '-01') + pd.offsets.MonthEnd(0)).date()
+            return warehouse.load(site_url, start, end)
+
+        with self.tables_lock:
+            self.frame_tokens.pop(name, None)
+            self.pending_tables[name] = load_history
+            self.table_versions[name] = lambda: (site_url, warehouse.history_version(site_url))
+
+    def table_names(self):
+        """Names of all queryable tables"""
+        with self.tables_lock:
+            return sorted(self.pending_tables)
+
+    def _materialize(self, name, loader, version):
+        df = loader()
+        start_time = time.time()
+        columns = list(df.columns)
+        values = [df[column] for column in columns]
+        if 'date' in df.columns:
+            values[columns.index('date')] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+
+        cursor = self.connection.cursor()
+        self.loaded_tables.pop(name, None)
+        cursor.execute(f'DROP TABLE IF EXISTS "{name}"')
+        cursor.execute(f'CREATE TABLE "{name}" ({", ".join(self._column_ddl(df, columns))})')
+        placeholders = ', '.join('?' * len(columns))
+        try:
+            # Chunked so cancellation and the time limit apply to the copy as well
+            for start in range(0, len(df), self.INSERT_CHUNK):
+                self._check_cancelled()
+                cursor.executemany(
+                    f'INSERT INTO "{name}" VALUES ({placeholders})',
+                    zip(*[value.iloc[start:start + self.INSERT_CHUNK].tolist() for value in values])
+                )
+            for column in ('date', 'query', 'page'):
+                if column in columns:
+                    cursor.execute(f'CREATE INDEX "idx_{name}_{column}" ON "{name}" ("{column}")')
+            self.connection.commit()
+        except BaseException:
+            # A partial copy is never queried; the next query copies the table again
+            self.connection.rollback()
+            self.connection.set_progress_handler(None, 0)
+            cursor.execute(f'DROP TABLE IF EXISTS "{name}"')
+            raise
+        self.loaded_tables[name] = version
+        print(f"📊 Loaded table '{name}' into SQL engine: {len(df):,} rows in {time.time() - start_time:.2f}s")
+
+    def _column_ddl(self, df, columns):
+        ddl = []
+        for column in columns:
+            if pd.api.types.is_integer_dtype(df[column]):
+                sql_type = 'INTEGER'
+            elif pd.api.types.is_float_dtype(df[column]):
+                sql_type = 'REAL'
+            else:
+                sql_type = 'TEXT'
+            ddl.append(f'"{column}" {sql_type}')
+        return ddl
+
+    def _prepare_tables(self, sql):
+        # One consistent snapshot of the registrations for the whole query
+        with self.tables_lock:
+            tables = {name: (loader, self.table_versions[name]) for name, loader in self.pending_tables.items()}
+        for name, (loader, table_version) in tables.items():
+            if not re.search(rf'\b{re.escape(name)}\b', sql, re.IGNORECASE):
+                continue
+            version = table_version()
+            if self.loaded_tables.get(name) != version:
+                self._materialize(name, loader, version)
+
+    # ----- Execution -----
+    def _progress_handler(self):
+        if self.cancel_event.is_set():
+            return 1
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            return 1
+        return 0
+
+    def _check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise QueryCancelled("Query cancelled")
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise QueryCancelled(f"Query exceeded time limit of {self.timeout}s")
+
+    def execute(self, sql, params=None, timeout=None, batch_size=None):
+        """Run a query and yield (columns, rows) batches.
+
+        The first batch is (columns, []) as soon as the result columns are
+        known, so an empty result still has headers.
+        """
+        batch_size = batch_size or self.BATCH_SIZE
+        with self.lock:
+            self.cancel_event.clear()
+            self.timeout = timeout
+            self.deadline = time.monotonic() + timeout if timeout else None
+            self.connection.set_progress_handler(self._progress_handler, self.PROGRESS_INTERVAL)
+            try:
+                # Copying referenced tables counts against the time limit and can be cancelled
+                self._prepare_tables(sql)
+                cursor = self.connection.execute(sql, params or [])
+                columns = [description[0] for description in cursor.description or []]
+                yield columns, []
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield columns, rows
+                    if self.cancel_event.is_set():
+                        raise QueryCancelled("Query cancelled")
+            except sqlite3.OperationalError as e:
+                if 'interrupted' in str(e):
+                    if self.cancel_event.is_set():
+                        raise QueryCancelled("Query cancelled")
+                    raise QueryCancelled(f"Query exceeded time limit of {timeout}s")
+                raise
+            finally:
+                self.connection.set_progress_handler(None, 0)
+                self.deadline = None
+
+    def query(self, sql, params=None, timeout=None):
+        """Run a query synchronously and return the result as a DataFrame"""
+        columns, rows = [], []
+        for columns, batch in self.execute(sql, params, timeout):
+            rows.extend(batch)
+        return pd.DataFrame(rows, columns=columns)
+
+    def run_async(self, sql, timeout=None):
+        """Run a query in a background thread, streaming rows through signals"""
+        if self.is_running():
+            self.error_occurred.emit("A query is already running")
+            return
+
+        def run():
+            start_time = time.time()
+            total_rows = 0
+            columns_sent = False
+            try:
+                for columns, rows in self.execute(sql, timeout=timeout):
+                    if not columns_sent:
+                        self.columns_ready.emit(columns)
+                        columns_sent = True
+                    if rows:
+                        total_rows += len(rows)
+                        self.rows_ready.emit(rows)
+                self.query_finished.emit(total_rows, time.time() - start_time)
+            except Exception as e:
+                print(f"❌ SQL query failed: {e}")
+                self.error_occurred.emit(str(e))
+
+        self.worker = threading.Thread(target=run, daemon=True)
+        self.worker.start()
+
+    def is_running(self):
+        return self.worker is not None and self.worker.is_alive()
+
+    def cancel(self):
+        """Cancel the running query"""
+        self.cancel_event.set()
+        self.connection.interrupt()
@@ -0,0 +1,29 @@
+import re
+
+from benchmarks.synthetic_data import apply_filter_groups, generate_dataframe
+from data_models import FilterSpec
+
+SPECS = [
+    FilterSpec(),
+    FilterSpec(page_contains='/blog/'),
+    FilterSpec(query_contains='seo', countries=['deu']),
+    FilterSpec(query_contains=r'^(?:how|what)\b', query_regex=True, devices=['MOBILE', 'TABLET']),
+    FilterSpec(page_regex=True, page_contains=r'page-\d$', countries=['usa', 'gbr'], devices=['DESKTOP'])
+]
+
+
+def test_filter_groups_compile():
+    assert FilterSpec().to_dimension_filter_groups() == []
+    groups = FilterSpec(page_contains='/blog/', countries=['deu', ' fra ']).to_dimension_filter_groups()
+    assert groups == [{'groupType': 'and', 'filters': [
+        {'dimension': 'page', 'operator': 'contains', 'expression': '/blog/'},
+        {'dimension': 'country', 'operator': 'includingRegex', 'expression': '^(' + re.escape('deu') + '|fra)$'}
+    ]}]
+
+
+def test_local_filters_match_server_filters():
+    df = generate_dataframe(rows=5000)
+    for spec in SPECS:
+        local = spec.apply_to_dataframe(df)
+        server = apply_filter_groups(df, spec.to_dimension_filter_groups()).reset_index(drop=True)
+        assert local.equals(server), spec
@@ -0,0 +1,73 @@
+from datetime import date
+
+import pandas as pd
+
+from benchmarks.synthetic_data import generate_dataframe
+from data_warehouse import DataWarehouse
+
+SITE = 'https://example.com/'
+START, END = date(2024, 1, 20), date(2024, 3, 10)
+
+
+def _dataset():
+    return generate_dataframe(rows=3000, days=(END - START).days + 1, end_date=END, site_url=SITE)
+
+
+def _sorted(df):
+    df = df.assign(date=pd.to_datetime(df['date']).astype('datetime64[ns]'))
+    return df.sort_values(list(df.columns), kind='stable').reset_index(drop=True)
+
+
+def test_load_returns_stored_rows(tmp_path):
+    warehouse = DataWarehouse(str(tmp_path))
+    df = _dataset()
+    assert warehouse.store(SITE, df, start_date=START, end_date=END, row_limit=25000) == len(df)
+    assert warehouse.list_months(SITE) == ['2024-01', '2024-02', '2024-03']
+
+    loaded = warehouse.load(SITE, START, END)
+    pd.testing.assert_frame_equal(_sorted(loaded), _sorted(df[loaded.columns]), check_dtype=False)
+
+    # Date ranges and filters are pushed down to the partitions
+    window = warehouse.load(SITE, date(2024, 2, 1), date(2024, 2, 14), devices=['MOBILE'])
+    expected = df[(df['date'] >= '2024-02-01') & (df['date'] <= '2024-02-14') & (df['device'] == 'MOBILE')]
+    pd.testing.assert_frame_equal(_sorted(window), _sorted(expected[window.columns]), check_dtype=False)
+
+
+def test_covers_requires_complete_untruncated_days(tmp_path):
+    warehouse = DataWarehouse(str(tmp_path))
+    warehouse.store(SITE, _dataset(), start_date=START, end_date=END, row_limit=25000)
+
+    assert warehouse.covers(SITE, START, END)
+    assert warehouse.covers(SITE, date(2024, 2, 1), date(2024, 2, 29), row_limit=25000)
+    assert not warehouse.covers(SITE, START, date(2024, 3, 11))
+    assert not warehouse.covers(SITE, START, END, dimensions=['date', 'query'])
+    # Days fetched with a smaller limit may miss rows a larger limit returns
+    assert not warehouse.covers(SITE, START, END, row_limit=50000)
+
+
+def test_truncated_fetch_is_never_served(tmp_path):
+    warehouse = DataWarehouse(str(tmp_path))
+    df = _dataset()
+    top_rows = df.nlargest(500, 'clicks')
+    warehouse.store(SITE, top_rows, start_date=START, end_date=END, row_limit=500, truncated=True)
+    assert not warehouse.covers(SITE, START, END)
+    assert not warehouse.covers(SITE, START, END, row_limit=500)
+
+    warehouse.store(SITE, df, start_date=START, end_date=END, row_limit=25000)
+    assert warehouse.covers(SITE, START, END, row_limit=25000)
+
+    # Refetching part of the range truncated only marks those days
+    february = df[(df['date'] >= '2024-02-01') & (df['date'] <= '2024-02-29')]
+    warehouse.store(SITE, february.head(100), start_date=date(2024, 2, 1), end_date=date(2024, 2, 29),
+                    row_limit=100, truncated=True)
+    assert not warehouse.covers(SITE, START, END)
+    assert warehouse.covers(SITE, date(2024, 3, 1), END, row_limit=25000)
+    assert len(warehouse.load(SITE, date(2024, 2, 1), date(2024, 2, 29))) == 100
+
+
+def test_days_without_rows_are_covered(tmp_path):
+    warehouse = DataWarehouse(str(tmp_path))
+    df = _dataset()
+    warehouse.store(SITE, df[df['date'] < '2024-02-01'], start_date=START, end_date=END, row_limit=25000)
+    assert warehouse.covers(SITE, START, END)
+    assert warehouse.load(SITE, date(2024, 2, 1), END).empty
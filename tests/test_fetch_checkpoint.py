@@ -0,0 +1,77 @@
+from datetime import date
+
+import pytest
+
+from benchmarks.synthetic_data import SyntheticSearchConsoleService, generate_dataframe
+from data_models import FilterSpec
+from fetch_checkpoint import FetchCheckpoints
+
+SITE = 'https://example.com/'
+START, END = date(2024, 3, 1), date(2024, 3, 30)
+
+
+def test_job_pages_survive_reopen(tmp_path):
+    checkpoints = FetchCheckpoints(str(tmp_path))
+    job = checkpoints.open(SITE, START, END, ['date', 'query'], 25000)
+    pages = [[{'keys': ['2024-03-01', 'a'], 'clicks': 1}], [{'keys': ['2024-03-02', 'b'], 'clicks': 2}] * 2]
+    for page in pages:
+        job.save_page(page)
+
+    reopened = FetchCheckpoints(str(tmp_path)).open(SITE, START, END, ['date', 'query'], 25000)
+    assert reopened.saved_rows == 3
+    assert list(reopened.saved_pages()) == pages
+
+    # Any change to the request is a different job
+    filters = FilterSpec(devices=['MOBILE']).to_dimension_filter_groups()
+    assert checkpoints.open(SITE, START, END, ['date', 'query'], 25000, filters).saved_rows == 0
+    assert checkpoints.open(SITE, START, END, ['date', 'query'], 10000).saved_rows == 0
+
+
+def test_stale_job_restarts(tmp_path):
+    checkpoints = FetchCheckpoints(str(tmp_path), max_age_hours=24)
+    job = checkpoints.open(SITE, START, END, ['date'], 25000)
+    job.save_page([{'keys': ['2024-03-01'], 'clicks': 1}])
+    job.manifest['created'] -= 2 * 24 * 3600
+    job._save_manifest()
+
+    assert checkpoints.open(SITE, START, END, ['date'], 25000).saved_rows == 0
+
+
+class FlakyService(SyntheticSearchConsoleService):
+    """Synthetic service whose connection drops after fail_after requests"""
+
+    fail_after = None
+
+    def query(self, site_url, body):
+        if self.fail_after is not None and len(self.requests) >= self.fail_after:
+            raise ConnectionError('Connection reset by peer')
+        return super().query(site_url, body)
+
+
+def test_resumed_fetch_equals_uninterrupted_fetch(tmp_path):
+    pytest.importorskip('googleapiclient')
+    from gsc_client import GSCClient
+
+    df = generate_dataframe(rows=6000, days=(END - START).days + 1, end_date=END, site_url=SITE)
+    reference = GSCClient(None, service=SyntheticSearchConsoleService({SITE: df}))
+    reference.MAX_ROWS_PER_REQUEST = 1000
+    expected = reference.fetch_search_analytics(SITE, START, END, row_limit=5000)
+    assert len(expected) == 5000
+
+    service = FlakyService({SITE: df})
+    service.fail_after = 3
+    client = GSCClient(None, service=service)
+    client.MAX_ROWS_PER_REQUEST = 1000
+    client.set_checkpoint_dir(str(tmp_path))
+    errors = []
+    client.error_occurred.connect(errors.append)
+
+    assert client.fetch_search_analytics(SITE, START, END, row_limit=5000) == []
+    assert len(errors) == 1 and 'resumes' in errors[0]
+
+    service.fail_after = None
+    resumed = client.fetch_search_analytics(SITE, START, END, row_limit=5000)
+    assert resumed == expected
+    # Only the pages after the stored ones were requested again
+    assert [body['startRow'] for _, body in service.requests[3:]] == [3000, 4000]
+    assert not any(tmp_path.iterdir())
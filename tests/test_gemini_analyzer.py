@@ -0,0 +1,20 @@
+import pytest
+
+pytest.importorskip('google.generativeai')
+
+from benchmarks.fake_gemini import create_fake_analyzer
+from benchmarks.synthetic_data import generate_dataframe
+from data_models import SiteTotals
+
+
+def test_totals_note_for_site_without_clicks():
+    analyzer = create_fake_analyzer()
+    df = generate_dataframe(rows=500, days=7).assign(clicks=0, ctr=0.0)
+    totals = SiteTotals(clicks=0, impressions=int(df['impressions'].sum()), ctr=0.0, position=12.0)
+
+    insights = analyzer._perform_deep_data_analysis(df, totals)
+    assert insights['performance_metrics']['detail_click_coverage'] is None
+    assert "n/a of clicks" in analyzer._format_totals_note(insights['performance_metrics'])
+
+    prompt = analyzer._create_enhanced_analysis_prompt(df, 'https://example.com/', insights)
+    assert "site has no clicks" in prompt
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import generate_dataframe
+from ngram_index import RowSearchIndex, TrigramIndex
+
+PATTERNS = ['', 'e', 'se', 'seo', 'SEO', 'eo t', 'guide', 'page-1', '/blog/', 'zzz', 'ä', 'über straße']
+
+
+def _brute_force(values, pattern):
+    return np.array([pattern.lower() in str(value).lower() for value in values], dtype=bool)
+
+
+def test_trigram_matches_equal_substring_scan():
+    df = generate_dataframe(rows=5000)
+    values = pd.concat([df['query'], pd.Series(['Über Straße', 'ÜBER STRASSE', '', None, 'se'])],
+                       ignore_index=True)
+    index = TrigramIndex(values)
+    filled = values.fillna('')
+    for pattern in PATTERNS:
+        assert np.array_equal(index.match_rows(pattern), _brute_force(filled, pattern)), pattern
+
+
+def test_row_search_requires_every_term():
+    df = generate_dataframe(rows=5000)
+    index = RowSearchIndex(df)
+    for text in ['seo guide', 'blog page-1', 'tool  /tools/', 'nothing-matches seo']:
+        expected = np.ones(len(df), dtype=bool)
+        for term in text.split():
+            expected &= _brute_force(df['query'], term) | _brute_force(df['page'], term)
+        assert np.array_equal(index.search(text), np.flatnonzero(expected)), text
+
+    assert np.array_equal(index.search('seo', columns=['page']), np.flatnonzero(_brute_force(df['page'], 'seo')))
+    assert len(index.search('   ')) == len(df)
@@ -0,0 +1,40 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic_data import generate_dataframe
+from period_comparison import PeriodComparison, comparison_range
+
+
+def test_comparison_ranges():
+    assert comparison_range(date(2024, 3, 1), date(2024, 3, 28)) == (date(2024, 2, 2), date(2024, 2, 29))
+    start, end = comparison_range(date(2024, 3, 4), date(2024, 3, 10), mode='year')
+    assert (start.weekday(), (end - start).days) == (date(2024, 3, 4).weekday(), 6)
+    with pytest.raises(ValueError):
+        comparison_range(date(2024, 3, 1), date(2024, 3, 28), mode='month')
+
+
+def test_compare_equals_groupby_merge():
+    current = generate_dataframe(rows=8000, seed=1)
+    previous = generate_dataframe(rows=6000, seed=2)
+    keys = ['query', 'device']
+    comparison = PeriodComparison(keys).compare(current, previous).set_index(keys)
+
+    def totals(df):
+        return df.assign(weighted=df['position'] * df['impressions']).groupby(keys)[
+            ['clicks', 'impressions', 'weighted']].sum()
+
+    merged = totals(current).join(totals(previous), how='outer', lsuffix='_current', rsuffix='_previous')
+    assert sorted(comparison.index) == sorted(merged.index)
+    comparison = comparison.loc[merged.index]
+    for suffix in ('current', 'previous'):
+        np.testing.assert_array_equal(comparison[f'clicks_{suffix}'], merged[f'clicks_{suffix}'].fillna(0))
+        np.testing.assert_allclose(comparison[f'position_{suffix}'],
+                                   merged[f'weighted_{suffix}'] / merged[f'impressions_{suffix}'])
+
+    new = merged['clicks_previous'].isna()
+    lost = merged['clicks_current'].isna()
+    delta = merged['clicks_current'].fillna(0) - merged['clicks_previous'].fillna(0)
+    expected_status = np.select([new, lost, delta > 0, delta < 0], ['new', 'lost', 'winner', 'loser'], 'unchanged')
+    assert comparison['status'].tolist() == expected_status.tolist()
@@ -0,0 +1,57 @@
+import re
+
+import numpy as np
+
+from benchmarks.synthetic_data import generate_dataframe
+from query_classifier import DEFAULT_RULES, TOKEN_RE, KeywordAutomaton, QueryClassifier
+
+RULES = {
+    'brand': {'keywords': ['acme', 'acme tools'], 'patterns': [r'\bacm[eé]\b']},
+    **{category: rule for category, rule in DEFAULT_RULES.items() if category != 'brand'},
+    'local': {'keywords': ['near me', 'me', 'open now'], 'patterns': []}
+}
+
+
+def _contains_phrase(tokens, phrase):
+    words = TOKEN_RE.findall(phrase.lower())
+    return any(tokens[i:i + len(words)] == words for i in range(len(tokens) - len(words) + 1))
+
+
+def _brute_force_mask(rules, query):
+    tokens = TOKEN_RE.findall(query.lower())
+    mask = 0
+    for bit, rule in enumerate(rules.values()):
+        if (any(_contains_phrase(tokens, keyword) for keyword in rule['keywords'])
+                or any(re.search(pattern, query, re.IGNORECASE) for pattern in rule['patterns'])):
+            mask |= 1 << bit
+    return mask
+
+
+def _queries():
+    queries = generate_dataframe(rows=3000)['query'].unique().tolist()
+    return queries + ['how to buy acme tools near me', 'Acmé reviews?', 'is acme open now', 'acmetools price',
+                      'how how to', 'near near me', 'me', '', 'what is the cheapest deal for sale']
+
+
+def test_category_masks_equal_brute_force():
+    classifier = QueryClassifier(RULES)
+    queries = _queries()
+    expected = np.array([_brute_force_mask(RULES, query) for query in queries])
+    assert np.array_equal(classifier.category_masks(queries), expected)
+
+
+def test_automaton_reports_overlapping_phrases():
+    automaton = KeywordAutomaton()
+    for bit, phrase in enumerate(['a b c', 'b c', 'c d', 'b']):
+        automaton.add(phrase, 1 << bit)
+    automaton.build()
+    assert automaton.match(['a', 'b', 'c', 'd']) == 0b1111
+    assert automaton.match(['a', 'b', 'd']) == 0b1000
+    assert automaton.match(['x', 'c']) == 0
+
+
+def test_first_matching_intent_wins():
+    query_class, query_intent = QueryClassifier(RULES).classify(['acme price', 'how much is a price', 'open now',
+                                                               'gardening', ''])
+    assert list(query_class) == ['brand', 'non-brand', 'non-brand', 'non-brand', '']
+    assert list(query_intent) == ['product', 'question', 'local', 'other', '']
@@ -0,0 +1,59 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_data import generate_dataframe
+from rollup_cube import RollupCube
+
+
+def _groupby(df, dimensions):
+    grouped = df.assign(weighted=df['position'] * df['impressions']).groupby(dimensions, sort=True)[
+        ['clicks', 'impressions', 'weighted']].sum().reset_index()
+    grouped['position'] = grouped['weighted'] / grouped['impressions']
+    return grouped.drop(columns=['weighted'])
+
+
+def _assert_matches(result, expected, dimensions):
+    result = result.sort_values(dimensions, kind='stable').reset_index(drop=True)
+    expected = expected.reset_index(drop=True)
+    assert len(result) == len(expected)
+    for dimension in dimensions:
+        if dimension == 'date':
+            assert np.array_equal(pd.to_datetime(result[dimension]).to_numpy(dtype='datetime64[D]'),
+                                  pd.to_datetime(expected[dimension]).to_numpy(dtype='datetime64[D]'))
+        else:
+            assert result[dimension].tolist() == expected[dimension].tolist()
+    for metric in ('clicks', 'impressions', 'position'):
+        np.testing.assert_allclose(result[metric].to_numpy(dtype=np.float64),
+                                   expected[metric].to_numpy(dtype=np.float64), rtol=1e-9)
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    df = generate_dataframe(rows=20000, days=60, end_date=date(2024, 4, 30))
+    return df, RollupCube.build(df)
+
+
+@pytest.mark.parametrize('dimensions', [['date'], ['device'], ['country', 'device'], ['page'], ['query', 'date']])
+def test_totals_equal_groupby(dataset, dimensions):
+    df, cube = dataset
+    _assert_matches(cube.aggregate(dimensions), _groupby(df, dimensions), dimensions)
+
+
+def test_filters_and_date_range_equal_groupby(dataset):
+    df, cube = dataset
+    page = df['page'].value_counts().index[3]
+    start, end = date(2024, 3, 15), date(2024, 4, 10)
+    window = df[(df['date'] >= pd.Timestamp(start)) & (df['date'] <= pd.Timestamp(end))]
+
+    result = cube.aggregate(['date'], filters={'page': page}, start_date=start, end_date=end)
+    _assert_matches(result, _groupby(window[window['page'] == page], ['date']), ['date'])
+
+    result = cube.aggregate(['country'], filters={'device': 'MOBILE'}, start_date=start, end_date=end)
+    _assert_matches(result, _groupby(window[window['device'] == 'MOBILE'], ['country']), ['country'])
+
+    assert cube.aggregate(['date'], filters={'page': 'https://example.com/missing'}).empty
+    with pytest.raises(KeyError):
+        cube.aggregate(['query', 'page'])
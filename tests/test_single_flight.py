@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from single_flight import SingleFlight
+
+CALLERS = 8
+
+
+def _run_concurrently(flight, key, function):
+    """Call flight.do from CALLERS threads while the leader blocks in function"""
+    outcomes = [None] * CALLERS
+
+    def call(index):
+        try:
+            outcomes[index] = ('result', flight.do(key, function))
+        except Exception as e:
+            outcomes[index] = ('error', e)
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return outcomes
+
+
+def _blocking(release, calls, outcome):
+    def function():
+        calls.append(threading.get_ident())
+        release.wait(timeout=10)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return function
+
+
+def _release_when_all_waiting(flight, release):
+    # Every caller except the leader is counted as shared before it waits
+    def watch():
+        while flight.shared < CALLERS - 1:
+            threading.Event().wait(0.001)
+        release.set()
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def test_concurrent_calls_share_one_result():
+    flight, release, calls = SingleFlight(), threading.Event(), []
+    result = {'rows': [1, 2, 3]}
+    _release_when_all_waiting(flight, release)
+
+    outcomes = _run_concurrently(flight, 'query', _blocking(release, calls, result))
+    assert len(calls) == 1
+    assert all(kind == 'result' and value is result for kind, value in outcomes)
+    assert flight.shared == CALLERS - 1
+    assert not flight.in_flight('query')
+
+
+def test_exception_reaches_every_caller():
+    flight, release, calls = SingleFlight(), threading.Event(), []
+    error = ConnectionError('quota exceeded')
+    _release_when_all_waiting(flight, release)
+
+    outcomes = _run_concurrently(flight, 'query', _blocking(release, calls, error))
+    assert len(calls) == 1
+    assert all(kind == 'error' and value is error for kind, value in outcomes)
+    assert not flight.in_flight('query')
+
+
+def test_sequential_calls_are_not_cached():
+    flight = SingleFlight()
+    results = iter([1, 2])
+    assert flight.do('key', lambda: next(results)) == 1
+    assert flight.do('key', lambda: next(results)) == 2
+    with pytest.raises(ValueError):
+        flight.do('key', int, 'not a number')
+    assert flight.do('other', lambda value: value * 2, 21) == 42
+    assert flight.shared == 0
@@ -0,0 +1,70 @@
+from datetime import date
+
+import numpy as np
+
+from benchmarks.synthetic_data import generate_dataframe
+from sketches import HyperLogLog, KLLSketch, SketchSet, exact_distribution
+
+
+def _rank_error(sketch, values, quantiles):
+    """Largest distance between q and the exact rank of the sketch's q-quantile"""
+    ordered = np.sort(values)
+    estimates = sketch.quantile(quantiles)
+    lower = np.searchsorted(ordered, estimates, side='left') / len(ordered)
+    upper = np.searchsorted(ordered, estimates, side='right') / len(ordered)
+    # Ties make a range of ranks exact; measure the distance to that range
+    return float(np.max(np.maximum(lower - quantiles, 0) + np.maximum(quantiles - upper, 0)))
+
+
+def test_hyperloglog_within_error_bound():
+    for distinct in (500, 20000, 200000):
+        values = np.array([f"query {i}" for i in range(distinct)], dtype=object)
+        sketch = HyperLogLog().update(np.concatenate([values, values[:distinct // 2]]))
+        assert abs(sketch.count() - distinct) / distinct < 0.05
+
+
+def test_hyperloglog_merge_equals_union():
+    values = np.array([f"https://example.com/page-{i}" for i in range(30000)], dtype=object)
+    merged = HyperLogLog().update(values[:20000]).merge(HyperLogLog().update(values[10000:]))
+    assert np.array_equal(merged.registers, HyperLogLog().update(values).registers)
+
+
+def test_kll_quantiles_within_rank_error():
+    rng = np.random.default_rng(7)
+    values = rng.lognormal(mean=2.0, sigma=1.0, size=200000)
+    quantiles = np.linspace(0.05, 0.95, 19)
+
+    sketch = KLLSketch().update(values)
+    assert sketch.n == len(values)
+    assert _rank_error(sketch, values, quantiles) < 0.02
+
+    # Merging per-day sketches keeps the same bound
+    merged = KLLSketch()
+    for part in np.array_split(values, 30):
+        merged.merge(KLLSketch().update(part))
+    assert merged.n == len(values)
+    assert _rank_error(merged, values, quantiles) < 0.02
+
+
+def test_stored_daily_sketches_match_exact_distribution(tmp_path):
+    df = generate_dataframe(rows=20000, days=28, end_date=date(2024, 2, 28)).sort_values('date', kind='stable')
+    path = str(tmp_path / 'sketches.npz')
+    SketchSet.save_daily(path, SketchSet.daily(df))
+
+    window = df[(df['date'] >= '2024-02-08') & (df['date'] <= '2024-02-21')]
+    estimated = SketchSet.load_range(path, date(2024, 2, 8), date(2024, 2, 21)).distribution()
+    exact = exact_distribution(window)
+    for column in ('distinct_queries', 'distinct_pages'):
+        assert abs(estimated[column] - exact[column]) <= max(2, 0.05 * exact[column])
+    impressions = window['impressions'].to_numpy(dtype=np.float64)
+    for q in (0.3, 0.5, 0.8):
+        rank = np.mean(impressions <= estimated[f'impressions_p{int(q * 100)}'])
+        assert rank >= q - 0.03
+
+
+def test_month_without_rows_round_trips(tmp_path):
+    path = str(tmp_path / 'sketches.npz')
+    SketchSet.save_daily(path, {})
+    sketches = SketchSet.load_range(path, date(2024, 2, 1), date(2024, 2, 29))
+    assert sketches.distinct['query'].count() == 0
+    assert np.isnan(sketches.quantiles['impressions'].quantile(0.5))
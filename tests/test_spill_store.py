@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import generate_dataframe
+from spill_store import SpillStore
+
+
+def _spilled_store(tmp_path, df, pages=20):
+    store = SpillStore(str(tmp_path / 'spill'), memory_limit=int(df.memory_usage(deep=True).sum() // 4))
+    for page in np.array_split(np.arange(len(df)), pages):
+        store.append(df.iloc[page].reset_index(drop=True))
+    store.flush()
+    return store
+
+
+def test_chunks_round_trip_without_pickle(tmp_path):
+    df = generate_dataframe(rows=20000)
+    store = _spilled_store(tmp_path, df)
+    assert store.spilled and len(store.chunk_paths) > 1
+    assert len(store) == len(df)
+    for path in store.chunk_paths:
+        assert all(name.endswith(('.npy', '.json')) for name in os.listdir(path))
+
+    pd.testing.assert_frame_equal(pd.concat(store.chunks(), ignore_index=True), df)
+
+    store.discard()
+    assert not os.path.exists(str(tmp_path / 'spill'))
+
+
+def test_out_of_core_analysis_equals_in_memory(tmp_path):
+    df = generate_dataframe(rows=20000)
+    store = _spilled_store(tmp_path, df)
+
+    frame = store.aggregate([('page', 'device')])[('page', 'device')]
+    expected = df.assign(weighted=df['position'] * df['impressions']).groupby(['page', 'device'])[
+        ['clicks', 'impressions', 'weighted']].sum()
+    frame = frame.set_index(['page', 'device']).loc[expected.index]
+    np.testing.assert_array_equal(frame['clicks'], expected['clicks'])
+    np.testing.assert_allclose(frame['position'], expected['weighted'] / expected['impressions'])
+
+    top = store.top_rows(100)
+    assert sorted(top['clicks'], reverse=True) == df.nlargest(100, 'clicks', keep='first')['clicks'].tolist()
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import generate_dataframe
+from url_trie import UrlTrie, template_segment
+
+
+def _expected_rollup(df, key):
+    grouped = df.assign(key=key, weighted=df['position'] * df['impressions']).groupby('key')[
+        ['clicks', 'impressions', 'weighted']].sum()
+    grouped['position'] = grouped['weighted'] / grouped['impressions']
+    return grouped
+
+
+def test_section_rollup_equals_groupby():
+    df = generate_dataframe(rows=10000)
+    trie = UrlTrie.build(df)
+    rollup = trie.rollup(depth=1).set_index('path')
+
+    sections = '/' + df['page'].str.split('/').str[3]
+    expected = _expected_rollup(df, sections)
+    assert sorted(rollup.index) == sorted(expected.index)
+    np.testing.assert_array_equal(rollup.loc[expected.index, 'clicks'], expected['clicks'])
+    np.testing.assert_allclose(rollup.loc[expected.index, 'position'], expected['position'])
+    assert rollup['pages'].sum() == df['page'].nunique()
+    assert trie.total[0, 0] == df['clicks'].sum()
+
+
+def test_templates_group_urls_by_pattern():
+    assert template_segment('page-12') == 'page-{n}'
+    assert template_segment('3f2b8c1e-0d4a-4b6e-9a7c-1e2d3c4b5a69') == '{id}'
+
+    df = pd.DataFrame({
+        'page': ['https://example.com/product/1', 'https://example.com/product/22', 'https://example.com/about', ''],
+        'clicks': [3, 4, 5, 6],
+        'impressions': [10, 10, 10, 10],
+        'position': [1.0, 3.0, 2.0, 1.0]
+    })
+    rollup = UrlTrie.build(df, templates=True).template_rollup().set_index('path')
+    assert rollup.loc['/product/{n}', 'clicks'] == 7
+    assert rollup.loc['/product/{n}', 'pages'] == 2
+    assert rollup.loc['/product/{n}', 'position'] == 2.0
+    assert rollup['clicks'].sum() == 12
@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import threading
+import functools
+import tracemalloc
+from contextlib import contextmanager
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class Span:
+    """A timed pipeline stage with optional row, byte and token counts"""
+
+    def __init__(self, name, parent=None, **attrs):
+        self.name = name
+        self.parent = parent
+        self.children = []
+        self.attrs = dict(attrs)
+        self.thread_id = threading.get_ident()
+        self.thread_name = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.end = None
+        self.error = None
+        self.mem_peak = 0
+
+    @property
+    def duration(self):
+        """Duration in seconds (up to now for an open span)"""
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set(self, **attrs):
+        """Attach counters such as rows=, bytes= or tokens= to the span"""
+        self.attrs.update(attrs)
+
+
+class Tracer(QObject):
+    """Collects spans for each stage of the fetch -> analyze pipeline.
+
+    Spans nest per thread, are emitted through span_finished when they close,
+    and can be exported in the Chrome trace event format (chrome://tracing,
+    Perfetto).
+    """
+
+    span_finished = pyqtSignal(object)
+
+    # Top allocation sites reported per root span when profiling memory
+    MEMORY_TOP_LINES = 5
+
+    def __init__(self, max_spans=20000):
+        super().__init__()
+        self.enabled = True
+        self.memory_profiling = False
+        self.root_snapshots = {}
+        self.max_spans = max_spans
+        self.spans = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time a block of code as a named span"""
+        if not self.enabled:
+            yield Span(name, **attrs)
+            return
+
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        parent = stack[-1] if stack else None
+        profile = self.memory_profiling and tracemalloc.is_tracing()
+        if profile:
+            self._sample_peak(stack)
+            traced_start = tracemalloc.get_traced_memory()[0]
+            rss_start = current_rss()
+        current = Span(name, parent, **attrs)
+        if parent is not None:
+            parent.children.append(current)
+        stack.append(current)
+        try:
+            yield current
+        except Exception as e:
+            current.error = str(e)
+            raise
+        finally:
+            current.end = time.perf_counter()
+            if profile:
+                self._sample_peak(stack)
+                rss = current_rss()
+                current.set(
+                    mem_peak=current.mem_peak - traced_start,
+                    mem_delta=tracemalloc.get_traced_memory()[0] - traced_start,
+                    rss=rss,
+                    rss_delta=rss - rss_start if rss and rss_start else None
+                )
+                if parent is None:
+                    self._compare_snapshot(current)
+            stack.pop()
+            with self.lock:
+                self.spans.append(current)
+                if len(self.spans) > self.max_spans:
+                    del self.spans[:len(self.spans) - self.max_spans]
+            self.span_finished.emit(current)
+
+    def clear(self):
+        with self.lock:
+            self.spans = []
+        self.root_snapshots = {}
+        self.origin = time.perf_counter()
+
+    # ----- Memory profiling -----
+    def set_memory_profiling(self, enabled):
+        """Record traced-allocation peaks and RSS for each span (slows Python code down).
+
+        tracemalloc is process-wide, so spans running concurrently on other
+        threads share the same peak.
+        """
+        self.memory_profiling = enabled
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            self.root_snapshots = {}
+
+    def _sample_peak(self, stack):
+        # tracemalloc keeps one global peak; fold it into every open span and reset it
+        peak = tracemalloc.get_traced_memory()[1]
+        for span in stack:
+            span.mem_peak = max(span.mem_peak, peak)
+        tracemalloc.reset_peak()
+
+    def _compare_snapshot(self, span):
+        """Attach the allocation sites that grew since the previous run of the same root span"""
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+        previous = self.root_snapshots.get(span.name)
+        self.root_snapshots[span.name] = snapshot
+        if previous is None:
+            return
+        growth = [stat for stat in snapshot.compare_to(previous, 'lineno') if stat.size_diff > 0]
+        span.set(mem_growth=[str(stat) for stat in growth[:self.MEMORY_TOP_LINES]])
+
+    @staticmethod
+    def peak_stage(span):
+        """The innermost span that reached the highest memory peak under span"""
+        best = span
+        for child in span.children:
+            candidate = Tracer.peak_stage(child)
+            if candidate.mem_peak >= best.mem_peak:
+                best = candidate
+        return best
+
+    def to_chrome_trace(self):
+        """Return the recorded spans as Chrome trace events"""
+        with self.lock:
+            spans = list(self.spans)
+        events = []
+        thread_names = {}
+        for span in spans:
+            thread_names[span.thread_id] = span.thread_name
+            args = dict(span.attrs)
+            if span.error:
+                args['error'] = span.error
+            events.append({
+                'name': span.name,
+                'cat': span.name.split('.')[0],
+                'ph': 'X',
+                'ts': (span.start - self.origin) * 1e6,
+                'dur': span.duration * 1e6,
+                'pid': os.getpid(),
+                'tid': span.thread_id,
+                'args': args
+            })
+            if 'rss' in span.attrs and span.attrs['rss']:
+                events.append({
+                    'name': 'rss', 'ph': 'C', 'pid': os.getpid(),
+                    'ts': (span.end - self.origin) * 1e6,
+                    'args': {'rss_mb': span.attrs['rss'] / 1e6}
+                })
+        for thread_id, thread_name in thread_names.items():
+            events.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': thread_id,
+                'args': {'name': thread_name}
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        """Write the recorded spans to a Chrome trace JSON file"""
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+        print(f"📊 Exported {len(self.spans)} spans to {path}")
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if unavailable"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+# Shared tracer for the whole application
+tracer = Tracer()
+
+
+def traced(name, **result_attrs):
+    """Decorator that records each call as a span.
+
+    Keyword arguments map attribute names to functions of the return value,
+    e.g. ``@traced('gsc.parse_response', rows=len)``.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name) as span:
+                result = func(*args, **kwargs)
+                for attr, measure in result_attrs.items():
+                    try:
+                        span.set(**{attr: measure(result)})
+                    except Exception:
+                        pass
+                return result
+        return wrapper
+    return decorator
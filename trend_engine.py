@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy import stats as scipy_stats
+except ImportError:
+    scipy_stats = None
+
+
+def fitted_change_percent(values):
+    """Percent change along the least-squares line from the first to the last point"""
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    if n < 2:
+        return 0
+    xc = np.arange(n) - (n - 1) / 2
+    mean = y.mean()
+    slope = xc @ (y - mean) / (xc @ xc)
+    fitted_start = mean + slope * xc[0]
+    # A fitted line that starts at or below zero has no meaningful ratio; use the mean instead
+    base = fitted_start if fitted_start > 0 else mean
+    return float(slope * (n - 1) / base * 100) if base > 0 else 0
+
+
+def _erfc(x):
+    """Vectorized complementary error function for x >= 0 (Abramowitz-Stegun 7.1.26)"""
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return poly * np.exp(-x * x)
+
+
+def two_sided_p_values(t_stats, dof):
+    """Two-sided p-values for Student t statistics"""
+    t_stats = np.abs(np.asarray(t_stats, dtype=np.float64))
+    if scipy_stats is not None:
+        return 2 * scipy_stats.t.sf(t_stats, dof)
+    # Convert t to an approximately standard normal z, then use the normal tail
+    with np.errstate(invalid='ignore', over='ignore'):
+        z = t_stats * (1 - 1 / (4 * dof)) / np.sqrt(1 + t_stats ** 2 / (2 * dof))
+    z = np.where(np.isinf(t_stats), np.inf, z)
+    return np.clip(_erfc(z / np.sqrt(2)), 0.0, 1.0)
+
+
+class TrendEngine:
+    """Least-squares trends for every query or page in one vectorized pass.
+
+    Rows are pivoted into an entity x day matrix (missing days count as zero,
+    as Search Console omits days without impressions) and the slope, percent
+    change and significance of every row are computed with matrix products.
+    Entities are processed in chunks to bound memory.
+    """
+
+    ADDITIVE_METRICS = ['clicks', 'impressions']
+
+    def __init__(self, chunk_size=50000, alpha=0.05, min_days=3):
+        self.chunk_size = chunk_size
+        self.alpha = alpha
+        self.min_days = min_days
+
+    def compute(self, df, entity='query', metric='clicks'):
+        """Trend statistics per entity, one row each.
+
+        slope is the fitted change per day, change the fitted change over the
+        whole period and pct_change that change relative to the daily mean.
+        """
+        if metric not in self.ADDITIVE_METRICS:
+            raise ValueError(f"Trends are computed on additive metrics only: {self.ADDITIVE_METRICS}")
+        columns = [entity, 'total', 'mean_per_day', 'slope', 'change', 'pct_change',
+                   't_stat', 'p_value', 'days_active']
+        if df is None or df.empty or entity not in df.columns:
+            return pd.DataFrame(columns=columns)
+
+        data = df[df[entity] != ''] if df[entity].dtype == object else df
+        if data.empty:
+            return pd.DataFrame(columns=columns)
+
+        days = pd.to_datetime(data['date']).to_numpy().astype('datetime64[D]')
+        first_day = days.min()
+        n_days = int((days.max() - first_day).astype(np.int64)) + 1
+        if n_days < self.min_days:
+            return pd.DataFrame(columns=columns)
+        day_index = (days - first_day).astype(np.int64)
+
+        codes, names = pd.factorize(data[entity], sort=False)
+        values = data[metric].to_numpy(dtype=np.float64)
+
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        day_index = day_index[order]
+        values = values[order]
+
+        xc = np.arange(n_days) - (n_days - 1) / 2
+        sxx = xc @ xc
+        dof = n_days - 2
+
+        parts = []
+        for start in range(0, len(names), self.chunk_size):
+            stop = min(len(names), start + self.chunk_size)
+            lo, hi = np.searchsorted(codes, [start, stop])
+            flat = (codes[lo:hi] - start) * n_days + day_index[lo:hi]
+            matrix = np.bincount(flat, weights=values[lo:hi], minlength=(stop - start) * n_days)
+            matrix = matrix.reshape(stop - start, n_days)
+
+            total = matrix.sum(axis=1)
+            mean = total / n_days
+            slope = matrix @ xc / sxx
+            sum_squares = np.einsum('ij,ij->i', matrix, matrix) - n_days * mean ** 2
+            residual = np.maximum(sum_squares - slope ** 2 * sxx, 0.0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                std_error = np.sqrt(residual / dof / sxx)
+                t_stat = np.where(std_error > 0, slope / std_error,
+                                  np.where(slope != 0, np.inf * np.sign(slope), 0.0))
+                pct_change = np.where(mean > 0, slope * (n_days - 1) / mean * 100, 0.0)
+
+            parts.append(pd.DataFrame({
+                entity: names[start:stop],
+                'total': total,
+                'mean_per_day': mean,
+                'slope': slope,
+                'change': slope * (n_days - 1),
+                'pct_change': pct_change,
+                't_stat': t_stat,
+                'p_value': two_sided_p_values(t_stat, dof),
+                'days_active': np.count_nonzero(matrix, axis=1)
+            }))
+
+        return pd.concat(parts, ignore_index=True)
+
+    def top_movers(self, trends, n=10, min_days_active=None):
+        """Significant (p < alpha) rising and falling entities by absolute change"""
+        if trends is None or trends.empty:
+            return trends, trends
+        min_days_active = self.min_days if min_days_active is None else min_days_active
+        significant = trends[(trends['p_value'] < self.alpha) & (trends['days_active'] >= min_days_active)]
+        rising = significant[significant['change'] > 0].nlargest(n, 'change')
+        falling = significant[significant['change'] < 0].nsmallest(n, 'change')
+        return rising, falling
+
+    def movers_summary(self, df, n=10, metric='clicks'):
+        """Top rising and falling queries and pages as plain dicts for prompts and the UI"""
+        summary = {}
+        for entity, key in (('query', 'queries'), ('page', 'pages')):
+            if entity not in df.columns:
+                continue
+            rising, falling = self.top_movers(self.compute(df, entity, metric), n)
+            summary[key] = {
+                'rising': rising.to_dict('records'),
+                'falling': falling.to_dict('records')
+            }
+        return summary
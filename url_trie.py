@@ -0,0 +1,173 @@
+import re
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+
+ID_SEGMENT_RE = re.compile(r'^(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{16,})$', re.IGNORECASE)
+DIGITS_RE = re.compile(r'\d+')
+
+
+def template_segment(segment):
+    """Path segment with IDs and numbers replaced, e.g. 'page-12' -> 'page-{n}'"""
+    if ID_SEGMENT_RE.match(segment):
+        return '{id}'
+    return DIGITS_RE.sub('{n}', segment)
+
+
+class UrlTrie:
+    """Trie of page URLs by host and path segment, with traffic subtotals.
+
+    Segment strings are interned, so every node stores a small integer and
+    '/blog' is kept once however many URLs live under it. Node 0 is a
+    virtual root, its children are hosts (depth 0) and path segments start
+    at depth 1. Children always get higher ids than their parents, so
+    subtotals for every depth are rolled up in one bottom-up pass.
+    With templates=True, numbers and IDs in segments are collapsed
+    ('/product/123' -> '/product/{n}') so URLs group by page template.
+    """
+
+    METRICS = ['clicks', 'impressions', 'weighted_position']
+
+    def __init__(self, templates=False):
+        self.templates = templates
+        self.segments = []
+        self.segment_ids = {}
+        self.parent = [-1]
+        self.segment = [-1]
+        self.depth = [-1]
+        self.children = [{}]
+
+    def _intern(self, segment):
+        segment_id = self.segment_ids.get(segment)
+        if segment_id is None:
+            segment_id = self.segment_ids[segment] = len(self.segments)
+            self.segments.append(segment)
+        return segment_id
+
+    def insert(self, url):
+        """Node of a URL, creating the path to it as needed"""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}" if parts.netloc else ''
+        segments = [segment for segment in parts.path.split('/') if segment]
+        if self.templates:
+            segments = [template_segment(segment) for segment in segments]
+
+        node = 0
+        for segment in [host] + segments:
+            segment_id = self._intern(segment)
+            child = self.children[node].get(segment_id)
+            if child is None:
+                child = len(self.parent)
+                self.children[node][segment_id] = child
+                self.parent.append(node)
+                self.segment.append(segment_id)
+                self.depth.append(self.depth[node] + 1)
+                self.children.append({})
+            node = child
+        return node
+
+    @classmethod
+    def build(cls, df, templates=False):
+        """Trie over the page column of df with own and subtotal metrics per node"""
+        trie = cls(templates)
+        if df is None or df.empty or 'page' not in df.columns:
+            trie._finalize(np.array([], dtype=np.int64), np.zeros((0, 3)))
+            return trie
+
+        data = df[(df['page'] != '').to_numpy()]
+        codes, pages = pd.factorize(data['page'])
+        page_nodes = np.fromiter((trie.insert(url) for url in pages), dtype=np.int64, count=len(pages))
+        impressions = data['impressions'].to_numpy(dtype=np.float64)
+        values = np.column_stack([
+            data['clicks'].to_numpy(dtype=np.float64),
+            impressions,
+            data['position'].to_numpy(dtype=np.float64) * impressions
+        ])
+        trie._finalize(page_nodes[codes], values, page_nodes)
+        return trie
+
+    def _finalize(self, row_nodes, values, page_nodes=None):
+        self.parent = np.asarray(self.parent, dtype=np.int64)
+        self.segment = np.asarray(self.segment, dtype=np.int64)
+        self.depth = np.asarray(self.depth, dtype=np.int64)
+        n_nodes = len(self.parent)
+
+        self.own = np.column_stack([
+            np.bincount(row_nodes, weights=values[:, column], minlength=n_nodes) for column in range(values.shape[1])
+        ]) if len(row_nodes) else np.zeros((n_nodes, len(self.METRICS)))
+        self.own_pages = np.bincount(page_nodes, minlength=n_nodes) if page_nodes is not None else np.zeros(n_nodes, dtype=np.int64)
+
+        # Deepest level first: each level adds its subtotals into the parents
+        self.total = self.own.copy()
+        self.total_pages = self.own_pages.copy()
+        for depth in range(int(self.depth.max()), -1, -1):
+            nodes = np.flatnonzero(self.depth == depth)
+            parents = self.parent[nodes]
+            for column in range(self.total.shape[1]):
+                self.total[:, column] += np.bincount(parents, weights=self.total[nodes, column], minlength=n_nodes)
+            self.total_pages += np.bincount(parents, weights=self.total_pages[nodes], minlength=n_nodes).astype(np.int64)
+
+    def __len__(self):
+        return len(self.parent)
+
+    @property
+    def hosts(self):
+        return [child for child in self.children[0].values()]
+
+    def label(self, node):
+        return self.segments[self.segment[node]] if node > 0 else ''
+
+    def path(self, node, include_host=None):
+        """'/blog/seo' for a node; the host is prefixed when the trie spans several hosts"""
+        if include_host is None:
+            include_host = len(self.children[0]) > 1
+        parts = []
+        while node > 0 and self.depth[node] > 0:
+            parts.append(self.segments[self.segment[node]])
+            node = self.parent[node]
+        path = '/' + '/'.join(reversed(parts))
+        return self.label(node) + path if include_host and node > 0 else path
+
+    def child_nodes(self, node):
+        """Children of a node, most clicks first"""
+        children = np.fromiter(self.children[node].values(), dtype=np.int64, count=len(self.children[node]))
+        return children[np.argsort(-self.total[children, 0], kind='stable')]
+
+    def rollup(self, depth=1, min_clicks=0):
+        """Subtotals of every node at one path depth (1 = site section), most clicks first"""
+        nodes = np.flatnonzero(self.depth == depth)
+        nodes = nodes[self.total[nodes, 0] >= min_clicks]
+        return self._frame(nodes[np.argsort(-self.total[nodes, 0], kind='stable')])
+
+    def template_rollup(self):
+        """Subtotals of the nodes URLs end at, i.e. one row per URL (or per template), most clicks first"""
+        nodes = np.flatnonzero(self.own_pages > 0)
+        return self._frame(nodes[np.argsort(-self.own[nodes, 0], kind='stable')], own=True)
+
+    def _frame(self, nodes, own=False):
+        metrics = self.own if own else self.total
+        pages = self.own_pages if own else self.total_pages
+        all_clicks = self.total[0, 0]
+        clicks, impressions, weighted = metrics[nodes, 0], metrics[nodes, 1], metrics[nodes, 2]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return pd.DataFrame({
+                'node': nodes,
+                'path': [self.path(node) for node in nodes],
+                'depth': self.depth[nodes],
+                'pages': pages[nodes],
+                'clicks': clicks,
+                'impressions': impressions,
+                'ctr': np.where(impressions > 0, clicks / impressions, 0.0),
+                'position': np.where(impressions > 0, weighted / impressions, 0.0),
+                'click_share': clicks / all_clicks * 100 if all_clicks else np.zeros(len(nodes))
+            })
+
+    def section_summary(self, depths=(1, 2), limit=8, templates=None):
+        """Top sections per depth (and optionally page templates) as plain dicts for prompts"""
+        summary = {f'depth_{depth}': self.rollup(depth).head(limit).drop(columns=['node']).to_dict('records')
+                   for depth in depths}
+        if templates is not None:
+            summary['templates'] = templates.template_rollup().head(limit).drop(columns=['node']).to_dict('records')
+        return summary
@@ -0,0 +1,117 @@
+import os
+import tempfile
+from datetime import timedelta
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+                            QPushButton, QComboBox)
+from PyQt5.QtCore import Qt, QUrl
+from PyQt5.QtGui import QDesktopServices
+import pandas as pd
+from chart_builder import ChartBuilder
+from tracing import traced
+
+try:
+    from PyQt5.QtWebEngineWidgets import QWebEngineView
+except ImportError:
+    QWebEngineView = None
+
+class ChartsWidget(QWidget):
+    """Plotly time series and breakdown charts of the loaded dataset"""
+
+    RANGES = [("Whole range", None), ("Last 7 days", 7), ("Last 28 days", 28), ("Last 90 days", 90)]
+
+    def __init__(self):
+        super().__init__()
+        self.builder = ChartBuilder()
+        self.cube = None
+        self.dataset_key = None
+        self.html = None
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        controls_layout = QHBoxLayout()
+        self.metric_combo = QComboBox()
+        for metric, label in ChartBuilder.METRIC_LABELS.items():
+            self.metric_combo.addItem(label, metric)
+        self.metric_combo.currentIndexChanged.connect(lambda: self.update_chart())
+        controls_layout.addWidget(self.metric_combo)
+
+        self.breakdown_combo = QComboBox()
+        self.breakdown_combo.addItem("Total", None)
+        self.breakdown_combo.addItem("By device", 'device')
+        self.breakdown_combo.addItem("By country", 'country')
+        self.breakdown_combo.addItem("Top pages", 'page')
+        self.breakdown_combo.currentIndexChanged.connect(lambda: self.update_chart())
+        controls_layout.addWidget(self.breakdown_combo)
+
+        self.range_combo = QComboBox()
+        for label, days in self.RANGES:
+            self.range_combo.addItem(label, days)
+        self.range_combo.currentIndexChanged.connect(lambda: self.update_chart())
+        controls_layout.addWidget(self.range_combo)
+
+        self.browser_btn = QPushButton("Open in Browser")
+        self.browser_btn.clicked.connect(self.open_in_browser)
+        self.browser_btn.setEnabled(False)
+        controls_layout.addWidget(self.browser_btn)
+
+        self.status_label = QLabel("")
+        controls_layout.addWidget(self.status_label)
+        controls_layout.addStretch()
+        layout.addLayout(controls_layout)
+
+        if QWebEngineView is not None:
+            self.view = QWebEngineView()
+        else:
+            # Without Qt WebEngine the chart can only be shown in the system browser
+            self.view = QLabel("Charts open in your browser (install PyQtWebEngine to show them here).")
+            self.view.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.view, 1)
+
+        self.setLayout(layout)
+
+    def set_cube(self, cube, dataset_key):
+        """Chart a new dataset; dataset_key identifies it in the HTML cache"""
+        self.cube = cube
+        self.dataset_key = dataset_key
+        self.update_chart()
+
+    def current_range(self):
+        days = self.range_combo.currentData()
+        if days is None or self.cube is None or 'date' not in self.cube.rollups:
+            return None, None
+        end_date = pd.Timestamp(self.cube.rollups['date'].dictionaries['date'][-1]).date()
+        return end_date - timedelta(days=days - 1), end_date
+
+    @traced('ui.update_chart')
+    def update_chart(self):
+        self.html = None
+        self.browser_btn.setEnabled(False)
+        if not ChartBuilder.is_available():
+            self.status_label.setText("Install plotly to show charts")
+            return
+        if self.cube is None or 'date' not in self.cube.rollups:
+            self.status_label.setText("")
+            return
+
+        breakdown = self.breakdown_combo.currentData()
+        if breakdown is not None and not self.cube.covers([breakdown, 'date']):
+            self.status_label.setText(f"No {breakdown} dimension in this dataset")
+            return
+
+        start_date, end_date = self.current_range()
+        self.html = self.builder.chart_html(self.cube, self.dataset_key, self.metric_combo.currentData(),
+                                            breakdown, start_date, end_date)
+        self.browser_btn.setEnabled(True)
+        self.status_label.setText("")
+        if QWebEngineView is not None:
+            self.view.setHtml(self.html)
+
+    def open_in_browser(self):
+        if not self.html:
+            return
+        path = os.path.join(tempfile.gettempdir(), 'soft_gsc_chart.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.html)
+        QDesktopServices.openUrl(QUrl.fromLocalFile(path))
@@ -1,17 +1,79 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                             QPushButton, QComboBox, QDateEdit, QProgressBar,
                             QGroupBox, QTextEdit, QTableWidget, QTableWidgetItem,
-                            QHeaderView, QTabWidget, QSplitter)
-from PyQt5.QtCore import QDate, Qt
+                            QHeaderView, QTabWidget, QSplitter, QCheckBox,
+                            QLineEdit, QTableView, QTreeWidget, QTreeWidgetItem)
+from PyQt5.QtCore import QDate, Qt, pyqtSignal
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from data_models import FilterSpec, SiteTotals, DetailStats, data_points_to_dataframe
+from tracing import traced
+from trend_engine import TrendEngine
+from anomaly_detector import AnomalyDetector
+from period_comparison import PeriodComparison, comparison_range
+from query_page_index import QueryPageIndex
+from ngram_index import RowSearchIndex
+from url_trie import UrlTrie
+from rollup_cube import RollupCube
+from widgets.table_models import DataFrameTableModel
+from widgets.charts_widget import ChartsWidget
+
+def _truncate(text, length=50):
+    return text[:length] + '...' if len(text) > length else text
 
 class DashboardWidget(QWidget):
-    def __init__(self, gsc_client, gemini_analyzer):
+    dataset_changed = pyqtSignal(object)
+    
+    MAX_TREE_CHILDREN = 1000
+    MAX_PIVOT_ROWS = 500
+    MAX_PIVOT_COLUMNS = 12
+    
+    PIVOT_FORMATS = {
+        'clicks': lambda value: f"{value:,.0f}",
+        'impressions': lambda value: f"{value:,.0f}",
+        'ctr': lambda value: f"{value:.2%}",
+        'position': lambda value: f"{value:.1f}"
+    }
+    
+    # (header, column, formatter) for the data table
+    DATA_COLUMNS = [
+        ('Date', 'date', lambda day: f"{pd.Timestamp(day):%Y-%m-%d}"),
+        ('Query', 'query', _truncate),
+        ('Page', 'page', _truncate),
+        ('Country', 'country', None),
+        ('Device', 'device', None),
+        ('Class', 'query_class', None),
+        ('Intent', 'query_intent', None),
+        ('Clicks', 'clicks', None),
+        ('Impressions', 'impressions', None),
+        ('CTR', 'ctr', lambda ctr: f"{ctr:.2f}%"),
+        ('Position', 'position', lambda position: f"{position:.2f}")
+    ]
+    
+    def __init__(self, gsc_client, gemini_analyzer, warehouse=None):
         super().__init__()
         self.gsc_client = gsc_client
         self.gemini_analyzer = gemini_analyzer
-        self.data_points = []
+        self.warehouse = warehouse
+        self.df = None
+        self.totals = None
+        self.pending_fetch = None
+        self.pending_comparison = None
+        self.previous_df = None
+        self.stream_stats = None
+        self.stream_frames = []
+        self.detail_stats = None
+        self.query_page_index = QueryPageIndex.empty()
+        self.search_index = None
+        self.url_tries = {}
+        self.cube = RollupCube()
+        self.sketches = None
+        self.pivot_filters = {}
+        self.pivot_row_values = []
+        self.dataset_version = 0
+        self.cannibalization = None
+        self.trend_engine = TrendEngine()
         self.init_ui()
         self.connect_signals()
     
@@ -40,11 +102,44 @@ class DashboardWidget(QWidget):
         self.end_date.setCalendarPopup(True)
         controls_layout.addWidget(self.end_date)
         
+        # Period-over-period comparison
+        self.compare_check = QCheckBox("Compare with")
+        controls_layout.addWidget(self.compare_check)
+        self.compare_mode_combo = QComboBox()
+        self.compare_mode_combo.addItem("Previous period", 'previous')
+        self.compare_mode_combo.addItem("Previous year", 'year')
+        controls_layout.addWidget(self.compare_mode_combo)
+        
+        # Local history
+        self.use_history_check = QCheckBox("Use local history")
+        self.use_history_check.setChecked(self.warehouse is not None)
+        self.use_history_check.setEnabled(self.warehouse is not None)
+        controls_layout.addWidget(self.use_history_check)
+        
+        # Detail row limit (the API returns 25,000 rows per page)
+        self.row_limit_combo = QComboBox()
+        for row_limit in (25000, 100000, 250000, 1000000):
+            self.row_limit_combo.addItem(f"{row_limit:,} rows", row_limit)
+        controls_layout.addWidget(self.row_limit_combo)
+        
         # Fetch button
         self.fetch_btn = QPushButton("Fetch Data")
         self.fetch_btn.clicked.connect(self.fetch_data)
         controls_layout.addWidget(self.fetch_btn)
         
+        # Analysis mode
+        self.analysis_mode_combo = QComboBox()
+        self.analysis_mode_combo.addItem("Single prompt", "")
+        self.analysis_mode_combo.addItem("Map-reduce by directory", "directory")
+        self.analysis_mode_combo.addItem("Map-reduce by device", "device")
+        self.analysis_mode_combo.addItem("Map-reduce by country", "country")
+        self.analysis_mode_combo.addItem("Map-reduce by query cluster", "query_cluster")
+        controls_layout.addWidget(self.analysis_mode_combo)
+        
+        self.parallel_suggestions_check = QCheckBox("Parallel suggestions")
+        self.parallel_suggestions_check.setChecked(True)
+        controls_layout.addWidget(self.parallel_suggestions_check)
+        
         # Analyze button
         self.analyze_btn = QPushButton("Analyze with AI")
         self.analyze_btn.clicked.connect(self.analyze_data)
@@ -54,6 +149,38 @@ class DashboardWidget(QWidget):
         controls_layout.addStretch()
         layout.addLayout(controls_layout)
         
+        # Filters (pushed down to the API as dimensionFilterGroups)
+        filters_layout = QHBoxLayout()
+        
+        filters_layout.addWidget(QLabel("Device:"))
+        self.device_combo = QComboBox()
+        self.device_combo.addItem("All", "")
+        for device in ['DESKTOP', 'MOBILE', 'TABLET']:
+            self.device_combo.addItem(device.capitalize(), device)
+        filters_layout.addWidget(self.device_combo)
+        
+        filters_layout.addWidget(QLabel("Countries:"))
+        self.country_input = QLineEdit()
+        self.country_input.setPlaceholderText("e.g. usa, deu")
+        self.country_input.setMaximumWidth(120)
+        filters_layout.addWidget(self.country_input)
+        
+        filters_layout.addWidget(QLabel("Page contains:"))
+        self.page_filter_input = QLineEdit()
+        self.page_filter_input.setPlaceholderText("/blog/")
+        filters_layout.addWidget(self.page_filter_input)
+        self.page_regex_check = QCheckBox("Regex")
+        filters_layout.addWidget(self.page_regex_check)
+        
+        filters_layout.addWidget(QLabel("Query contains:"))
+        self.query_filter_input = QLineEdit()
+        filters_layout.addWidget(self.query_filter_input)
+        self.query_regex_check = QCheckBox("Regex")
+        filters_layout.addWidget(self.query_regex_check)
+        
+        filters_layout.addStretch()
+        layout.addLayout(filters_layout)
+        
         # Progress bar
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
@@ -83,12 +210,177 @@ class DashboardWidget(QWidget):
         self.analysis_group.setLayout(analysis_layout)
         left_layout.addWidget(self.analysis_group)
         
-        # Right panel - Data table
+        # Right panel - Data table and top movers
         right_widget = QWidget()
         right_layout = QVBoxLayout(right_widget)
+        self.right_tabs = QTabWidget()
+        right_layout.addWidget(self.right_tabs)
+        
+        data_widget = QWidget()
+        data_layout = QVBoxLayout(data_widget)
+        search_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search queries and pages (all words must match)")
+        self.search_input.textChanged.connect(lambda: self.apply_search())
+        search_layout.addWidget(self.search_input)
+        self.search_scope_combo = QComboBox()
+        self.search_scope_combo.addItem("Query or Page", ('query', 'page'))
+        self.search_scope_combo.addItem("Query", ('query',))
+        self.search_scope_combo.addItem("Page", ('page',))
+        self.search_scope_combo.currentIndexChanged.connect(lambda: self.apply_search())
+        search_layout.addWidget(self.search_scope_combo)
+        self.search_count_label = QLabel("")
+        search_layout.addWidget(self.search_count_label)
+        data_layout.addLayout(search_layout)
+        self.data_model = DataFrameTableModel(self)
+        self.data_table = QTableView()
+        self.data_table.setModel(self.data_model)
+        data_layout.addWidget(self.data_table)
+        self.right_tabs.addTab(data_widget, "Data")
+        
+        movers_widget = QWidget()
+        movers_layout = QVBoxLayout(movers_widget)
+        movers_controls = QHBoxLayout()
+        self.movers_entity_combo = QComboBox()
+        self.movers_entity_combo.addItem("Queries", "query")
+        self.movers_entity_combo.addItem("Pages", "page")
+        self.movers_entity_combo.currentIndexChanged.connect(lambda: self.update_movers_table())
+        movers_controls.addWidget(self.movers_entity_combo)
+        self.movers_metric_combo = QComboBox()
+        self.movers_metric_combo.addItem("Clicks", "clicks")
+        self.movers_metric_combo.addItem("Impressions", "impressions")
+        self.movers_metric_combo.currentIndexChanged.connect(lambda: self.update_movers_table())
+        movers_controls.addWidget(self.movers_metric_combo)
+        movers_controls.addStretch()
+        movers_layout.addLayout(movers_controls)
+        self.movers_table = QTableWidget()
+        movers_layout.addWidget(self.movers_table)
+        self.right_tabs.addTab(movers_widget, "Top Movers")
+        
+        anomalies_widget = QWidget()
+        anomalies_layout = QVBoxLayout(anomalies_widget)
+        anomalies_controls = QHBoxLayout()
+        self.anomaly_segment_combo = QComboBox()
+        self.anomaly_segment_combo.addItem("Page × Device × Country", ('page', 'device', 'country'))
+        self.anomaly_segment_combo.addItem("Page", ('page',))
+        self.anomaly_segment_combo.addItem("Country", ('country',))
+        self.anomaly_segment_combo.addItem("Device", ('device',))
+        self.anomaly_segment_combo.currentIndexChanged.connect(lambda: self.update_anomalies_table())
+        anomalies_controls.addWidget(self.anomaly_segment_combo)
+        self.anomaly_method_combo = QComboBox()
+        self.anomaly_method_combo.addItem("Rolling median", 'rolling')
+        self.anomaly_method_combo.addItem("Same weekday", 'seasonal')
+        self.anomaly_method_combo.currentIndexChanged.connect(lambda: self.update_anomalies_table())
+        anomalies_controls.addWidget(self.anomaly_method_combo)
+        anomalies_controls.addStretch()
+        anomalies_layout.addLayout(anomalies_controls)
+        self.anomalies_table = QTableWidget()
+        anomalies_layout.addWidget(self.anomalies_table)
+        self.right_tabs.addTab(anomalies_widget, "Anomalies")
+        
+        comparison_widget = QWidget()
+        comparison_layout = QVBoxLayout(comparison_widget)
+        comparison_controls = QHBoxLayout()
+        self.comparison_level_combo = QComboBox()
+        self.comparison_level_combo.addItem("Query × Page × Country × Device", ('query', 'page', 'country', 'device'))
+        self.comparison_level_combo.addItem("Query", ('query',))
+        self.comparison_level_combo.addItem("Page", ('page',))
+        self.comparison_level_combo.currentIndexChanged.connect(lambda: self.update_comparison_table())
+        comparison_controls.addWidget(self.comparison_level_combo)
+        self.comparison_status_combo = QComboBox()
+        self.comparison_status_combo.addItem("Losers", 'loser')
+        self.comparison_status_combo.addItem("Winners", 'winner')
+        self.comparison_status_combo.addItem("New", 'new')
+        self.comparison_status_combo.addItem("Lost", 'lost')
+        self.comparison_status_combo.addItem("All", None)
+        self.comparison_status_combo.currentIndexChanged.connect(lambda: self.update_comparison_table())
+        comparison_controls.addWidget(self.comparison_status_combo)
+        self.comparison_label = QLabel("")
+        comparison_controls.addWidget(self.comparison_label)
+        comparison_controls.addStretch()
+        comparison_layout.addLayout(comparison_controls)
+        self.comparison_table = QTableWidget()
+        comparison_layout.addWidget(self.comparison_table)
+        self.right_tabs.addTab(comparison_widget, "Comparison")
+        
+        cannibalization_widget = QWidget()
+        cannibalization_layout = QVBoxLayout(cannibalization_widget)
+        cannibalization_controls = QHBoxLayout()
+        cannibalization_controls.addWidget(QLabel("Min page share:"))
+        self.cannibalization_share_combo = QComboBox()
+        for share in (0.1, 0.2, 0.3):
+            self.cannibalization_share_combo.addItem(f"{share:.0%}", share)
+        self.cannibalization_share_combo.currentIndexChanged.connect(lambda: self.update_cannibalization_table())
+        cannibalization_controls.addWidget(self.cannibalization_share_combo)
+        cannibalization_controls.addStretch()
+        cannibalization_layout.addLayout(cannibalization_controls)
+        cannibalization_splitter = QSplitter(Qt.Orientation.Vertical)
+        self.cannibalization_table = QTableWidget()
+        self.cannibalization_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.cannibalization_table.currentCellChanged.connect(lambda row, *_: self.show_competing_pages(row))
+        cannibalization_splitter.addWidget(self.cannibalization_table)
+        self.competing_pages_table = QTableWidget()
+        cannibalization_splitter.addWidget(self.competing_pages_table)
+        cannibalization_layout.addWidget(cannibalization_splitter)
+        self.right_tabs.addTab(cannibalization_widget, "Cannibalization")
+        
+        structure_widget = QWidget()
+        structure_layout = QVBoxLayout(structure_widget)
+        structure_controls = QHBoxLayout()
+        self.structure_mode_combo = QComboBox()
+        self.structure_mode_combo.addItem("URL paths", False)
+        self.structure_mode_combo.addItem("Page templates", True)
+        self.structure_mode_combo.currentIndexChanged.connect(lambda: self.update_site_tree())
+        structure_controls.addWidget(self.structure_mode_combo)
+        structure_controls.addStretch()
+        structure_layout.addLayout(structure_controls)
+        self.site_tree = QTreeWidget()
+        self.site_tree.setHeaderLabels(['Path', 'Pages', 'Clicks', 'Share', 'Impressions', 'CTR', 'Position'])
+        self.site_tree.setColumnWidth(0, 300)
+        self.site_tree.itemExpanded.connect(self.on_site_tree_expanded)
+        structure_layout.addWidget(self.site_tree)
+        self.right_tabs.addTab(structure_widget, "Site Structure")
+        
+        pivot_widget = QWidget()
+        pivot_layout = QVBoxLayout(pivot_widget)
+        pivot_controls = QHBoxLayout()
+        pivot_controls.addWidget(QLabel("Rows:"))
+        self.pivot_rows_combo = QComboBox()
+        for label, column in (("Date", 'date'), ("Device", 'device'), ("Country", 'country'),
+                              ("Page", 'page'), ("Query", 'query')):
+            self.pivot_rows_combo.addItem(label, column)
+        self.pivot_rows_combo.currentIndexChanged.connect(lambda: self.update_pivot_table())
+        pivot_controls.addWidget(self.pivot_rows_combo)
+        pivot_controls.addWidget(QLabel("Columns:"))
+        self.pivot_columns_combo = QComboBox()
+        self.pivot_columns_combo.addItem("None", None)
+        self.pivot_columns_combo.addItem("Device", 'device')
+        self.pivot_columns_combo.addItem("Country", 'country')
+        self.pivot_columns_combo.currentIndexChanged.connect(lambda: self.update_pivot_table())
+        pivot_controls.addWidget(self.pivot_columns_combo)
+        pivot_controls.addWidget(QLabel("Metric:"))
+        self.pivot_metric_combo = QComboBox()
+        self.pivot_metric_combo.addItem("Clicks", 'clicks')
+        self.pivot_metric_combo.addItem("Impressions", 'impressions')
+        self.pivot_metric_combo.addItem("CTR", 'ctr')
+        self.pivot_metric_combo.addItem("Position", 'position')
+        self.pivot_metric_combo.currentIndexChanged.connect(lambda: self.update_pivot_table())
+        pivot_controls.addWidget(self.pivot_metric_combo)
+        self.pivot_reset_btn = QPushButton("All Data")
+        self.pivot_reset_btn.clicked.connect(self.reset_pivot_filters)
+        pivot_controls.addWidget(self.pivot_reset_btn)
+        self.pivot_label = QLabel("")
+        pivot_controls.addWidget(self.pivot_label)
+        pivot_controls.addStretch()
+        pivot_layout.addLayout(pivot_controls)
+        self.pivot_table = QTableWidget()
+        self.pivot_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.pivot_table.cellDoubleClicked.connect(lambda row, *_: self.drill_down_pivot(row))
+        pivot_layout.addWidget(self.pivot_table)
+        self.right_tabs.addTab(pivot_widget, "Pivot")
         
-        self.data_table = QTableWidget()
-        right_layout.addWidget(self.data_table)
+        self.charts_widget = ChartsWidget()
+        self.right_tabs.addTab(self.charts_widget, "Charts")
         
         splitter.addWidget(left_widget)
         splitter.addWidget(right_widget)
@@ -99,6 +391,11 @@ class DashboardWidget(QWidget):
     
     def connect_signals(self):
         self.gsc_client.data_loaded.connect(self.on_data_loaded)
+        self.gsc_client.store_loaded.connect(self.on_store_loaded)
+        self.gsc_client.page_loaded.connect(self.on_page_loaded)
+        self.gsc_client.totals_loaded.connect(self.on_totals_loaded)
+        self.gsc_client.comparison_loaded.connect(self.on_comparison_loaded)
+        self.gsc_client.comparison_failed.connect(self.on_comparison_failed)
         self.gsc_client.error_occurred.connect(self.on_error)
         self.gemini_analyzer.analysis_complete.connect(self.on_analysis_complete)
         self.gemini_analyzer.suggestions_generated.connect(self.on_suggestions_generated)
@@ -121,17 +418,89 @@ class DashboardWidget(QWidget):
         start_date = self.start_date.date().toPyDate()
         end_date = self.end_date.date().toPyDate()
         
+        # Fetch data with common dimensions
+        dimensions = ['date', 'query', 'page', 'country', 'device']
+        filters = self.current_filters()
+        row_limit = self.row_limit_combo.currentData()
+        
+        # Leave the running fetch's table and stream alone; it still delivers its rows here
+        if self.gsc_client.is_fetching():
+            if self.gsc_client.is_fetching_request(site_url, start_date, end_date, dimensions, row_limit,
+                                                   filters=filters):
+                self.show_message("⏳ This fetch is already running; its rows appear as they arrive")
+            else:
+                self.show_message("⏳ A fetch is already running; start another one when it finishes")
+            return
+        
+        self.pending_fetch = (site_url, dimensions, start_date, end_date, filters, row_limit)
+        self.totals = None
+        
+        # Serve the range from local history when it is fully stored
+        use_history = self.warehouse is not None and self.use_history_check.isChecked()
+        
+        # The comparison period goes first in the fetch plan so it is ready when the main dataset arrives
+        self.previous_df = None
+        previous_range = None
+        if self.compare_check.isChecked():
+            previous_start, previous_end = comparison_range(start_date, end_date, self.compare_mode_combo.currentData())
+            previous_range = self.load_comparison(site_url, dimensions, previous_start, previous_end, filters,
+                                                  use_history, row_limit)
+        if use_history and filters.is_empty():
+            daily = self.warehouse.load_daily_totals(site_url, start_date, end_date)
+            if daily is not None:
+                self.totals = SiteTotals.from_daily(daily)
+        
+        if use_history and self.warehouse.covers(site_url, start_date, end_date, dimensions, row_limit):
+            if self.totals is not None:
+                self.pending_fetch = None
+            if self.totals is None or previous_range is not None:
+                # Totals are cheap; only the detail rows come from history
+                self.gsc_client.run_fetch_plan_async(site_url, start_date, end_date, dimensions, row_limit,
+                                                     include_detail=False, filters=filters,
+                                                     include_totals=self.totals is None,
+                                                     comparison_range=previous_range)
+            df = self.warehouse.load(site_url, start_date, end_date,
+                                     devices=filters.devices or None, countries=filters.countries or None)
+            cube_range = (site_url, start_date, end_date) if filters.is_empty() else None
+            self.set_dataframe(filters.apply_to_dataframe(df), cube_range)
+            return
+        
         self.progress_bar.setVisible(True)
         self.progress_bar.setRange(0, 0)  # Indeterminate progress
         self.fetch_btn.setEnabled(False)
         
-        # Fetch data with common dimensions
-        dimensions = ['date', 'query', 'page', 'country', 'device']
-        self.gsc_client.fetch_search_analytics(site_url, start_date, end_date, dimensions)
+        # Exact totals first, then the high-cardinality detail query; pages are shown as they arrive
+        self.start_streaming()
+        self.gsc_client.run_fetch_plan_async(site_url, start_date, end_date, dimensions, row_limit, filters=filters,
+                                             comparison_range=previous_range)
+    
+    def load_comparison(self, site_url, dimensions, start_date, end_date, filters, use_history, row_limit):
+        """Load the comparison period from local history; otherwise return the range to fetch from GSC"""
+        if use_history and self.warehouse.covers(site_url, start_date, end_date, dimensions, row_limit):
+            df = self.warehouse.load(site_url, start_date, end_date,
+                                     devices=filters.devices or None, countries=filters.countries or None)
+            self.previous_df = filters.apply_to_dataframe(df)
+            return None
+        
+        self.pending_comparison = (site_url, dimensions, start_date, end_date, filters, row_limit)
+        return (start_date, end_date)
+    
+    def current_filters(self):
+        """Build the filter specification from the dashboard controls"""
+        device = self.device_combo.currentData()
+        countries = [country.strip().lower() for country in self.country_input.text().split(',') if country.strip()]
+        return FilterSpec(
+            page_contains=self.page_filter_input.text().strip(),
+            page_regex=self.page_regex_check.isChecked(),
+            query_contains=self.query_filter_input.text().strip(),
+            query_regex=self.query_regex_check.isChecked(),
+            countries=countries,
+            devices=[device] if device else []
+        )
     
     def analyze_data(self):
         """Analyze data using Gemini AI"""
-        if not self.data_points:
+        if self.df is None or self.df.empty:
             self.show_message("No data to analyze")
             return
         
@@ -141,17 +510,164 @@ class DashboardWidget(QWidget):
         
         site_url = self.site_combo.currentData()
         self.progress_bar.setVisible(True)
-        self.gemini_analyzer.analyze_data(self.data_points, site_url)
+        partition_by = self.analysis_mode_combo.currentData() or None
+        self.gemini_analyzer.analyze_data(self.df, site_url, self.totals, partition_by,
+                                          self.parallel_suggestions_check.isChecked(), self.sketches)
     
+    def start_streaming(self):
+        """Empty the data table and running statistics before pages start arriving"""
+        self.stream_stats = DetailStats()
+        self.stream_frames = []
+        self.data_model.set_dataframe(data_points_to_dataframe([]), self.DATA_COLUMNS)
+        self.search_count_label.setText("Loading...")
+    
+    @traced('ui.page_loaded')
+    def on_page_loaded(self, data_points):
+        """Append one page of detail rows to the table and the running summary"""
+        if self.stream_stats is None:
+            return
+        df = data_points_to_dataframe(data_points)
+        self.stream_stats.add(df)
+        store = self.gsc_client.spill_store
+        if store is None:
+            self.stream_frames.append(df)
+        # Past the memory limit the rows go to disk; the table stops growing
+        if store is None or not store.spilled:
+            self.data_model.append_dataframe(df)
+            self.search_count_label.setText(f"{self.stream_stats.rows:,} rows loaded...")
+        else:
+            self.search_count_label.setText(f"{self.stream_stats.rows:,} rows loaded (spilling to disk)...")
+        self.update_summary()
+    
+    @traced('ui.data_loaded')
     def on_data_loaded(self, data_points):
         """Handle loaded data"""
-        self.data_points = data_points
+        if self.stream_frames and sum(len(frame) for frame in self.stream_frames) == len(data_points):
+            # Every page was already converted while streaming
+            df = pd.concat(self.stream_frames, ignore_index=True)
+        else:
+            df = data_points_to_dataframe(data_points)
+        self.stream_frames = []
+        self.show_fetched_data(df)
+    
+    @traced('ui.store_loaded')
+    def on_store_loaded(self, store):
+        """Handle detail rows fetched under a memory limit"""
+        if not store.spilled:
+            df = store.to_dataframe()
+            store.discard()
+            self.show_fetched_data(df if df is not None else data_points_to_dataframe([]))
+            return
+        
+        # Larger than the limit: summarize every row chunk by chunk, keep the top rows in memory
+        print(f"💾 {len(store):,} rows exceed the memory limit; not stored in local history")
+        self.pending_fetch = None
+        self.set_dataframe(store.top_rows(store.working_rows()), store=store)
+        store.discard()
+    
+    def show_fetched_data(self, df):
+        """Store freshly fetched rows in history and show them"""
+        # Keep fetched rows in local history for later sessions (unfiltered fetches only)
+        cube_range = None
+        if self.warehouse is not None and self.pending_fetch and self.pending_fetch[4].is_empty():
+            site_url, dimensions, start_date, end_date, _, row_limit = self.pending_fetch
+            try:
+                self.warehouse.store(site_url, df, dimensions, start_date, end_date, row_limit,
+                                     truncated=len(df) >= row_limit)
+                cube_range = (site_url, start_date, end_date)
+            except Exception as e:
+                print(f"❌ Failed to store data in warehouse: {e}")
+        self.pending_fetch = None
+        
+        self.set_dataframe(df, cube_range)
+    
+    @traced('ui.comparison_loaded')
+    def on_comparison_loaded(self, data_points):
+        """Handle loaded comparison period rows"""
+        df = data_points_to_dataframe(data_points)
+        
+        if self.warehouse is not None and self.pending_comparison and self.pending_comparison[4].is_empty():
+            site_url, dimensions, start_date, end_date, _, row_limit = self.pending_comparison
+            try:
+                self.warehouse.store(site_url, df, dimensions, start_date, end_date, row_limit,
+                                     truncated=len(df) >= row_limit)
+            except Exception as e:
+                print(f"❌ Failed to store comparison data in warehouse: {e}")
+        self.pending_comparison = None
+        
+        self.previous_df = df
+        self.update_comparison_table()
+    
+    def on_comparison_failed(self, error_message):
+        """Report a failed comparison period; the main fetch carries on"""
+        print(f"❌ {error_message}")
+        self.pending_comparison = None
+        self.show_message(f"Error: {error_message}")
+    
+    def on_totals_loaded(self, totals):
+        """Handle exact totals from the aggregate queries"""
+        self.totals = totals
+        if (self.warehouse is not None and self.pending_fetch and totals.daily is not None
+                and self.pending_fetch[4].is_empty()):
+            site_url, _, start_date, end_date, _, _ = self.pending_fetch
+            try:
+                self.warehouse.store_daily_totals(site_url, totals.daily, start_date, end_date)
+            except Exception as e:
+                print(f"❌ Failed to store daily totals in warehouse: {e}")
+        self.update_summary()
+    
+    def set_dataframe(self, df, cube_range=None, store=None):
+        """Show a loaded dataset in the dashboard.
+        
+        cube_range is (site, start, end) when the dataset mirrors history.
+        store is the SpillStore of a dataset larger than the memory limit,
+        of which df holds the top rows; pivots, charts, sketches and the
+        summary then cover every row of the store.
+        """
+        # Brand/non-brand and intent tags for every query, ahead of any analysis
+        df = self.gemini_analyzer.classify_queries(df)
+        self.df = df
+        self.stream_stats = None
+        self.stream_frames = []
         self.progress_bar.setVisible(False)
         self.fetch_btn.setEnabled(True)
-        self.analyze_btn.setEnabled(len(data_points) > 0)
+        self.analyze_btn.setEnabled(not df.empty)
+        self.query_page_index = self.build_query_page_index(df)
+        self.search_index = self.build_search_index(df)
+        self.url_tries = {}
+        if store is not None:
+            self.cube, self.sketches = self.summarize_store(store)
+            self.detail_stats = store.stats
+        else:
+            self.cube = self.load_rollup_cube(df, cube_range)
+            # Per-day sketches stored with the history answer quantiles and distinct counts for the range
+            self.sketches = self.warehouse.load_sketches(*cube_range) if cube_range is not None and self.warehouse is not None else None
+            self.detail_stats = None
+        self.pivot_filters = {}
         
         self.update_summary()
         self.update_data_table()
+        self.update_movers_table()
+        self.update_anomalies_table()
+        self.update_comparison_table()
+        self.update_cannibalization_table()
+        self.update_site_tree()
+        self.update_pivot_table()
+        self.dataset_version += 1
+        self.charts_widget.set_cube(self.cube, self.dataset_version)
+        self.dataset_changed.emit(df)
+    
+    def reclassify_queries(self):
+        """Re-tag the loaded dataset with the current query rules.
+        
+        Only the query_class and query_intent columns change, so the cube,
+        sketches, spilled store statistics and indexes are kept as they are.
+        """
+        if self.df is None:
+            return
+        self.df = self.gemini_analyzer.classify_queries(self.df)
+        self.update_data_table()
+        self.dataset_changed.emit(self.df)
     
     def on_analysis_complete(self, analysis_result):
         """Handle completed analysis"""
@@ -165,57 +681,402 @@ class DashboardWidget(QWidget):
     
     def on_error(self, error_message):
         """Handle errors"""
+        if self.stream_frames:
+            # Keep the pages that arrived before the failure
+            self.set_dataframe(pd.concat(self.stream_frames, ignore_index=True))
+        self.stream_stats = None
         self.progress_bar.setVisible(False)
         self.fetch_btn.setEnabled(True)
         self.show_message(f"Error: {error_message}")
     
+    @traced('ui.update_summary')
     def update_summary(self):
         """Update summary statistics"""
-        if not self.data_points:
-            return
-        
-        df = pd.DataFrame([{
-            'clicks': point.clicks,
-            'impressions': point.impressions,
-            'ctr': point.ctr,
-            'position': point.position
-        } for point in self.data_points])
-        
-        summary_text = f"""
-        Total Records: {len(self.data_points):,}
-        Total Clicks: {df['clicks'].sum():,}
-        Total Impressions: {df['impressions'].sum():,}
-        Average CTR: {df['ctr'].mean():.2f}%
-        Average Position: {df['position'].mean():.2f}
+        # Running statistics while pages are still arriving
+        if self.stream_stats is not None:
+            stats = self.stream_stats
+        elif self.detail_stats is not None:
+            stats = self.detail_stats
+        elif self.df is not None and not self.df.empty:
+            stats = DetailStats.from_dataframe(self.df)
+        else:
+            stats = None
+        if stats is None and self.totals is None:
+            return
+        loading = " (loading...)" if self.stream_stats is not None else ""
+        
+        if self.totals is not None:
+            # Exact totals from the aggregate queries; detail rows are truncated and anonymized
+            coverage = (stats.clicks / self.totals.clicks * 100) if stats is not None and self.totals.clicks else 0
+            summary_text = f"""
+        Total Records: {stats.rows if stats is not None else 0:,}{loading}
+        Total Clicks: {self.totals.clicks:,}
+        Total Impressions: {self.totals.impressions:,}
+        Average CTR: {self.totals.ctr:.2f}%
+        Average Position: {self.totals.position:.2f}
+        Detail Coverage: {coverage:.1f}% of clicks
         Date Range: {self.start_date.date().toString('yyyy-MM-dd')} to {self.end_date.date().toString('yyyy-MM-dd')}
         """
+        else:
+            summary_text = f"""
+        Total Records: {stats.rows:,}{loading}
+        Total Clicks: {stats.clicks:,}
+        Total Impressions: {stats.impressions:,}
+        Average CTR: {stats.ctr:.2f}%
+        Average Position: {stats.position:.2f}
+        Date Range: {self.start_date.date().toString('yyyy-MM-dd')} to {self.end_date.date().toString('yyyy-MM-dd')}
+        """
+        
+        if self.detail_stats is not None:
+            summary_text += f"""
+        Rows in Memory: {len(self.df):,} with the most clicks (the rest were summarized from disk)
+        """
+        
+        if self.sketches is not None and self.stream_stats is None:
+            distribution = self.sketches.distribution()
+            summary_text += f"""
+        Distinct Queries (est.): {distribution['distinct_queries']:,}
+        Distinct Pages (est.): {distribution['distinct_pages']:,}
+        """
         
         self.summary_text.setPlainText(summary_text.strip())
     
+    @traced('ui.update_data_table')
     def update_data_table(self):
         """Update data table with fetched data"""
-        if not self.data_points:
+        if self.df is None or self.df.empty:
+            return
+        
+        self.data_model.set_dataframe(self.df, self.DATA_COLUMNS)
+        self.apply_search()
+        self.data_table.resizeColumnsToContents()
+    
+    @traced('ui.build_search_index')
+    def build_search_index(self, df):
+        """Trigram index over queries and pages for the search box"""
+        return RowSearchIndex(df, ('query', 'page'))
+    
+    @traced('ui.search', rows=len)
+    def apply_search(self):
+        """Show only the data table rows matching the search box"""
+        if self.df is None or self.stream_stats is not None:
+            # The search index is built once the whole dataset has arrived
+            return np.array([], dtype=np.int64)
+        
+        if self.search_index is not None and len(self.search_index) == len(self.df):
+            rows = self.search_index.search(self.search_input.text(), self.search_scope_combo.currentData())
+        else:
+            rows = np.arange(len(self.df))
+        self.data_model.set_rows(rows)
+        self.search_count_label.setText(f"{len(rows):,} of {len(self.df):,} rows")
+        return rows
+    
+    @traced('ui.update_movers_table')
+    def update_movers_table(self):
+        """Show the significant rising and falling queries or pages"""
+        self.movers_table.setRowCount(0)
+        if self.df is None or self.df.empty:
             return
         
-        self.data_table.setRowCount(len(self.data_points))
-        self.data_table.setColumnCount(8)
-        self.data_table.setHorizontalHeaderLabels([
-            'Date', 'Query', 'Page', 'Country', 'Device', 
-            'Clicks', 'Impressions', 'CTR', 'Position'
+        entity = self.movers_entity_combo.currentData()
+        metric = self.movers_metric_combo.currentData()
+        rising, falling = self.trend_engine.top_movers(self.trend_engine.compute(self.df, entity, metric), n=25)
+        
+        self.movers_table.setColumnCount(7)
+        self.movers_table.setHorizontalHeaderLabels([
+            'Trend', entity.capitalize(), 'Change', 'Change %', 'Per Day', 'p-value', 'Total'
         ])
+        rows = [('▲', row) for row in rising.itertuples(index=False)] + \
+               [('▼', row) for row in falling.itertuples(index=False)]
+        self.movers_table.setRowCount(len(rows))
+        for index, (arrow, row) in enumerate(rows):
+            name = getattr(row, entity)
+            self.movers_table.setItem(index, 0, QTableWidgetItem(arrow))
+            self.movers_table.setItem(index, 1, QTableWidgetItem(name[:80] + '...' if len(name) > 80 else name))
+            self.movers_table.setItem(index, 2, QTableWidgetItem(f"{row.change:+,.1f}"))
+            self.movers_table.setItem(index, 3, QTableWidgetItem(f"{row.pct_change:+.1f}%"))
+            self.movers_table.setItem(index, 4, QTableWidgetItem(f"{row.slope:+.2f}"))
+            self.movers_table.setItem(index, 5, QTableWidgetItem(f"{row.p_value:.3f}"))
+            self.movers_table.setItem(index, 6, QTableWidgetItem(f"{row.total:,.0f}"))
+        
+        self.movers_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+    
+    @traced('ui.update_anomalies_table')
+    def update_anomalies_table(self):
+        """Show the segments with the most clicks lost to sudden drops"""
+        self.anomalies_table.setRowCount(0)
+        if self.df is None or self.df.empty:
+            return
+        
+        segments = list(self.anomaly_segment_combo.currentData())
+        detector = AnomalyDetector(method=self.anomaly_method_combo.currentData())
+        anomalies = detector.summarize(detector.detect(self.df, segments), n=100)
+        
+        headers = [segment.capitalize() for segment in segments] + [
+            'From', 'To', 'Days', 'Clicks Lost', 'Expected', 'Actual', 'Worst Score'
+        ]
+        self.anomalies_table.setColumnCount(len(headers))
+        self.anomalies_table.setHorizontalHeaderLabels(headers)
+        self.anomalies_table.setRowCount(len(anomalies))
+        for row, anomaly in enumerate(anomalies):
+            values = [str(anomaly[segment]) for segment in segments] + [
+                f"{anomaly['first_date']:%Y-%m-%d}",
+                f"{anomaly['last_date']:%Y-%m-%d}",
+                str(anomaly['days']),
+                f"{anomaly['lost']:,.0f}",
+                f"{anomaly['baseline']:,.0f}",
+                f"{anomaly['actual']:,.0f}",
+                f"{anomaly['worst_score']:.1f}"
+            ]
+            for column, value in enumerate(values):
+                self.anomalies_table.setItem(row, column, QTableWidgetItem(value))
+        
+        self.anomalies_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+    
+    @traced('ui.update_comparison_table')
+    def update_comparison_table(self):
+        """Show per-key changes against the comparison period"""
+        self.comparison_table.setRowCount(0)
+        if self.df is None or self.previous_df is None:
+            self.comparison_label.setText("" if self.previous_df is None else "Waiting for the current period")
+            return
+        
+        keys = list(self.comparison_level_combo.currentData())
+        engine = PeriodComparison(keys)
+        comparison = engine.compare(self.df, self.previous_df)
+        summary = engine.summarize(comparison, n=0)
+        current, previous = summary['totals']['current'], summary['totals']['previous']
+        clicks_change = (current['clicks'] - previous['clicks']) / previous['clicks'] * 100 if previous['clicks'] else 0
+        counts = summary['counts']
+        self.comparison_label.setText(
+            f"Clicks {previous['clicks']:,.0f} → {current['clicks']:,.0f} ({clicks_change:+.1f}%) · "
+            f"{counts['winner']:,} winners · {counts['loser']:,} losers · {counts['new']:,} new · {counts['lost']:,} lost"
+        )
+        
+        rows = engine.select(comparison, self.comparison_status_combo.currentData(), n=500)
+        headers = [key.capitalize() for key in keys] + [
+            'Clicks', 'Δ Clicks', 'Δ Clicks %', 'Impressions', 'Δ Impressions',
+            'CTR', 'Δ CTR (pp)', 'Position', 'Δ Position', 'Status'
+        ]
+        self.comparison_table.setColumnCount(len(headers))
+        self.comparison_table.setHorizontalHeaderLabels(headers)
+        self.comparison_table.setRowCount(len(rows))
+        for row, record in enumerate(rows.to_dict('records')):
+            values = [record[key][:80] + '...' if len(record[key]) > 80 else record[key] for key in keys] + [
+                f"{record['clicks_previous']:,.0f} → {record['clicks_current']:,.0f}",
+                f"{record['clicks_delta']:+,.0f}",
+                f"{record['clicks_delta_pct']:+.1f}%" if pd.notna(record['clicks_delta_pct']) else "",
+                f"{record['impressions_previous']:,.0f} → {record['impressions_current']:,.0f}",
+                f"{record['impressions_delta']:+,.0f}",
+                f"{record['ctr_previous']:.2%} → {record['ctr_current']:.2%}",
+                f"{record['ctr_delta'] * 100:+.2f}",
+                self.format_position_change(record['position_previous'], record['position_current']),
+                f"{record['position_delta']:+.1f}" if pd.notna(record['position_delta']) else "",
+                record['status']
+            ]
+            for column, value in enumerate(values):
+                self.comparison_table.setItem(row, column, QTableWidgetItem(value))
+        
+        self.comparison_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+    
+    @traced('ui.build_query_page_index', pairs=len)
+    def build_query_page_index(self, df):
+        """Query <-> page index for the loaded dataset, shared by the cannibalization views"""
+        return QueryPageIndex.build(df)
+    
+    @traced('ui.update_cannibalization_table')
+    def update_cannibalization_table(self):
+        """Show queries where several pages split the impressions"""
+        self.cannibalization_table.setRowCount(0)
+        self.competing_pages_table.setRowCount(0)
+        self.cannibalization = self.query_page_index.cannibalization(
+            min_share=self.cannibalization_share_combo.currentData(), n=500
+        )
         
-        for row, point in enumerate(self.data_points):
-            self.data_table.setItem(row, 0, QTableWidgetItem(str(point.date)))
-            self.data_table.setItem(row, 1, QTableWidgetItem(point.query[:50] + '...' if len(point.query) > 50 else point.query))
-            self.data_table.setItem(row, 2, QTableWidgetItem(point.page[:50] + '...' if len(point.page) > 50 else point.page))
-            self.data_table.setItem(row, 3, QTableWidgetItem(point.country))
-            self.data_table.setItem(row, 4, QTableWidgetItem(point.device))
-            self.data_table.setItem(row, 5, QTableWidgetItem(str(point.clicks)))
-            self.data_table.setItem(row, 6, QTableWidgetItem(str(point.impressions)))
-            self.data_table.setItem(row, 7, QTableWidgetItem(f"{point.ctr:.2f}%"))
-            self.data_table.setItem(row, 8, QTableWidgetItem(f"{point.position:.2f}"))
-        
-        self.data_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        headers = ['Query', 'Pages', 'Impressions', 'Clicks', 'Top Page', 'Top Share',
+                   'Second Page', 'Second Share', 'Best Position', 'Position Spread', 'Split']
+        self.cannibalization_table.setColumnCount(len(headers))
+        self.cannibalization_table.setHorizontalHeaderLabels(headers)
+        self.cannibalization_table.setRowCount(len(self.cannibalization))
+        for row, record in enumerate(self.cannibalization.itertuples(index=False)):
+            values = [
+                record.query,
+                str(record.pages),
+                f"{record.impressions:,.0f}",
+                f"{record.clicks:,.0f}",
+                record.top_page,
+                f"{record.top_share:.0%}",
+                record.second_page,
+                f"{record.second_share:.0%}",
+                f"{record.best_position:.1f}",
+                f"{record.position_spread:.1f}",
+                f"{record.split:.2f}"
+            ]
+            for column, value in enumerate(values):
+                self.cannibalization_table.setItem(row, column, QTableWidgetItem(value))
+        
+        self.cannibalization_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+    
+    def show_competing_pages(self, row):
+        """List every page ranking for the selected query"""
+        self.competing_pages_table.setRowCount(0)
+        if self.cannibalization is None or not 0 <= row < len(self.cannibalization):
+            return
+        
+        pages = self.query_page_index.pages_for(self.cannibalization['query'].iloc[row])
+        self.competing_pages_table.setColumnCount(5)
+        self.competing_pages_table.setHorizontalHeaderLabels(['Page', 'Impressions', 'Share', 'Clicks', 'Position'])
+        self.competing_pages_table.setRowCount(len(pages))
+        for index, record in enumerate(pages.itertuples(index=False)):
+            values = [record.page, f"{record.impressions:,.0f}", f"{record.share:.0%}",
+                      f"{record.clicks:,.0f}", f"{record.position:.1f}"]
+            for column, value in enumerate(values):
+                self.competing_pages_table.setItem(index, column, QTableWidgetItem(value))
+        
+        self.competing_pages_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+    
+    @traced('ui.update_site_tree')
+    def update_site_tree(self):
+        """Show click subtotals along the URL hierarchy; children are added when expanded"""
+        self.site_tree.clear()
+        if self.df is None or self.df.empty:
+            return
+        
+        templates = self.structure_mode_combo.currentData()
+        if templates not in self.url_tries:
+            self.url_tries[templates] = UrlTrie.build(self.df, templates=templates)
+        trie = self.url_tries[templates]
+        
+        for host in trie.child_nodes(0):
+            item = self.create_site_tree_item(trie, host, trie.label(host))
+            self.site_tree.addTopLevelItem(item)
+        if self.site_tree.topLevelItemCount() == 1:
+            self.site_tree.topLevelItem(0).setExpanded(True)
+    
+    def create_site_tree_item(self, trie, node, label):
+        clicks, impressions, weighted = trie.total[node]
+        all_clicks = trie.total[0, 0]
+        item = QTreeWidgetItem([
+            label,
+            f"{trie.total_pages[node]:,}",
+            f"{clicks:,.0f}",
+            f"{clicks / all_clicks * 100:.1f}%" if all_clicks else "",
+            f"{impressions:,.0f}",
+            f"{clicks / impressions:.2%}" if impressions else "",
+            f"{weighted / impressions:.1f}" if impressions else ""
+        ])
+        item.setData(0, Qt.ItemDataRole.UserRole, int(node))
+        if trie.children[node]:
+            # Placeholder until the item is expanded
+            item.addChild(QTreeWidgetItem(["…"]))
+        return item
+    
+    def on_site_tree_expanded(self, item):
+        """Replace the placeholder with the node's children, most clicks first"""
+        if item.childCount() != 1 or item.child(0).data(0, Qt.ItemDataRole.UserRole) is not None:
+            return
+        trie = self.url_tries.get(self.structure_mode_combo.currentData())
+        if trie is None:
+            return
+        item.takeChild(0)
+        children = trie.child_nodes(item.data(0, Qt.ItemDataRole.UserRole))
+        for child in children[:self.MAX_TREE_CHILDREN]:
+            item.addChild(self.create_site_tree_item(trie, child, '/' + trie.label(child)))
+        if len(children) > self.MAX_TREE_CHILDREN:
+            item.addChild(QTreeWidgetItem([f"… {len(children) - self.MAX_TREE_CHILDREN:,} more"]))
+    
+    @traced('ui.summarize_store')
+    def summarize_store(self, store):
+        """Rollup cube and sketches of a spilled dataset, one chunk at a time"""
+        return store.rollup_cube(), store.sketches()
+    
+    @traced('ui.rollup_cube', rows=len)
+    def load_rollup_cube(self, df, cube_range=None):
+        """Rollup cube of the dataset, read from history when stored and stored after building"""
+        if cube_range is not None and self.warehouse is not None:
+            cube = self.warehouse.load_cube(*cube_range)
+            if cube is not None:
+                return cube
+        
+        cube = RollupCube.build(df)
+        if cube_range is not None and self.warehouse is not None:
+            try:
+                self.warehouse.store_cube(*cube_range, cube)
+            except Exception as e:
+                print(f"❌ Failed to store rollup cube in warehouse: {e}")
+        return cube
+    
+    @traced('ui.update_pivot_table')
+    def update_pivot_table(self):
+        """Pivot the chosen metric by rows (and columns) from the rollup cube"""
+        self.pivot_table.setRowCount(0)
+        self.pivot_row_values = []
+        if not self.cube.rollups:
+            self.pivot_label.setText("")
+            return
+        
+        rows_key = self.pivot_rows_combo.currentData()
+        columns_key = self.pivot_columns_combo.currentData()
+        metric = self.pivot_metric_combo.currentData()
+        if columns_key == rows_key:
+            columns_key = None
+        dimensions = [rows_key] + ([columns_key] if columns_key else [])
+        if not self.cube.covers(set(dimensions) | set(self.pivot_filters) | {'date'}):
+            # No rollup has this combination, e.g. page rows inside a device drill-down
+            self.pivot_filters = {}
+        self.pivot_label.setText(" › ".join(f"{key.capitalize()}: {self.format_pivot_value(value)}"
+                                            for key, value in self.pivot_filters.items()) or "All data")
+        
+        totals = self.cube.aggregate([rows_key], self.pivot_filters)
+        if rows_key == 'date':
+            totals = totals.sort_values('date')
+        else:
+            totals = totals.sort_values('clicks', ascending=False, kind='stable')
+        totals = totals.head(self.MAX_PIVOT_ROWS)
+        
+        column_values = []
+        if columns_key:
+            cells = self.cube.aggregate(dimensions, self.pivot_filters)
+            column_values = (self.cube.aggregate([columns_key], self.pivot_filters)
+                             .sort_values('clicks', ascending=False, kind='stable')[columns_key]
+                             .head(self.MAX_PIVOT_COLUMNS).tolist())
+            grid = cells.pivot(index=rows_key, columns=columns_key, values=metric)
+            grid = grid.reindex(index=totals[rows_key], columns=column_values)
+        
+        headers = [self.pivot_rows_combo.currentText(), 'Total'] + [self.format_pivot_value(value) for value in column_values]
+        self.pivot_table.setColumnCount(len(headers))
+        self.pivot_table.setHorizontalHeaderLabels(headers)
+        self.pivot_table.setRowCount(len(totals))
+        self.pivot_row_values = totals[rows_key].tolist()
+        formatter = self.PIVOT_FORMATS[metric]
+        for row, (value, total) in enumerate(zip(self.pivot_row_values, totals[metric])):
+            values = [_truncate(self.format_pivot_value(value), 80), formatter(total) if pd.notna(total) else ""]
+            if column_values:
+                values += [formatter(cell) if pd.notna(cell) else "" for cell in grid.iloc[row]]
+            for column, text in enumerate(values):
+                self.pivot_table.setItem(row, column, QTableWidgetItem(text))
+        
+        self.pivot_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+    
+    def drill_down_pivot(self, row):
+        """Restrict the pivot to the double-clicked row and show it by date"""
+        rows_key = self.pivot_rows_combo.currentData()
+        if rows_key == 'date' or not 0 <= row < len(self.pivot_row_values):
+            return
+        self.pivot_filters[rows_key] = self.pivot_row_values[row]
+        self.pivot_rows_combo.setCurrentIndex(self.pivot_rows_combo.findData('date'))
+    
+    def reset_pivot_filters(self):
+        self.pivot_filters = {}
+        self.update_pivot_table()
+    
+    def format_pivot_value(self, value):
+        if isinstance(value, (np.datetime64, pd.Timestamp)):
+            return f"{pd.Timestamp(value):%Y-%m-%d}"
+        return str(value) if value != '' else '(none)'
+    
+    def format_position_change(self, previous, current):
+        return " → ".join(f"{value:.1f}" if pd.notna(value) else "–" for value in (previous, current))
     
     def display_analysis(self, analysis_result):
         """Display AI analysis results"""
@@ -0,0 +1,95 @@
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+                            QPushButton, QPlainTextEdit, QTableView, QSpinBox,
+                            QSplitter)
+from PyQt5.QtCore import Qt
+from widgets.table_models import StreamingTableModel
+
+EXAMPLE_QUERY = """-- Tables: data (loaded dataset), history (local history of the site)
+SELECT page, SUM(clicks) AS clicks, SUM(impressions) AS impressions
+FROM data
+WHERE device = 'MOBILE' AND country = 'deu'
+GROUP BY page
+ORDER BY clicks DESC
+LIMIT 100"""
+
+class SQLConsoleWidget(QWidget):
+    def __init__(self, sql_engine):
+        super().__init__()
+        self.sql_engine = sql_engine
+        self.init_ui()
+        self.connect_signals()
+    
+    def init_ui(self):
+        layout = QVBoxLayout()
+        
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        
+        # Query editor
+        self.query_edit = QPlainTextEdit()
+        self.query_edit.setPlainText(EXAMPLE_QUERY)
+        splitter.addWidget(self.query_edit)
+        
+        # Results table (virtualized)
+        self.result_model = StreamingTableModel(self)
+        self.result_view = QTableView()
+        self.result_view.setModel(self.result_model)
+        splitter.addWidget(self.result_view)
+        splitter.setSizes([200, 600])
+        
+        # Controls
+        controls_layout = QHBoxLayout()
+        
+        self.run_btn = QPushButton("Run Query")
+        self.run_btn.clicked.connect(self.run_query)
+        controls_layout.addWidget(self.run_btn)
+        
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.sql_engine.cancel)
+        self.cancel_btn.setEnabled(False)
+        controls_layout.addWidget(self.cancel_btn)
+        
+        controls_layout.addWidget(QLabel("Time limit (s):"))
+        self.timeout_spin = QSpinBox()
+        self.timeout_spin.setRange(1, 3600)
+        self.timeout_spin.setValue(30)
+        controls_layout.addWidget(self.timeout_spin)
+        
+        self.status_label = QLabel("")
+        controls_layout.addWidget(self.status_label)
+        controls_layout.addStretch()
+        
+        layout.addLayout(controls_layout)
+        layout.addWidget(splitter)
+        self.setLayout(layout)
+    
+    def connect_signals(self):
+        self.sql_engine.columns_ready.connect(self.result_model.set_columns)
+        self.sql_engine.rows_ready.connect(self.on_rows_ready)
+        self.sql_engine.query_finished.connect(self.on_query_finished)
+        self.sql_engine.error_occurred.connect(self.on_error)
+    
+    def run_query(self):
+        """Run the query in the editor"""
+        sql = self.query_edit.toPlainText().strip()
+        if not sql:
+            return
+        
+        self.result_model.clear()
+        self.run_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.status_label.setText(f"Running... (tables: {', '.join(self.sql_engine.table_names()) or 'none'})")
+        self.sql_engine.run_async(sql, timeout=self.timeout_spin.value())
+    
+    def on_rows_ready(self, rows):
+        self.result_model.append_rows(rows)
+        self.status_label.setText(f"{self.result_model.rowCount():,} rows...")
+    
+    def on_query_finished(self, row_count, elapsed):
+        self.run_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.status_label.setText(f"✅ {row_count:,} rows in {elapsed:.2f}s")
+    
+    def on_error(self, error_message):
+        self.run_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.status_label.setText(f"❌ {error_message}")
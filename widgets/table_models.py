@@ -0,0 +1,133 @@
+import numpy as np
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+
+class StreamingTableModel(QAbstractTableModel):
+    """Virtualized table model that grows as row batches arrive.
+
+    Only the cells the view actually paints are formatted, so result sets
+    with millions of rows do not create one widget item per cell.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.columns = []
+        self.rows = []
+
+    def clear(self):
+        self.beginResetModel()
+        self.columns = []
+        self.rows = []
+        self.endResetModel()
+
+    def set_columns(self, columns):
+        self.beginResetModel()
+        self.columns = list(columns)
+        self.rows = []
+        self.endResetModel()
+
+    def append_rows(self, rows):
+        if not rows:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.rows.extend(rows)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        value = self.rows[index.row()][index.column()]
+        if isinstance(value, float):
+            return f"{value:.2f}"
+        return '' if value is None else str(value)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.columns[section] if section < len(self.columns) else None
+        return str(section + 1)
+
+
+class DataFrameTableModel(QAbstractTableModel):
+    """Read-only view over DataFrame columns showing a subset of row positions.
+
+    Cells are formatted when painted, and filtering swaps the array of
+    visible row positions instead of rebuilding items.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.headers = []
+        self.names = []
+        self.columns = []
+        self.formatters = []
+        self.size = 0
+        self.rows = np.array([], dtype=np.int64)
+
+    def set_dataframe(self, df, columns):
+        """Show df; columns is a list of (header, column name, formatter) tuples"""
+        columns = [column for column in columns if column[1] in df.columns]
+        self.beginResetModel()
+        self.headers = [header for header, _, _ in columns]
+        self.names = [name for _, name, _ in columns]
+        self.columns = [df[name].to_numpy() for name in self.names]
+        self.formatters = [formatter for _, _, formatter in columns]
+        self.size = len(df)
+        self.rows = np.arange(len(df))
+        self.endResetModel()
+
+    def append_dataframe(self, df):
+        """Append and show rows of df (with the shown columns), e.g. while a fetch streams in"""
+        if df.empty:
+            return
+        start, end = self.size, self.size + len(df)
+        for index, name in enumerate(self.names):
+            values = df[name].to_numpy()
+            buffer = self.columns[index]
+            dtype = values.dtype if start == 0 else np.result_type(buffer.dtype, values.dtype)
+            if end > len(buffer) or dtype != buffer.dtype:
+                # Grow geometrically so appending n rows in pages stays O(n) overall
+                grown = np.empty(max(end, 2 * len(buffer)), dtype=dtype)
+                grown[:start] = buffer[:start]
+                buffer = grown
+            buffer[start:end] = values
+            self.columns[index] = buffer
+
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(df) - 1)
+        self.size = end
+        self.rows = np.concatenate([self.rows, np.arange(start, end)])
+        self.endInsertRows()
+
+    def set_rows(self, rows):
+        """Show only the given row positions, in order"""
+        self.beginResetModel()
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        value = self.columns[index.column()][self.rows[index.row()]]
+        formatter = self.formatters[index.column()]
+        return formatter(value) if formatter else str(value)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section] if section < len(self.headers) else None
+        return str(self.rows[section] + 1) if section < len(self.rows) else None
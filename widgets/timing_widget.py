@@ -0,0 +1,116 @@
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+                            QPushButton, QTreeWidget, QTreeWidgetItem, QFileDialog,
+                            QMessageBox, QCheckBox)
+from tracing import tracer
+
+class TimingWidget(QWidget):
+    """Per-stage timings of the fetch -> analyze pipeline"""
+
+    COLUMNS = ["Stage", "Duration (ms)", "Rows", "Bytes", "Tokens", "Peak Mem (MB)", "Δ Mem (MB)",
+               "RSS (MB)", "Thread"]
+    MAX_ROOTS = 500
+
+    def __init__(self):
+        super().__init__()
+        self.init_ui()
+        # Show spans recorded before the panel existed (e.g. authentication)
+        for span in list(tracer.spans):
+            if span.parent is None:
+                self.add_root_span(span)
+        tracer.span_finished.connect(self.on_span_finished)
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        controls_layout = QHBoxLayout()
+
+        self.clear_btn = QPushButton("Clear")
+        self.clear_btn.clicked.connect(self.clear)
+        controls_layout.addWidget(self.clear_btn)
+
+        self.export_btn = QPushButton("Export Chrome Trace")
+        self.export_btn.clicked.connect(self.export_trace)
+        controls_layout.addWidget(self.export_btn)
+
+        self.memory_check = QCheckBox("Profile memory")
+        self.memory_check.setToolTip("Track allocations and RSS per stage (slows the pipeline down)")
+        self.memory_check.setChecked(tracer.memory_profiling)
+        self.memory_check.toggled.connect(tracer.set_memory_profiling)
+        controls_layout.addWidget(self.memory_check)
+
+        self.status_label = QLabel("")
+        controls_layout.addWidget(self.status_label)
+        controls_layout.addStretch()
+        layout.addLayout(controls_layout)
+
+        self.tree = QTreeWidget()
+        self.tree.setColumnCount(len(self.COLUMNS))
+        self.tree.setHeaderLabels(self.COLUMNS)
+        self.tree.setColumnWidth(0, 320)
+        layout.addWidget(self.tree)
+
+        self.setLayout(layout)
+
+    def on_span_finished(self, span):
+        # Children are shown under their root once the whole stage has finished
+        if span.parent is None:
+            self.add_root_span(span)
+
+    def add_root_span(self, span):
+        peak_span = tracer.peak_stage(span) if 'mem_peak' in span.attrs else None
+        item = self.create_item(span, peak_span)
+        self.tree.addTopLevelItem(item)
+        while self.tree.topLevelItemCount() > self.MAX_ROOTS:
+            self.tree.takeTopLevelItem(0)
+        status = f"Last: {span.name} in {span.duration * 1000:,.1f} ms"
+        if peak_span is not None:
+            status += f" — peak memory in {peak_span.name} ({peak_span.mem_peak / 1e6:,.1f} MB traced)"
+        self.status_label.setText(status)
+
+    def create_item(self, span, peak_span=None):
+        attrs = span.attrs
+        tokens = [attrs.get('prompt_tokens'), attrs.get('tokens')]
+        item = QTreeWidgetItem([
+            span.name + (f"  ❌ {span.error}" if span.error else "") + ("  🔺 peak" if span is peak_span else ""),
+            f"{span.duration * 1000:,.1f}",
+            self.format_count(attrs.get('rows')),
+            self.format_count(attrs.get('bytes', attrs.get('chars'))),
+            " / ".join(self.format_count(t) for t in tokens) if any(t is not None for t in tokens) else "",
+            self.format_megabytes(attrs.get('mem_peak')),
+            self.format_megabytes(attrs.get('mem_delta')),
+            self.format_megabytes(attrs.get('rss')),
+            span.thread_name
+        ])
+        if span is peak_span:
+            font = item.font(0)
+            font.setBold(True)
+            item.setFont(0, font)
+        if attrs.get('mem_growth'):
+            # Allocation sites that grew since the previous run (possible leaks)
+            item.setToolTip(0, "Growth since previous run:\n" + "\n".join(attrs['mem_growth']))
+        for child in span.children:
+            item.addChild(self.create_item(child, peak_span))
+        return item
+
+    def format_count(self, value):
+        return f"{value:,}" if isinstance(value, (int, float)) else ""
+
+    def format_megabytes(self, value):
+        return f"{value / 1e6:,.1f}" if isinstance(value, (int, float)) else ""
+
+    def clear(self):
+        tracer.clear()
+        self.tree.clear()
+        self.status_label.setText("")
+
+    def export_trace(self):
+        """Save the recorded spans for chrome://tracing or Perfetto"""
+        path, _ = QFileDialog.getSaveFileName(self, "Export Chrome Trace", "trace.json",
+                                              "JSON Files (*.json)")
+        if not path:
+            return
+        try:
+            tracer.export_chrome_trace(path)
+            self.status_label.setText(f"Exported trace to {path}")
+        except Exception as e:
+            QMessageBox.critical(self, "Export Failed", str(e))